@@ -20,7 +20,7 @@
 from __future__ import annotations
 
 from . import ast  # NOQA
-from .tokenizer import Source, NormalizedSource  # NOQA
+from .tokenizer import Source, NormalizedSource, ASTSource  # NOQA
 from .codegen import generate_source  # NOQA
 from .parser import parse_fragment, parse_block, parse_query  # NOQA
 from .parser.grammar import keywords  # NOQA
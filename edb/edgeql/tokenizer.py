@@ -17,15 +17,19 @@
 #
 
 from __future__ import annotations
-from typing import Any, Optional, Sequence
+from typing import Any, Optional, Sequence, TYPE_CHECKING
 
 import re
 import hashlib
+import uuid
 
 import edb._edgeql_parser as ql_parser
 
 from edb import errors
 
+if TYPE_CHECKING:
+    from . import ast as qlast
+
 
 TRAILING_WS_IN_CONTINUATION = re.compile(r'\\ \s+\n')
 
@@ -40,6 +44,11 @@ def deserialize(serialized: bytes, text: str) -> Source:
             entry = ql_parser.unpack(serialized)
             assert isinstance(entry, ql_parser.Entry)
             return NormalizedSource(entry, text, serialized)
+        case 2:
+            raise ValueError(
+                "AST sources only identify the statements when serialized "
+                "and cannot be deserialized"
+            )
 
     raise ValueError(f"Invalid type/version byte: {serialized[0]}")
 
@@ -145,6 +154,55 @@ class NormalizedSource(Source):
         return Source.from_string(self._text)
 
 
+class ASTSource(Source):
+    """A source for statements that were built as an AST.
+
+    The statements are handed to the compiler as is, without being
+    rendered and parsed again.  The text is only rendered on demand,
+    e.g. to report an error.
+    """
+
+    def __init__(
+        self,
+        statements: Sequence[qlast.Base],
+        *,
+        cache_key: Optional[bytes] = None,
+    ) -> None:
+        # Unlike the text sources, there is no cheap way to tell two
+        # ASTs apart, so by default every AST source is a distinct query.
+        if cache_key is None:
+            cache_key = uuid.uuid4().bytes
+        # AST sources are compiled in the process that built them, so
+        # the serialized form only identifies the source instead of
+        # rendering it; the text and tokens are rendered on demand.
+        super().__init__(text='', tokens=[], serialized=b'\x02' + cache_key)
+        self._cache_key = cache_key
+        self._statements = statements
+        self._rendered: Optional[Source] = None
+
+    def statements(self) -> Sequence[qlast.Base]:
+        return self._statements
+
+    def text(self) -> str:
+        return self.denormalized().text()
+
+    def tokens(self) -> list[ql_parser.OpaqueToken]:
+        return self.denormalized().tokens()
+
+    def __repr__(self):
+        return f'<edgeql.ASTSource statements={self._statements!r}>'
+
+    def denormalized(self) -> Source:
+        if self._rendered is None:
+            from . import codegen
+
+            self._rendered = Source.from_string(';\n'.join(
+                codegen.generate_source(stmt, pretty=True)
+                for stmt in self._statements
+            ))
+        return self._rendered
+
+
 def inflate_span(
     source: str, span: tuple[int, Optional[int]]
 ) -> tuple[ql_parser.SourcePoint, Optional[ql_parser.SourcePoint]]:
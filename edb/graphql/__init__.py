@@ -19,7 +19,7 @@
 
 from __future__ import annotations
 
-from .compiler import compile_graphql
+from .compiler import compile_graphql, get_gqlcore
 from .translator import translate_ast, parse_text, parse_tokens
 from .translator import TranspiledOperation
 from .tokenizer import Source, NormalizedSource
@@ -31,5 +31,6 @@ _patch_core.patch_graphql_core()
 
 __all__ = (
     'translate_ast', 'parse_text', 'parse_tokens', 'GQLCoreSchema',
-    'compile_graphql', 'TranspiledOperation', 'Source', 'NormalizedSource'
+    'compile_graphql', 'get_gqlcore', 'TranspiledOperation', 'Source',
+    'NormalizedSource',
 )
@@ -28,7 +28,7 @@ from edb.schema import schema as s_schema
 from graphql.language import lexer as gql_lexer
 
 
-def _get_gqlcore(
+def get_gqlcore(
     std_schema: s_schema.Schema,
     user_schema: s_schema.Schema,
     global_schema: s_schema.Schema,
@@ -56,13 +56,15 @@ def compile_graphql(
     variables: Optional[Mapping[str, object]] = None,
     native_input: bool = False,
     extracted_variables: Optional[Mapping[str, object]] = None,
+    gqlcore: Optional[graphql.GQLCoreSchema] = None,
 ) -> graphql.TranspiledOperation:
     if tokens is None:
         ast = graphql.parse_text(gql)
     else:
         ast = graphql.parse_tokens(gql, tokens)
 
-    gqlcore = _get_gqlcore(std_schema, user_schema, global_schema)
+    if gqlcore is None:
+        gqlcore = get_gqlcore(std_schema, user_schema, global_schema)
 
     return graphql.translate_ast(
         gqlcore,
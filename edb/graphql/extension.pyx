@@ -25,10 +25,13 @@ from typing import (
     Union,
 )
 
+import asyncio
 import cython
+import hashlib
 import http
 import json
 import logging
+import os
 import time
 import urllib.parse
 
@@ -47,6 +50,7 @@ from edb.server.compiler import errormech
 from edb.schema import schema as s_schema
 
 from edb.common import debug
+from edb.common import lru
 from edb.common import markup
 
 from . import explore
@@ -54,6 +58,11 @@ from . import translator
 
 
 logger = logging.getLogger(__name__)
+# How many operations of a batch run at the same time.
+BATCH_CONCURRENCY = int(os.getenv("GEL_SERVER_GRAPHQL_BATCH_CONCURRENCY", 8))
+# How many rewrites of a persisted document, one per operation name
+# requested by the clients, are kept.
+PERSISTED_QUERY_MAX_REWRITES = 8
 _USER_ERRORS = (
     _graphql_rewrite.LexingError,
     _graphql_rewrite.SyntaxError,
@@ -80,6 +89,38 @@ CacheEntry = Union[
 ]
 
 
+@cython.final
+cdef class PersistedQuery:
+    # A document registered with the automatic persisted queries protocol,
+    # along with the results of rewriting it for each operation, so that
+    # requests sending just the hash of the document don't parse it again.
+
+    cdef readonly str query
+    cdef object _rewrites
+
+    def __init__(self, query: str):
+        self.query = query
+        # The operation names come from the clients, so only a few
+        # rewrites are kept.
+        self._rewrites = lru.LRUMapping(maxsize=PERSISTED_QUERY_MAX_REWRITES)
+
+    def rewrite(self, operation_name: Optional[str]):
+        try:
+            return self._rewrites[operation_name]
+        except KeyError:
+            rewritten = _rewrite(operation_name, self.query)
+            self._rewrites[operation_name] = rewritten
+            return rewritten
+
+
+PERSISTED_QUERY_NOT_FOUND = json.dumps({
+    'errors': [{
+        'message': 'PersistedQueryNotFound',
+        'extensions': {'code': 'PERSISTED_QUERY_NOT_FOUND'},
+    }],
+}).encode()
+
+
 async def handle_request(
     object request,
     object response,
@@ -101,24 +142,30 @@ async def handle_request(
 
     operation_name = None
     variables = None
-    globals = None
-    config = None
     deprecated_globals = None
+    extensions = None
     query = None
     query_bytes_len = 0
+    batch = None
 
     try:
         if request.method == b'POST':
             if request.content_type and b'json' in request.content_type:
                 body = json.loads(request.body)
-                if not isinstance(body, dict):
+                if isinstance(body, list):
+                    batch = body
+                elif isinstance(body, dict):
+                    query = body.get('query')
+                    if query is not None:
+                        query_bytes_len = len(query.encode('utf-8'))
+                    operation_name = body.get('operationName')
+                    variables = body.get('variables')
+                    deprecated_globals = body.get('globals')
+                    extensions = body.get('extensions')
+                else:
                     raise TypeError(
-                        'the body of the request must be a JSON object')
-                query = body.get('query')
-                query_bytes_len = len(query.encode('utf-8'))
-                operation_name = body.get('operationName')
-                variables = body.get('variables')
-                deprecated_globals = body.get('globals')
+                        'the body of the request must be a JSON object '
+                        'or an array of JSON objects')
             elif request.content_type == 'application/graphql':
                 query_bytes_len = len(request.body)
                 query = request.body.decode('utf-8')
@@ -156,53 +203,48 @@ async def handle_request(
                         raise TypeError(
                             '"globals" must be a JSON object')
 
+                extensions = qs.get('extensions')
+                if extensions is not None:
+                    try:
+                        extensions = json.loads(extensions[0])
+                    except Exception:
+                        raise TypeError(
+                            '"extensions" must be a JSON object')
+
         else:
             raise TypeError('expected a GET or a POST request')
 
-        if not query:
-            raise TypeError('invalid GraphQL request: query is missing')
-        metrics.query_size.observe(
-            query_bytes_len, tenant.get_instance_name(), 'graphql'
-        )
-
-        if (operation_name is not None and
-                not isinstance(operation_name, str)):
-            raise TypeError('operationName must be a string')
-
-        if variables is not None and not isinstance(variables, dict):
-            raise TypeError('"variables" must be a JSON object')
-
-        # There are 2 ways of sending globals:
-        # 1) as 'globals' field (deprecated)
-        # 2) as part of 'variables' in the '__globals__' element
-        #
-        # If both ways are present they must match.
-        if variables is not None:
-            globals = variables.get('__globals__')
-
-        if variables is not None:
-            config = variables.get('__config__')
-
-        if config is not None and not isinstance(config, dict):
-            raise TypeError('"__config__" must be a JSON object')
-
-        if globals is not None and not isinstance(globals, dict):
-            raise TypeError('"__globals__" must be a JSON object')
-        if (
-            deprecated_globals is not None and
-            not isinstance(deprecated_globals, dict)
-        ):
-            raise TypeError('"globals" must be a JSON object')
-
-        # Globals are dicts if they are present, make sure they are the same.
-        if (
-            globals is not None and deprecated_globals is not None and
-            globals != deprecated_globals
-        ):
-            raise ValueError('invalid "__globals__" and "globals": '
-                             'values must match when both are present')
-
-        globals = globals or deprecated_globals
+        if batch is not None:
+            if not batch:
+                raise TypeError('the batch of operations is empty')
+            operations = []
+            for item in batch:
+                if not isinstance(item, dict):
+                    raise TypeError(
+                        'every operation of the batch must be a JSON object')
+                query = item.get('query')
+                operations.append(_prepare_operation(
+                    db,
+                    tenant,
+                    query,
+                    len(query.encode('utf-8'))
+                    if isinstance(query, str) else 0,
+                    item.get('operationName'),
+                    item.get('variables'),
+                    item.get('globals'),
+                    item.get('extensions'),
+                ))
+        else:
+            operation = _prepare_operation(
+                db,
+                tenant,
+                query,
+                query_bytes_len,
+                operation_name,
+                variables,
+                deprecated_globals,
+                extensions,
+            )
 
     except Exception as ex:
         if debug.flags.server:
@@ -215,11 +257,110 @@ async def handle_request(
 
     response.status = http.HTTPStatus.OK
     response.content_type = b'application/json'
-    try:
-        result = await _execute(
-            db, role_name, tenant, query, operation_name, variables, globals,
-            config,
+    if batch is not None:
+        # The operations run concurrently, each on a backend connection
+        # of its own, but not on more than a few at a time so that one
+        # request doesn't take over the connection pool.
+        sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run(operation):
+            async with sem:
+                return await _run_operation(db, role_name, tenant, operation)
+
+        results = await asyncio.gather(*[run(op) for op in operations])
+        response.body = b'[' + b','.join(body for body, _ in results) + b']'
+    else:
+        response.body, response.use_body_etag = await _run_operation(
+            db, role_name, tenant, operation)
+
+
+def _prepare_operation(
+    db,
+    tenant,
+    query,
+    query_bytes_len,
+    operation_name,
+    variables,
+    deprecated_globals,
+    extensions,
+):
+    # Validates a GraphQL operation of a request and returns the
+    # arguments of _execute() for it, or None if it refers to a persisted
+    # query that is not known.
+    globals = None
+    config = None
+    persisted = None
+
+    if extensions is not None:
+        if not isinstance(extensions, dict):
+            raise TypeError('"extensions" must be a JSON object')
+        if extensions.get('persistedQuery') is not None:
+            persisted = _get_persisted_query(
+                db, extensions['persistedQuery'], query)
+            if persisted is None and not query:
+                # The client is to send the document along with its
+                # hash next.
+                return None
+
+    if persisted is not None:
+        query = persisted.query
+    elif not query:
+        raise TypeError('invalid GraphQL request: query is missing')
+    if query_bytes_len:
+        metrics.query_size.observe(
+            query_bytes_len, tenant.get_instance_name(), 'graphql'
         )
+
+    if (operation_name is not None and
+            not isinstance(operation_name, str)):
+        raise TypeError('operationName must be a string')
+
+    if variables is not None and not isinstance(variables, dict):
+        raise TypeError('"variables" must be a JSON object')
+
+    # There are 2 ways of sending globals:
+    # 1) as 'globals' field (deprecated)
+    # 2) as part of 'variables' in the '__globals__' element
+    #
+    # If both ways are present they must match.
+    if variables is not None:
+        globals = variables.get('__globals__')
+
+    if variables is not None:
+        config = variables.get('__config__')
+
+    if config is not None and not isinstance(config, dict):
+        raise TypeError('"__config__" must be a JSON object')
+
+    if globals is not None and not isinstance(globals, dict):
+        raise TypeError('"__globals__" must be a JSON object')
+    if (
+        deprecated_globals is not None and
+        not isinstance(deprecated_globals, dict)
+    ):
+        raise TypeError('"globals" must be a JSON object')
+
+    # Globals are dicts if they are present, make sure they are the same.
+    if (
+        globals is not None and deprecated_globals is not None and
+        globals != deprecated_globals
+    ):
+        raise ValueError('invalid "__globals__" and "globals": '
+                         'values must match when both are present')
+
+    globals = globals or deprecated_globals
+
+    return query, operation_name, variables, globals, config, persisted
+
+
+async def _run_operation(db, role_name, tenant, operation):
+    # Returns the response body of the operation, and whether it
+    # succeeded.
+    if operation is None:
+        return PERSISTED_QUERY_NOT_FOUND, False
+
+    try:
+        result = await _execute(db, role_name, tenant, *operation)
     except Exception as ex:
         if debug.flags.server:
             markup.dump(ex)
@@ -242,9 +383,52 @@ async def handle_request(
                 hasattr(ex, 'col')):
             err_dct['locations'] = [{'line': ex.line, 'column': ex.col}]
 
-        response.body = json.dumps({'errors': [err_dct]}).encode()
+        return json.dumps({'errors': [err_dct]}).encode(), False
     else:
-        response.body = b'{"data":' + result + b'}'
+        return b'{"data":' + result + b'}', True
+
+
+cdef PersistedQuery _get_persisted_query(
+    dbview.Database db,
+    object persisted_query,
+    object query,
+):
+    # Returns None if the document of the hash is not known.
+    if not isinstance(persisted_query, dict):
+        raise TypeError('"persistedQuery" must be a JSON object')
+    if persisted_query.get('version') != 1:
+        raise TypeError('unsupported persisted query version')
+    sha256_hash = persisted_query.get('sha256Hash')
+    if not isinstance(sha256_hash, str):
+        raise TypeError('"sha256Hash" must be a string')
+    sha256_hash = sha256_hash.lower()
+
+    store = db.graphql_persisted_queries
+    entry = store.get(sha256_hash)
+    if query is None:
+        return entry
+
+    if not isinstance(query, str):
+        raise TypeError('"query" must be a string')
+    if entry is None or entry.query != query:
+        if hashlib.sha256(query.encode('utf-8')).hexdigest() != sha256_hash:
+            raise ValueError('provided sha does not match query')
+        entry = PersistedQuery(query)
+        store[sha256_hash] = entry
+    return entry
+
+
+def _rewrite(operation_name, query):
+    try:
+        return _graphql_rewrite.rewrite(operation_name, query)
+    except _graphql_rewrite.QueryError as e:
+        raise errors.QueryError(e.args[0])
+    except Exception as e:
+        if isinstance(e, _USER_ERRORS):
+            logger.info("Error rewriting graphql query: %r", e)
+        else:
+            logger.warning("Error rewriting graphql query: %r", e)
+        return None
 
 
 async def compile(
@@ -285,7 +469,8 @@ async def compile(
         )
 
 async def _execute(
-    db, role_name, tenant, query, operation_name, variables, globals, config
+    db, role_name, tenant, query, operation_name, variables, globals, config,
+    PersistedQuery persisted=None,
 ):
     dbver = db.dbver
     query_cache = tenant.server._http_query_cache
@@ -303,17 +488,11 @@ async def _execute(
         print(query)
         print(f'variables: {variables}')
 
-    try:
-        rewritten = _graphql_rewrite.rewrite(operation_name, query)
-    except _graphql_rewrite.QueryError as e:
-        raise errors.QueryError(e.args[0])
-    except Exception as e:
-        if isinstance(e, _USER_ERRORS):
-            logger.info("Error rewriting graphql query: %r", e)
-        else:
-            logger.warning("Error rewriting graphql query: %r", e)
-        rewritten = None
-        rewrite_error = e
+    if persisted is not None:
+        rewritten = persisted.rewrite(operation_name)
+    else:
+        rewritten = _rewrite(operation_name, query)
+    if rewritten is None:
         prepared_query = query
         vars = variables.copy() if variables else {}
     else:
@@ -345,8 +524,11 @@ async def _execute(
         dbv.get_session_config()
     )
 
+    # The cache is shared by all branches, dbver is enough to tell their
+    # entries apart but the branch name is there for the metrics.
     cache_key = (
-        'graphql', prepared_query, (), operation_name, dbver, config_key
+        'graphql', db.name, prepared_query, (), operation_name, dbver,
+        config_key,
     )
     use_prep_stmt = False
 
@@ -360,10 +542,16 @@ async def _execute(
 
         key_vars2 = tuple(vars[k] for k in entry.key_vars)
         cache_key2 = (
-            prepared_query, key_vars2, operation_name, dbver, config_key
+            'graphql', db.name, prepared_query, key_vars2, operation_name,
+            dbver, config_key,
         )
         entry = query_cache.get(cache_key2, None)
 
+    if query_cache_enabled:
+        db.record_query_cache_action(
+            'graphql', 'miss' if entry is None else 'hit'
+        )
+
     if entry is None:
         if rewritten is not None:
             qug, gql_op = await compile(
@@ -393,11 +581,17 @@ async def _execute(
             query_cache[cache_key] = redir
             key_vars2 = tuple(vars[k] for k in key_var_names)
             cache_key2 = (
-                'graphql', prepared_query, key_vars2, operation_name, dbver
+                'graphql', db.name, prepared_query, key_vars2,
+                operation_name, dbver, config_key,
             )
             query_cache[cache_key2] = qug, gql_op
         else:
             query_cache[cache_key] = qug, gql_op
+        while query_cache.needs_cleanup():
+            (_, evicted_dbname, *_), _ = query_cache.cleanup_one()
+            evicted_db = tenant.maybe_get_db(dbname=evicted_dbname)
+            if evicted_db is not None:
+                evicted_db.record_query_cache_action('graphql', 'evict')
         metrics.graphql_query_compilations.inc(
             1.0, tenant.get_instance_name(), 'compiler'
         )
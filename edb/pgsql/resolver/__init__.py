@@ -21,6 +21,7 @@ from typing import Optional
 
 import copy
 import dataclasses
+import uuid
 
 from edb.common import debug
 from edb.pgsql import ast as pgast
@@ -55,6 +56,9 @@ class ResolvedSQL:
 
     capabilities: enums.Capability = enums.Capability.NONE
 
+    # Ids of the schema objects the query depends on
+    schema_refs: frozenset[uuid.UUID] = frozenset()
+
 
 def resolve(
     query: pgast.Query | pgast.CopyStmt,
@@ -167,6 +171,7 @@ def resolve(
         command_complete_tag=command_complete_tag,
         params=ctx.query_params,
         capabilities=ctx.env.capabilities,
+        schema_refs=frozenset(ctx.env.schema_refs),
     )
 
 
@@ -2743,6 +2743,8 @@ def _try_inject_type_cast(
 def merge_params(
     sql_result: pgcompiler.CompileResult, ir_stmt: irast.Statement, ctx: Context
 ):
+    ctx.env.schema_refs.update(obj.id for obj in ir_stmt.schema_refs)
+
     # Merge the params produced by the main compiler with params for the rest of
     # the query that the resolved is keeping track of.
     param_remapping: dict[int, int] = {}
@@ -235,6 +235,9 @@ class Environment:
     # Capabilities required by the query
     capabilities: enums.Capability = enums.Capability.NONE
 
+    # Ids of the schema objects the query depends on
+    schema_refs: set[uuid.UUID] = field(default_factory=set)
+
 
 class ResolverContextLevel(compiler.ContextLevel):
 
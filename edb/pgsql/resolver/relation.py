@@ -322,6 +322,7 @@ def resolve_relation(
 
     # extract table name
     table = context.Table(schema_id=obj.id, name=relation.name)
+    _add_schema_refs(obj, ctx)
 
     # extract table columns
     # when changing this, make sure to update sql information_schema
@@ -376,6 +377,24 @@ def resolve_relation(
     return rel, table
 
 
+def _add_schema_refs(
+    obj: s_sources.Source | s_properties.Property, ctx: Context
+) -> None:
+    # The table depends on the object, its pointers (which make up the
+    # columns) and, for link tables, the sources (for access policies).
+    schema_refs = ctx.env.schema_refs
+    schema_refs.add(obj.id)
+    if isinstance(obj, s_sources.Source):
+        schema_refs.update(
+            p.id for p in obj.get_pointers(ctx.schema).objects(ctx.schema)
+        )
+    source: object = obj
+    while isinstance(source, s_pointers.Pointer):
+        source = source.get_source(ctx.schema)
+        if source is not None:
+            schema_refs.add(source.id)
+
+
 def _has_access_policies(
     obj: s_sources.Source | s_properties.Property, ctx: Context
 ):
@@ -522,6 +522,8 @@ class CompilationFlag(enum.IntFlag):
 class DumpFlag(enum.IntFlag):
 
     DUMP_SECRETS = 1 << 0    # noqa
+    COMPRESS_ZSTD = 1 << 1   # noqa
+    COMPRESS_LZ4 = 1 << 2    # noqa
 
 
 class ErrorSeverity(enum.Enum):
@@ -577,7 +579,7 @@ class RestoreReady(ServerMessage):
     mtype = MessageType('+')
     message_length = MessageLength
     annotations = Annotations
-    jobs = UInt16('Number of parallel jobs for restore, currently always "1"')
+    jobs = UInt16('Number of parallel jobs the server uses for restore.')
 
 
 class DataElement(Struct):
@@ -598,6 +600,14 @@ class CommandComplete(ServerMessage):
     state_data = Bytes('Encoded state data.')
 
 
+class CursorSuspended(ServerMessage):
+
+    mtype = MessageType('u')
+    message_length = MessageLength
+    annotations = Annotations
+    cursor_name = String('Name of the cursor that has more rows to fetch.')
+
+
 class CommandDataDescription(ServerMessage):
 
     mtype = MessageType('T')
@@ -771,8 +781,7 @@ class Restore(ClientMessage):
     mtype = MessageType('<')
     message_length = MessageLength
     attributes = KeyValues
-    jobs = UInt16(
-        'Number of parallel jobs for restore (only "1" is supported)')
+    jobs = UInt16('Number of parallel jobs requested for restore.')
     header_data = Bytes(
         'Original DumpHeader packet data excluding mtype and message_length')
 
@@ -833,6 +842,49 @@ class Execute(ClientMessage):
     arguments = Bytes('Encoded argument data.')
 
 
+class OpenCursor(ClientMessage):
+
+    mtype = MessageType('o')
+    message_length = MessageLength
+    annotations = Annotations
+    allowed_capabilities = EnumOf(UInt64, Capability,
+                                  'A bit mask of allowed capabilities.')
+    compilation_flags = EnumOf(UInt64, CompilationFlag,
+                               'A bit mask of query options.')
+    implicit_limit = UInt64('Implicit LIMIT clause on returned sets.')
+    input_language = EnumOf(UInt8, InputLanguage, 'Command source language.')
+    output_format = EnumOf(UInt8, OutputFormat, 'Data output format.')
+    expected_cardinality = EnumOf(UInt8, Cardinality,
+                                  'Expected result cardinality.')
+    command_text = String('Command text.')
+    state_typedesc_id = UUID('State data descriptor ID.')
+    state_data = Bytes('Encoded state data.')
+
+    input_typedesc_id = UUID('Argument data descriptor ID.')
+    output_typedesc_id = UUID('Output data descriptor ID.')
+    arguments = Bytes('Encoded argument data.')
+
+    cursor_name = String('Name of the cursor.')
+    fetch_size = UInt32('Number of rows to return, 0 to return all of them.')
+
+
+class FetchCursor(ClientMessage):
+
+    mtype = MessageType('F')
+    message_length = MessageLength
+    annotations = Annotations
+    cursor_name = String('Name of the cursor.')
+    fetch_size = UInt32('Number of rows to return, 0 to return all of them.')
+
+
+class CloseCursor(ClientMessage):
+
+    mtype = MessageType('c')
+    message_length = MessageLength
+    annotations = Annotations
+    cursor_name = String('Name of the cursor.')
+
+
 class ConnectionParam(Struct):
 
     name = String()
@@ -25,6 +25,7 @@ from typing import (
     Iterable,
     Iterator,
     Mapping,
+    NamedTuple,
     NoReturn,
     Optional,
     overload,
@@ -701,6 +702,58 @@ class Schema(abc.ABC):
         )
 
 
+# Added or changed entries, and removed keys of an immutable map.
+MapDelta = tuple[dict[Any, Any], tuple[Any, ...]]
+
+
+class FlatSchemaDelta(NamedTuple):
+    """A difference between two generations of a FlatSchema.
+
+    Each field holds the entries that were added or changed and the keys
+    that were removed from the corresponding FlatSchema map.  Deltas are
+    produced by FlatSchema.get_delta() and consumed by
+    FlatSchema.apply_delta().
+    """
+
+    id_to_data: MapDelta
+    id_to_type: MapDelta
+    name_to_id: MapDelta
+    shortname_to_id: MapDelta
+    globalname_to_id: MapDelta
+    refs_to: MapDelta
+    generation: int
+
+
+def _diff_maps(
+    new: immu.Map[Any, Any],
+    base: immu.Map[Any, Any],
+) -> MapDelta:
+    if new is base:
+        return {}, ()
+    # Unchanged entries are shared between schema generations, so an
+    # identity check is enough to tell them apart from the changed ones.
+    missing = object()
+    updated = {
+        k: v for k, v in new.items() if base.get(k, missing) is not v
+    }
+    removed = tuple(k for k in base.keys() if k not in new)
+    return updated, removed
+
+
+def _patch_map(
+    base: immu.Map[Any, Any],
+    delta: MapDelta,
+) -> immu.Map[Any, Any]:
+    updated, removed = delta
+    if not updated and not removed:
+        return base
+    mm = base.mutate()
+    for k in removed:
+        mm.pop(k, None)
+    mm.update(updated)
+    return mm.finish()
+
+
 class FlatSchema(Schema):
 
     _id_to_data: immu.Map[uuid.UUID, tuple[Any, ...]]
@@ -1421,6 +1474,54 @@ class FlatSchema(Schema):
             extra_filters=extra_filters,
         )
 
+    def get_delta(self, base: FlatSchema) -> FlatSchemaDelta:
+        """Compute the changes that turn *base* into this schema.
+
+        The result is only meaningful if this schema was derived from
+        *base*, as unchanged entries are detected by identity.
+        """
+        return FlatSchemaDelta(
+            id_to_data=_diff_maps(self._id_to_data, base._id_to_data),
+            id_to_type=_diff_maps(self._id_to_type, base._id_to_type),
+            name_to_id=_diff_maps(self._name_to_id, base._name_to_id),
+            shortname_to_id=_diff_maps(
+                self._shortname_to_id, base._shortname_to_id),
+            globalname_to_id=_diff_maps(
+                self._globalname_to_id, base._globalname_to_id),
+            refs_to=_diff_maps(self._refs_to, base._refs_to),
+            generation=self._generation,
+        )
+
+    def apply_delta(self, delta: FlatSchemaDelta) -> FlatSchema:
+        """Return a new schema with *delta* applied on top of this one."""
+        new = self._replace(
+            id_to_data=_patch_map(self._id_to_data, delta.id_to_data),
+            id_to_type=_patch_map(self._id_to_type, delta.id_to_type),
+            name_to_id=_patch_map(self._name_to_id, delta.name_to_id),
+            shortname_to_id=_patch_map(
+                self._shortname_to_id, delta.shortname_to_id),
+            globalname_to_id=_patch_map(
+                self._globalname_to_id, delta.globalname_to_id),
+            refs_to=_patch_map(self._refs_to, delta.refs_to),
+        )
+        new._generation = delta.generation
+        return new
+
+    def get_ids_by_local_name(self, names: Iterable[str]) -> set[uuid.UUID]:
+        """Return the ids of the objects named any of *names* in any module.
+
+        Functions and operators are matched by their short names.
+        """
+        names = frozenset(names)
+        rv = {
+            obj_id for name, obj_id in self._name_to_id.items()
+            if name.name in names
+        }
+        for (_mcls, shortname), obj_ids in self._shortname_to_id.items():
+            if shortname.name in names:
+                rv.update(obj_ids)
+        return rv
+
     def __repr__(self) -> str:
         return (
             f'<{type(self).__name__} gen:{self._generation} at {id(self):#x}>')
@@ -259,6 +259,7 @@ class ServerConfig(NamedTuple):
     compiler_pool_addr: tuple[str, int]
     compiler_pool_tenant_cache_size: int
     compiler_worker_max_rss: Optional[int]
+    compiler_worker_branch_budget: Optional[int]
 
     echo_runtime_info: bool
     emit_server_status: str
@@ -1166,6 +1167,16 @@ server_options = typeutils.chain_decorators([
              'Each worker is free from this limit in its first 20-30 hours '
              'after spawn to avoid infinite restarts or a thundering herd.',
     ),
+    click.option(
+        '--compiler-worker-branch-budget',
+        type=int,
+        envvar="GEL_SERVER_COMPILER_WORKER_BRANCH_BUDGET",
+        cls=EnvvarResolver,
+        help='Maximum estimated size (in bytes) of the branch schemas each '
+             'compiler worker could cache. Least recently used branches are '
+             'evicted to make room, in addition to the count limit of '
+             '--compiler-worker-branch-limit. Not limited by default.',
+    ),
 ])
 
 
@@ -1191,6 +1202,16 @@ compiler_options = typeutils.chain_decorators([
              "it keeps pickled copies of schemas from all active clients "
              "(each capped by --compiler-worker-branch-limit of the client)."
     ),
+    click.option(
+        "--result-cache-size",
+        type=int,
+        envvar="GEL_COMPILER_RESULT_CACHE_SIZE",
+        cls=EnvvarResolver,
+        default=1000,
+        help="Maximum number of compiled queries the compiler server keeps to "
+             "serve identical requests of all clients without compiling "
+             "again. Set to 0 to disable. Default is 1000."
+    ),
     click.option(
         '-I', '--listen-addresses', type=str, multiple=True,
         envvar="GEL_COMPILER_BIND_ADDRESS", cls=EnvvarResolver,
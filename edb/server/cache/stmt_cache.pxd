@@ -17,6 +17,23 @@
 #
 
 
+from libc.stdint cimport int64_t, uint64_t
+
+
+cdef class FrequencySketch:
+
+    cdef:
+        bytearray _table
+        uint64_t _mask
+        int _additions
+        int _sample_size
+
+    cpdef increment(self, key)
+    cpdef int estimate(self, key)
+    cpdef reset(self)
+    cdef inline uint64_t _index(self, uint64_t h, int row)
+
+
 cdef class StatementsCache:
 
     cdef:
@@ -24,8 +41,12 @@ cdef class StatementsCache:
         int _maxsize
         object _dict_move_to_end
         object _dict_get
+        FrequencySketch _sketch
+        object _weigher
 
     cpdef get(self, key, default)
     cpdef needs_cleanup(self)
     cpdef cleanup_one(self)
     cpdef resize(self, int maxsize)
+    cdef _find_victim(self)
+    cdef double _retention(self, key, o)
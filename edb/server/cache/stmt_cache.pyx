@@ -22,6 +22,79 @@ import collections
 
 cdef object _LRU_MARKER = object()
 
+# Row seeds of FrequencySketch, odd 64-bit constants
+cdef uint64_t[4] _SKETCH_SEEDS = [
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+]
+cdef int _SKETCH_DEPTH = 4
+cdef int _SKETCH_MAX_COUNT = 15
+cdef bytes _HALVE = bytes(i >> 1 for i in range(256))
+
+# How many least recently used entries are considered for eviction
+cdef int _EVICTION_SAMPLE = 8
+
+
+cdef class FrequencySketch:
+
+    # A count-min sketch of how often keys were looked up recently, as
+    # used by the TinyLFU cache admission policy.  Counters saturate at
+    # 15 and are all halved once the number of increments reaches ten
+    # times the cache size, so that old popularity fades away.
+
+    def __init__(self, *, size):
+        cdef uint64_t width = 16
+        while width < <uint64_t>size:
+            width <<= 1
+        self._mask = width - 1
+        self._table = bytearray(width * _SKETCH_DEPTH)
+        self._sample_size = max(10 * size, 16)
+        self._additions = 0
+
+    cpdef increment(self, key):
+        cdef:
+            int64_t h = hash(key)
+            uint64_t index
+            int i
+            bint added = False
+
+        for i in range(_SKETCH_DEPTH):
+            index = self._index(<uint64_t>h, i)
+            if self._table[index] < _SKETCH_MAX_COUNT:
+                self._table[index] += 1
+                added = True
+
+        if added:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._table = self._table.translate(_HALVE)
+                self._additions //= 2
+
+    cpdef int estimate(self, key):
+        cdef:
+            int64_t h = hash(key)
+            int i
+            int count
+            int rv = _SKETCH_MAX_COUNT
+
+        for i in range(_SKETCH_DEPTH):
+            count = self._table[self._index(<uint64_t>h, i)]
+            if count < rv:
+                rv = count
+        return rv
+
+    cpdef reset(self):
+        self._table = bytearray(len(self._table))
+        self._additions = 0
+
+    cdef inline uint64_t _index(self, uint64_t h, int row):
+        return (
+            <uint64_t>row * (self._mask + 1)
+            + (((h ^ (h >> 32)) * _SKETCH_SEEDS[row]) >> 32 & self._mask)
+        )
+
 
 cdef class StatementsCache:
 
@@ -42,14 +115,28 @@ cdef class StatementsCache:
     # So new entries and hits are always promoted to the end of the
     # entries dict, whereas the unused one will group in the
     # beginning of it.
-
-    def __init__(self, *, maxsize):
+    #
+    # If a *weigher* is given, the cache is frequency- and cost-aware
+    # instead (TinyLFU): every lookup is counted in a FrequencySketch,
+    # and entries are valued by their recent lookup frequency times
+    # `weigher(value)`, e.g. how expensive an entry is to recreate for
+    # its size.  A new entry is only admitted into a full cache if it's
+    # worth more than the entry it would evict, and the entry evicted is
+    # the least valued of the _EVICTION_SAMPLE least recently used ones,
+    # so that a burst of one-off entries doesn't flush the hot ones.
+
+    def __init__(self, *, maxsize, weigher=None):
         self.resize(maxsize)
         self._dict = collections.OrderedDict()
         self._dict_move_to_end = self._dict.move_to_end
         self._dict_get = self._dict.get
+        self._weigher = weigher
+        if weigher is not None:
+            self._sketch = FrequencySketch(size=maxsize)
 
     cpdef get(self, key, default):
+        if self._sketch is not None:
+            self._sketch.increment(key)
         o = self._dict_get(key, _LRU_MARKER)
         if o is _LRU_MARKER:
             return default
@@ -60,14 +147,53 @@ cdef class StatementsCache:
         return len(self._dict) > self._maxsize
 
     cpdef cleanup_one(self):
-        return self._dict.popitem(last=False)
+        if self._sketch is None:
+            return self._dict.popitem(last=False)
+        key = self._find_victim()
+        return key, self._dict.pop(key)
 
     cpdef resize(self, int maxsize):
         if maxsize <= 0:
             raise ValueError(
                 f'maxsize is expected to be greater than 0, got {maxsize}')
+        if self._sketch is not None and maxsize != self._maxsize:
+            self._sketch = FrequencySketch(size=maxsize)
         self._maxsize = maxsize
 
+    def admits(self, key, o):
+        """Tell if adding *key* wouldn't evict a more valuable entry."""
+        if (
+            self._sketch is None
+            or len(self._dict) < self._maxsize
+            or key in self._dict
+        ):
+            return True
+        victim = self._find_victim()
+        return (
+            self._retention(key, o)
+            > self._retention(victim, self._dict[victim])
+        )
+
+    cdef _find_victim(self):
+        cdef:
+            int i = 0
+            double value
+            double min_value = 0
+
+        victim = _LRU_MARKER
+        for key, o in self._dict.items():
+            value = self._retention(key, o)
+            if victim is _LRU_MARKER or value < min_value:
+                victim = key
+                min_value = value
+            i += 1
+            if i >= _EVICTION_SAMPLE:
+                break
+        return victim
+
+    cdef double _retention(self, key, o):
+        return (self._sketch.estimate(key) + 1) * self._weigher(o)
+
     def items(self):
         return self._dict.items()
 
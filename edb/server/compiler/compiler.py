@@ -35,6 +35,7 @@ import dataclasses
 import functools
 import json
 import hashlib
+import itertools
 import pickle
 import textwrap
 import time
@@ -71,6 +72,7 @@ from edb.schema import ddl as s_ddl
 from edb.schema import delta as s_delta
 from edb.schema import extensions as s_ext
 from edb.schema import functions as s_func
+from edb.schema import futures as s_futures
 from edb.schema import links as s_links
 from edb.schema import properties as s_props
 from edb.schema import modules as s_mod
@@ -78,6 +80,7 @@ from edb.schema import name as s_name
 from edb.schema import objects as s_obj
 from edb.schema import objtypes as s_objtypes
 from edb.schema import pointers as s_pointers
+from edb.schema import referencing as s_referencing
 from edb.schema import reflection as s_refl
 from edb.schema import roles as s_role
 from edb.schema import schema as s_schema
@@ -2043,6 +2046,7 @@ def _compile_ql_query(
         query_asts=query_asts,
         warnings=ir.warnings,
         unsafe_isolation_dangers=ir.unsafe_isolation_dangers,
+        schema_refs=frozenset(obj.id for obj in ir.schema_refs),
     )
 
 
@@ -2696,9 +2700,7 @@ def compile_graphql(
         variables=variables,
         native_input=True,
     )
-    eql_source = edgeql.Source.from_string(
-        edgeql.generate_source(gql_op.edgeql_ast, pretty=True),
-    )
+    eql_source = edgeql.ASTSource([gql_op.edgeql_ast])
 
     qug = compile(ctx=ctx, source=eql_source)
     if gql_op.cache_deps_vars:
@@ -2727,6 +2729,9 @@ def compile(
         )
         return _try_compile(ctx=ctx, source=original)
 
+    if isinstance(source, edgeql.ASTSource):
+        return _compile_ast_source(ctx=ctx, source=source)
+
     try:
         return _try_compile(ctx=ctx, source=source)
     except errors.EdgeQLSyntaxError as original_err:
@@ -2747,6 +2752,30 @@ def compile(
             raise original_err
 
 
+def _compile_ast_source(
+    *,
+    ctx: CompileContext,
+    source: edgeql.ASTSource,
+) -> dbstate.QueryUnitGroup:
+    try:
+        return _try_compile_ast(
+            ctx=ctx, statements=source.statements(), source=source)
+    except errors.EdgeDBError as original_err:
+        # The statements were not parsed from text, so their nodes
+        # carry no spans.  Compile the rendered text to get an error
+        # that points into it.
+        rendered_err: Optional[errors.EdgeDBError] = None
+        try:
+            rendered = source.denormalized()
+            ctx = dataclasses.replace(ctx, source=rendered)
+            _try_compile(ctx=ctx, source=rendered)
+        except errors.EdgeDBError as e:
+            rendered_err = e
+        except Exception:
+            pass
+        raise rendered_err or original_err
+
+
 def compile_sql_as_unit_group(
     *,
     ctx: CompileContext,
@@ -2857,6 +2886,7 @@ def compile_sql_as_unit_group(
             ),
             source_map=sql_unit.source_map,
             sql_prefix_len=sql_unit.prefix_len,
+            schema_refs=sql_unit.schema_refs,
         )
         match sql_unit.tx_action:
             case dbstate.TxAction.START:
@@ -3117,6 +3147,7 @@ def _make_query_unit(
         unit.in_type_args = comp.in_type_args
 
         unit.sql_hash = comp.sql_hash
+        unit.schema_refs = comp.schema_refs
 
         unit.out_type_data = comp.out_type_data
         unit.out_type_id = comp.out_type_id
@@ -3304,6 +3335,18 @@ def _make_query_unit(
     else:  # pragma: no cover
         raise errors.InternalServerError('unknown compile state')
 
+    if final_user_schema is not None and (
+        unit.tx_commit or ctx.state.current_tx().is_implicit()
+    ):
+        # This unit is going to be applied to the database, so describe
+        # the new schema relative to the one this compilation started from
+        # to let the server sync compiler workers incrementally.
+        (
+            unit.user_schema_delta,
+            unit.user_schema_delta_base,
+            unit.user_schema_affected_ids,
+        ) = _make_user_schema_delta(ctx, final_user_schema)
+
     if unit.in_type_args:
         unit.in_type_args_real_count = sum(
             len(p.sub_params[0]) if p.sub_params else 1
@@ -3320,6 +3363,107 @@ def _make_query_unit(
     return unit, final_user_schema
 
 
+def _make_user_schema_delta(
+    ctx: CompileContext,
+    user_schema: s_schema.Schema,
+) -> tuple[
+    Optional[bytes],
+    Optional[uuid.UUID],
+    Optional[frozenset[uuid.UUID]],
+]:
+    base_schema = ctx.state.root_user_schema
+    if not (
+        isinstance(user_schema, s_schema.FlatSchema)
+        and isinstance(base_schema, s_schema.FlatSchema)
+    ):
+        return None, None, None
+
+    try:
+        base_version = _get_schema_version(base_schema)
+    except errors.InvalidReferenceError:
+        return None, None, None
+
+    delta = user_schema.get_delta(base_schema)
+    affected_ids = _get_user_schema_affected_ids(
+        delta, base_schema, user_schema, ctx.compiler_state.std_schema
+    )
+    return pickle.dumps(delta, -1), base_version, affected_ids
+
+
+# Changes to objects of these classes may change the compilation of
+# any query.
+_SCHEMA_WIDE_CLASSES = (
+    s_ext.Extension,
+    s_futures.FutureBehavior,
+    s_mod.Module,
+)
+
+
+def _get_user_schema_affected_ids(
+    delta: s_schema.FlatSchemaDelta,
+    base_schema: s_schema.FlatSchema,
+    user_schema: s_schema.FlatSchema,
+    std_schema: s_schema.Schema,
+) -> Optional[frozenset[uuid.UUID]]:
+    """Return the ids of the objects whose uses *delta* may change.
+
+    These are the objects that were changed or removed along with their
+    owners (e.g. the type of a changed access policy, trigger or pointer
+    default, as queries refer to the type but not to those), the objects
+    that gained or lost a reference from another one (e.g. the bases of a
+    new type, as they have a new descendant now), and all objects sharing
+    the local name of an added or removed object, as names may resolve
+    differently now.  A compiled query that refers to none of them is
+    still valid in the new schema.
+
+    Returns None if the delta may change the compilation of any query.
+    """
+    if not isinstance(std_schema, s_schema.FlatSchema):
+        return None
+
+    updated, removed = delta.id_to_data
+    affected = set(updated)
+    affected.update(removed)
+    owners: set[uuid.UUID] = set()
+    for obj_id in affected:
+        for schema in (user_schema, base_schema):
+            obj = schema.get_by_id(obj_id, None)
+            if isinstance(obj, _SCHEMA_WIDE_CLASSES):
+                return None
+            # E.g. the pointer of a rewrite, and then the type of it
+            while isinstance(obj, s_referencing.ReferencedObject):
+                obj = obj.get_subject(schema)
+                if obj is not None:
+                    owners.add(obj.id)
+    affected.update(owners)
+
+    refs_updated, refs_removed = delta.refs_to
+    for obj_id in itertools.chain(refs_updated, refs_removed):
+        std_obj = std_schema.get_by_id(obj_id, None)
+        if std_obj is None or isinstance(std_obj, s_objtypes.ObjectType):
+            # Either a user object, or std::Object and such getting a new
+            # descendant.  New references to other std objects, e.g. the
+            # target of a new property, don't change how they compile.
+            affected.add(obj_id)
+
+    names: set[str] = set()
+    names_updated, names_removed = delta.name_to_id
+    for name in itertools.chain(names_updated, names_removed):
+        # Derived objects, such as pointers, are never looked up by name
+        if not s_name.is_fullname(str(name)):
+            names.add(name.name)
+    shortnames_updated, shortnames_removed = delta.shortname_to_id
+    for _mcls, shortname in itertools.chain(
+        shortnames_updated, shortnames_removed
+    ):
+        names.add(shortname.name)
+    if names:
+        for schema in (std_schema, base_schema, user_schema):
+            affected.update(schema.get_ids_by_local_name(names))
+
+    return frozenset(affected)
+
+
 def _extract_params(
     params: list[irast.Param],
     *,
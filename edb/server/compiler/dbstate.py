@@ -136,6 +136,8 @@ class Query(BaseQuery):
     query_asts: Any = None
     run_and_rollback: bool = False
 
+    schema_refs: Optional[frozenset[uuid.UUID]] = None
+
 
 @dataclasses.dataclass(frozen=True, kw_only=True)
 class SimpleQuery(BaseQuery):
@@ -249,6 +251,11 @@ class QueryUnit:
     # as prepared statements in Postgres.
     sql_hash: bytes = b""
 
+    # Ids of the schema objects this unit was compiled against, so that
+    # it can stay cached across schema changes that don't touch them.
+    # None if not known.
+    schema_refs: Optional[frozenset[uuid.UUID]] = None
+
     # True if all statements in *sql* can be executed inside a transaction.
     # If False, they will be executed separately.
     is_transactional: bool = True
@@ -365,6 +372,15 @@ class QueryUnit:
     # latest user schema, which is self.user_schema if changed, or the user
     # schema this QueryUnit was compiled upon.
     user_schema_version: uuid.UUID | None = None
+    # If present, a pickled s_schema.FlatSchemaDelta that turns the user
+    # schema of version user_schema_delta_base into user_schema.  Used to
+    # sync compiler workers without shipping the full user_schema pickle.
+    user_schema_delta: Optional[bytes] = None
+    user_schema_delta_base: uuid.UUID | None = None
+    # If user_schema_delta is present, the ids of the schema objects whose
+    # uses in compiled queries the delta may change, or None if it may
+    # change the compilation of any query.
+    user_schema_affected_ids: Optional[frozenset[uuid.UUID]] = None
     cached_reflection: Optional[bytes] = None
     extensions: Optional[set[str]] = None
     ext_config_settings: Optional[list[config.Setting]] = None
@@ -465,6 +481,9 @@ class QueryUnitGroup:
 
     cache_state: int = 0
     tx_seq_id: int = 0
+    # How long it took to compile the group, in seconds, for the
+    # cost-aware query cache of the I/O server; 0 if not known.
+    compile_time: float = 0.0
 
     force_non_normalized: bool = False
 
@@ -660,6 +679,10 @@ class SQLQueryUnit:
 
     params: Optional[list[SQLParam]] = None
 
+    schema_refs: Optional[frozenset[uuid.UUID]] = None
+    """Ids of the schema objects the translation depends on, or None
+    if not known."""
+
 
 class CommandCompleteTag:
     """Dictates the tag of CommandComplete message that concludes this query."""
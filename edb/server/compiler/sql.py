@@ -396,6 +396,7 @@ def _compile_sql(
             )
             unit.command_complete_tag = dbstate.TagPlain(tag=b"PREPARE")
             unit.capabilities |= stmt_resolved.capabilities
+            unit.schema_refs = stmt_resolved.schema_refs
             track_stats = True
 
         elif isinstance(stmt, pgast.ExecuteStmt):
@@ -481,6 +482,7 @@ def _compile_sql(
             else:
                 unit.cardinality = enums.Cardinality.MANY
             unit.capabilities |= stmt_resolved.capabilities
+            unit.schema_refs = stmt_resolved.schema_refs
             track_stats = True
         else:
             from edb.pgsql import resolver as pg_resolver
@@ -34,33 +34,66 @@ _uint64_packer = struct.Struct('!Q').pack
 
 
 class MessageStream:
-    """Data stream that yields messages."""
+    """Data stream that yields messages.
 
-    _buffer: bytes
+    Messages are yielded as memoryviews without copying whenever possible:
+    a message that arrives within a single chunk of data is a view into
+    that chunk, while a message spanning multiple chunks is reassembled
+    into a buffer preallocated to the exact message length, so every byte
+    is copied at most once regardless of the message size.
+    """
+
+    _header: bytearray
     _curmsg_len: int
+    _curmsg_buf: Optional[bytearray]
+    _curmsg_received: int
 
     def __init__(self) -> None:
-        self._buffer = b''
+        self._header = bytearray()
         self._curmsg_len = -1
-
-    def feed_data(self, data: bytes) -> Generator[bytes, None, None]:
-        # TODO: rewrite to avoid buffer copies.
-        self._buffer += data
-        while self._buffer:
+        self._curmsg_buf = None
+        self._curmsg_received = 0
+
+    def feed_data(self, data: bytes) -> Generator[memoryview, None, None]:
+        view = memoryview(data)
+        pos = 0
+        end = len(view)
+        while pos < end:
             if self._curmsg_len == -1:
-                if len(self._buffer) >= 8:
-                    self._curmsg_len = _uint64_unpacker(self._buffer[:8])[0]
-                    self._buffer = self._buffer[8:]
+                if not self._header and end - pos >= 8:
+                    self._curmsg_len = _uint64_unpacker(view[pos:pos + 8])[0]
+                    pos += 8
                 else:
-                    return
-
-            if self._curmsg_len > 0 and len(self._buffer) >= self._curmsg_len:
-                msg = self._buffer[:self._curmsg_len]
-                self._buffer = self._buffer[self._curmsg_len:]
+                    # The length prefix is split between chunks.
+                    need = min(8 - len(self._header), end - pos)
+                    self._header += view[pos:pos + need]
+                    pos += need
+                    if len(self._header) < 8:
+                        return
+                    self._curmsg_len = _uint64_unpacker(self._header)[0]
+                    self._header.clear()
+
+            if self._curmsg_buf is None:
+                if end - pos >= self._curmsg_len:
+                    msg = view[pos:pos + self._curmsg_len]
+                    pos += self._curmsg_len
+                    self._curmsg_len = -1
+                    yield msg
+                    continue
+                self._curmsg_buf = bytearray(self._curmsg_len)
+                self._curmsg_received = 0
+
+            received = self._curmsg_received
+            size = min(end - pos, self._curmsg_len - received)
+            self._curmsg_buf[received:received + size] = view[pos:pos + size]
+            self._curmsg_received = received + size
+            pos += size
+
+            if self._curmsg_received == self._curmsg_len:
+                msg = memoryview(self._curmsg_buf)
+                self._curmsg_buf = None
                 self._curmsg_len = -1
                 yield msg
-            else:
-                return
 
 
 class HubProtocol(asyncio.Protocol):
@@ -108,8 +141,7 @@ class HubProtocol(asyncio.Protocol):
             (_uint64_packer(len(payload) + 8), _uint64_packer(req_id), payload)
         )
 
-    def process_message(self, msg: bytes) -> None:
-        msgview = memoryview(msg)
+    def process_message(self, msgview: memoryview) -> None:
         req_id = _uint64_unpacker(msgview[:8])[0]
         waiter = self._resp_waiters.pop(req_id, None)
         if waiter is None:
@@ -199,8 +231,7 @@ class WorkerConnection:
         )
         self._stream = MessageStream()
 
-    def _on_message(self, msg: bytes) -> tuple[int, memoryview]:
-        msgview = memoryview(msg)
+    def _on_message(self, msgview: memoryview) -> tuple[int, memoryview]:
         req_id = _uint64_unpacker(msgview[:8])[0]
         return req_id, msgview[8:]
 
@@ -285,9 +285,7 @@ def compile_graphql(
         **compile_kwargs
     )
 
-    source = edgeql.Source.from_string(
-        edgeql.generate_source(gql_op.edgeql_ast, pretty=True),
-    )
+    source = edgeql.ASTSource([gql_op.edgeql_ast])
 
     cfg_ser = COMPILER.state.compilation_config_serializer
     request = compiler.CompilationRequest(
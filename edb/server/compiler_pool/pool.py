@@ -23,6 +23,7 @@ from typing import (
     Callable,
     cast,
     Hashable,
+    Iterable,
     Mapping,
     NamedTuple,
     Optional,
@@ -34,7 +35,9 @@ import collections
 import dataclasses
 import functools
 import hmac
+import itertools
 import logging
+import math
 import os
 import os.path
 import pickle
@@ -43,10 +46,12 @@ import signal
 import subprocess
 import sys
 import time
+import uuid
 
 import immutables
 import psutil
 
+from edb import errors
 from edb.common import debug
 from edb.common import lru
 
@@ -62,10 +67,10 @@ from edb.server import metrics
 
 from . import amsg
 from . import queue
+from . import schema_store
 from . import state
 
 if TYPE_CHECKING:
-    from edb import errors
     from edb import graphql
     from edb.server.compiler import compiler
     from edb.server.compiler import config as config_compiler
@@ -101,8 +106,41 @@ HEALTH_CHECK_MIN_INTERVAL: float = float(
 HEALTH_CHECK_TIMEOUT: float = float(
     os.getenv("GEL_COMPILER_HEALTH_CHECK_TIMEOUT", 10)
 )
+# Pickles of at least this size are passed to local compiler workers
+# through the shared schema store rather than over the socket.
+SHARED_PICKLE_MIN_SIZE: int = int(
+    os.getenv("GEL_COMPILER_SHARED_PICKLE_MIN_SIZE", 256 * 1024)
+)
+# How many idle workers holding a stale schema of a branch are synced
+# in the background after its schema is changed; 0 disables prewarming.
+PREWARM_MAX_WORKERS: int = int(
+    os.getenv("GEL_COMPILER_PREWARM_MAX_WORKERS", 4)
+)
+# How long a transaction may stay idle before the compiler state kept
+# in the worker is pickled, in case the worker is lost.
+TX_STATE_CHECKPOINT_DELAY: float = float(
+    os.getenv("GEL_COMPILER_TX_STATE_CHECKPOINT_DELAY", 1.0)
+)
 ADAPTIVE_SCALE_UP_WAIT_TIME: float = 3.0
 ADAPTIVE_SCALE_DOWN_WAIT_TIME: float = 60.0
+# The adaptive pool samples the demand for workers (busy workers plus
+# waiting requests) every interval, and keeps enough workers for the
+# demand forecast this many intervals ahead (about the time it takes to
+# spawn a worker), plus the given number of idle warm spares.
+ADAPTIVE_FORECAST_INTERVAL: float = float(
+    os.getenv("GEL_COMPILER_POOL_FORECAST_INTERVAL", 1.0)
+)
+ADAPTIVE_FORECAST_HORIZON: int = int(
+    os.getenv("GEL_COMPILER_POOL_FORECAST_HORIZON", 5)
+)
+ADAPTIVE_WARM_SPARES: int = int(
+    os.getenv("GEL_COMPILER_POOL_WARM_SPARES", 0)
+)
+# A worker is spawned if a request waited longer than this in the last
+# interval, regardless of the forecast.
+ADAPTIVE_TARGET_WAIT_TIME: float = float(
+    os.getenv("GEL_COMPILER_POOL_TARGET_WAIT_TIME", 0.5)
+)
 WORKER_PKG: str = __name__.rpartition('.')[0] + '.'
 DEFAULT_CLIENT: str = 'default'
 HIGH_RSS_GRACE_PERIOD: tuple[int, int] = (20 * 3600, 30 * 3600)
@@ -124,6 +162,37 @@ def _pickle_memoized(obj: Any) -> bytes:
     return pickle.dumps(obj, -1)
 
 
+def _select_evicted_dbs(
+    dbs: collections.OrderedDict[str, state.PickledDatabaseState],
+    keep: int,
+    *,
+    budget: Optional[int] = None,
+    reserve: int = 0,
+    pinned: Optional[str] = None,
+) -> dict[str, str]:
+    """Choose branches to evict from *dbs* in LRU order.
+
+    Returns a dict of the evicted branch names mapped to the reason of
+    the eviction, which is the action reported in metrics.  Branches
+    beyond the *keep* most recently used ones are evicted first.  Then,
+    if there is a *budget*, least recently used branches are evicted
+    until the estimated size of the others plus *reserve* fits in it.
+    The *pinned* branch, usually the one being synced, is never evicted.
+    """
+    # dbs is ordered from the most recently used branch
+    names = [name for name in dbs if name != pinned]
+    evicted = {name: 'cache-evict' for name in names[keep:]}
+    if budget is not None:
+        kept = names[:keep]
+        size = reserve + sum(dbs[name].get_estimated_size() for name in kept)
+        for name in reversed(kept):
+            if size <= budget:
+                break
+            evicted[name] = 'cache-evict-budget'
+            size -= dbs[name].get_estimated_size()
+    return evicted
+
+
 class BaseWorker:
 
     _dbs: collections.OrderedDict[str, state.PickledDatabaseState]
@@ -161,9 +230,11 @@ class BaseWorker:
         self._last_used = time.monotonic()
         self._closed = False
 
-    def get_db(self, name: str) -> Optional[state.PickledDatabaseState]:
+    def get_db(
+        self, name: str, *, touch: bool = True
+    ) -> Optional[state.PickledDatabaseState]:
         rv = self._dbs.get(name)
-        if rv is not None:
+        if rv is not None and touch:
             self._dbs.move_to_end(name, last=False)
         return rv
 
@@ -171,10 +242,21 @@ class BaseWorker:
         self._dbs[name] = db
         self._dbs.move_to_end(name, last=False)
 
-    def prepare_evict_db(self, keep: int) -> list[str]:
-        return list(self._dbs.keys())[keep:]
+    def prepare_evict_db(
+        self,
+        keep: int,
+        *,
+        budget: Optional[int] = None,
+        reserve: int = 0,
+        pinned: Optional[str] = None,
+    ) -> dict[str, str]:
+        return _select_evicted_dbs(
+            self._dbs, keep, budget=budget, reserve=reserve, pinned=pinned
+        )
 
-    def evict_db(self, name: str) -> Optional[state.PickledDatabaseState]:
+    def evict_db(
+        self, name: str, *, reason: str = 'cache-evict'
+    ) -> Optional[state.PickledDatabaseState]:
         return self._dbs.pop(name, None)
 
     async def call(
@@ -203,8 +285,13 @@ class BaseWorker:
             return result[0]
         elif status == 1:
             exc, tb = result
-            if (sync_state is not None and
-                    not isinstance(exc, state.FailedStateSync)):
+            if isinstance(exc, state.FailedStateSync):
+                # The worker drops all of its cached branches when it fails
+                # to sync, so forget about them too in order to send the
+                # full state with the next call.
+                for name in list(self._dbs):
+                    self.evict_db(name)
+            elif sync_state is not None:
                 sync_state()
             exc.__formatted_error__ = tb
             raise exc
@@ -278,7 +365,9 @@ class Worker(BaseWorker):
             1, pid, DEFAULT_CLIENT, action
         )
 
-    def evict_db(self, name: str) -> Optional[state.PickledDatabaseState]:
+    def evict_db(
+        self, name: str, *, reason: str = 'cache-evict'
+    ) -> Optional[state.PickledDatabaseState]:
         pid = str(self._pid)
         db = self._dbs.get(name)
         super().evict_db(name)
@@ -287,7 +376,7 @@ class Worker(BaseWorker):
                 db.get_estimated_size(), pid, DEFAULT_CLIENT
             )
             metrics.compiler_process_branch_actions.inc(
-                1, pid, DEFAULT_CLIENT, 'cache-evict'
+                1, pid, DEFAULT_CLIENT, reason
             )
         return db
 
@@ -297,6 +386,12 @@ class Worker(BaseWorker):
     def get_rss(self) -> int:
         return self._proc.memory_info().rss
 
+    def exceeds_rss(self, max_rss: int) -> bool:
+        return (
+            time.monotonic() > self._allow_high_rss_until
+            and self.get_rss() > max_rss
+        )
+
     def maybe_close_for_high_rss(self, max_rss: int) -> bool:
         if time.monotonic() > self._allow_high_rss_until:
             rss = self.get_rss()
@@ -331,12 +426,18 @@ class AbstractPool[
 
     _loop: asyncio.AbstractEventLoop
     _worker_branch_limit: int
+    # Per-worker limit of the estimated size of cached branches in bytes
+    _worker_branch_budget: Optional[int]
     _backend_runtime_params: pgparams.BackendRuntimeParams
     _std_schema: s_schema.Schema
     _refl_schema: s_schema.Schema
     _schema_class_layout: s_refl.SchemaClassLayout
     _dbindex: Optional[dbview.DatabaseIndex] = None
     _last_active_time: float
+    # Whether workers of this pool can apply user schema deltas in place
+    # of full user schema pickles, see add_user_schema_delta().
+    _user_schema_delta_sync: bool = False
+    _user_schema_deltas: dict[str, tuple[bytes, bytes, state.UserSchemaDelta]]
 
     def __init__(
         self,
@@ -355,7 +456,9 @@ class AbstractPool[
         self._refl_schema = kwargs["refl_schema"]
         self._schema_class_layout = kwargs["schema_class_layout"]
         self._dbindex = kwargs.get("dbindex")
+        self._worker_branch_budget = kwargs.get("worker_branch_budget")
         self._last_active_time = 0
+        self._user_schema_deltas = {}
 
     def _get_init_args(self) -> tuple[InitArgs_T, InitArgsPickle_T]:
         assert self._dbindex is not None
@@ -393,6 +496,72 @@ class AbstractPool[
     def get_template_pid(self) -> Optional[int]:
         return None
 
+    def add_user_schema_delta(
+        self,
+        dbname: str,
+        base_user_schema_pickle: bytes,
+        user_schema_pickle: bytes,
+        base_version: uuid.UUID,
+        delta_pickle: bytes,
+    ) -> None:
+        """Record how the user schema of a branch was changed by DDL.
+
+        Workers holding *base_user_schema_pickle* for *dbname* will be
+        synced with the (usually much smaller) delta instead of the full
+        *user_schema_pickle*.  Only the latest delta of each branch is
+        kept, and only until no worker holds *base_user_schema_pickle*
+        anymore; workers that fall further behind receive the full pickle.
+        """
+        if not self._user_schema_delta_sync:
+            return
+        if len(delta_pickle) >= len(user_schema_pickle):
+            self._user_schema_deltas.pop(dbname, None)
+            return
+        self._user_schema_deltas[dbname] = (
+            base_user_schema_pickle,
+            user_schema_pickle,
+            state.UserSchemaDelta(base_version, delta_pickle),
+        )
+        self._maybe_drop_user_schema_deltas((dbname,))
+
+    def discard_user_schema_delta(self, dbname: str) -> None:
+        self._user_schema_deltas.pop(dbname, None)
+
+    def _maybe_drop_user_schema_deltas(self, dbnames: Iterable[str]) -> None:
+        # Drop the deltas of the given branches, along with the base user
+        # schema pickles they hold on to, once no worker needs them.
+        pass
+
+    def _get_user_schema_sync_arg(
+        self,
+        dbname: str,
+        worker_user_schema_pickle: bytes,
+        user_schema_pickle: bytes,
+        pins: list[bytes],
+    ) -> bytes | state.UserSchemaDelta | state.SharedPickle:
+        delta = self._user_schema_deltas.get(dbname)
+        if (
+            delta is not None
+            and delta[0] is worker_user_schema_pickle
+            and delta[1] is user_schema_pickle
+        ):
+            return delta[2]
+        else:
+            return self._share_pickle(user_schema_pickle, pins)
+
+    def _share_pickle(
+        self,
+        data: bytes,
+        pins: list[bytes],
+    ) -> bytes | state.SharedPickle:
+        # Pools with a shared schema store return a reference to the
+        # stored pickle instead, and append *data* to *pins*, which must
+        # be passed to _release_pickles() once the worker call is done.
+        return data
+
+    def _release_pickles(self, pins: list[bytes]) -> None:
+        pass
+
     async def _compute_compile_preargs(
         self,
         method_name: str,
@@ -414,11 +583,11 @@ class AbstractPool[
             reflection_cache: Optional[state.ReflectionCache] = None,
             database_config: Optional[Config] = None,
             system_config: Optional[Config] = None,
-            evicted_dbs: Optional[list[str]] = None,
+            evicted_dbs: Optional[dict[str, str]] = None,
         ):
             if evicted_dbs is not None:
-                for name in evicted_dbs:
-                    worker.evict_db(name)
+                for name, reason in evicted_dbs.items():
+                    worker.evict_db(name, reason=reason)
 
             worker_db = worker.get_db(dbname)
             if worker_db is None:
@@ -469,67 +638,113 @@ class AbstractPool[
                 if system_config is not None:
                     worker._system_config = system_config
 
+            if self._user_schema_deltas:
+                if evicted_dbs:
+                    self._maybe_drop_user_schema_deltas(
+                        (dbname, *evicted_dbs)
+                    )
+                elif user_schema_pickle is not None:
+                    self._maybe_drop_user_schema_deltas((dbname,))
+
         worker_db = worker.get_db(dbname)
         preargs: list[Any] = [method_name, dbname]
         to_update: dict[str, Any] = {}
         branch_cache_hit = True
+        pins: list[bytes] = []
 
-        if worker_db is None:
-            branch_cache_hit = False
-            evicted_dbs = worker.prepare_evict_db(
-                self._worker_branch_limit - 1
-            )
-            preargs.extend([
-                evicted_dbs,
-                user_schema_pickle,
-                _pickle_memoized(reflection_cache),
-                global_schema_pickle,
-                _pickle_memoized(database_config),
-                _pickle_memoized(system_config),
-            ])
-            to_update = {
-                'evicted_dbs': evicted_dbs,
-                'user_schema_pickle': user_schema_pickle,
-                'reflection_cache': reflection_cache,
-                'global_schema_pickle': global_schema_pickle,
-                'database_config': database_config,
-                'system_config': system_config,
-            }
-        else:
-            preargs.append([])  # evicted_dbs
-
-            if worker_db.user_schema_pickle is not user_schema_pickle:
+        # Release what's pinned so far if building the arguments fails,
+        # the caller only gets to release the pins through fini().
+        try:
+            if worker_db is None:
                 branch_cache_hit = False
-                preargs.append(user_schema_pickle)
-                to_update['user_schema_pickle'] = user_schema_pickle
+                evicted_dbs = worker.prepare_evict_db(
+                    self._worker_branch_limit - 1,
+                    budget=self._worker_branch_budget,
+                    reserve=state.PickledDatabaseState(
+                        user_schema_pickle, reflection_cache, database_config
+                    ).get_estimated_size(),
+                )
+                preargs.extend([
+                    list(evicted_dbs),
+                    self._share_pickle(user_schema_pickle, pins),
+                    _pickle_memoized(reflection_cache),
+                    self._share_pickle(global_schema_pickle, pins),
+                    _pickle_memoized(database_config),
+                    _pickle_memoized(system_config),
+                ])
+                to_update = {
+                    'evicted_dbs': evicted_dbs,
+                    'user_schema_pickle': user_schema_pickle,
+                    'reflection_cache': reflection_cache,
+                    'global_schema_pickle': global_schema_pickle,
+                    'database_config': database_config,
+                    'system_config': system_config,
+                }
             else:
-                preargs.append(None)
+                if (
+                    self._worker_branch_budget is not None
+                    and worker_db.user_schema_pickle is not user_schema_pickle
+                ):
+                    # The branch may have outgrown the budget with the new
+                    # schema
+                    evicted_dbs = worker.prepare_evict_db(
+                        self._worker_branch_limit - 1,
+                        budget=self._worker_branch_budget,
+                        reserve=state.PickledDatabaseState(
+                            user_schema_pickle,
+                            reflection_cache,
+                            database_config,
+                        ).get_estimated_size(),
+                        pinned=dbname,
+                    )
+                else:
+                    evicted_dbs = {}
+                preargs.append(list(evicted_dbs))
+                if evicted_dbs:
+                    to_update['evicted_dbs'] = evicted_dbs
 
-            if worker_db.reflection_cache is not reflection_cache:
-                branch_cache_hit = False
-                preargs.append(_pickle_memoized(reflection_cache))
-                to_update['reflection_cache'] = reflection_cache
-            else:
-                preargs.append(None)
+                if worker_db.user_schema_pickle is not user_schema_pickle:
+                    branch_cache_hit = False
+                    preargs.append(self._get_user_schema_sync_arg(
+                        dbname,
+                        worker_db.user_schema_pickle,
+                        user_schema_pickle,
+                        pins,
+                    ))
+                    to_update['user_schema_pickle'] = user_schema_pickle
+                else:
+                    preargs.append(None)
 
-            if worker._global_schema_pickle is not global_schema_pickle:
-                preargs.append(global_schema_pickle)
-                to_update['global_schema_pickle'] = global_schema_pickle
-            else:
-                preargs.append(None)
+                if worker_db.reflection_cache is not reflection_cache:
+                    branch_cache_hit = False
+                    preargs.append(_pickle_memoized(reflection_cache))
+                    to_update['reflection_cache'] = reflection_cache
+                else:
+                    preargs.append(None)
 
-            if worker_db.database_config is not database_config:
-                branch_cache_hit = False
-                preargs.append(_pickle_memoized(database_config))
-                to_update['database_config'] = database_config
-            else:
-                preargs.append(None)
+                if worker._global_schema_pickle is not global_schema_pickle:
+                    preargs.append(
+                        self._share_pickle(global_schema_pickle, pins)
+                    )
+                    to_update['global_schema_pickle'] = global_schema_pickle
+                else:
+                    preargs.append(None)
 
-            if worker._system_config is not system_config:
-                preargs.append(_pickle_memoized(system_config))
-                to_update['system_config'] = system_config
-            else:
-                preargs.append(None)
+                if worker_db.database_config is not database_config:
+                    branch_cache_hit = False
+                    preargs.append(_pickle_memoized(database_config))
+                    to_update['database_config'] = database_config
+                else:
+                    preargs.append(None)
+
+                if worker._system_config is not system_config:
+                    preargs.append(_pickle_memoized(system_config))
+                    to_update['system_config'] = system_config
+                else:
+                    preargs.append(None)
+        except BaseException:
+            self._release_pickles(pins)
+            raise
 
         self._report_branch_request(worker, branch_cache_hit)
 
@@ -543,7 +758,13 @@ class AbstractPool[
         else:
             callback = None
 
-        return tuple(preargs), callback, lambda: None
+        fini: Callable[[], None]
+        if pins:
+            fini = functools.partial(self._release_pickles, pins)
+        else:
+            fini = lambda: None
+
+        return tuple(preargs), callback, fini
 
     def _report_branch_request(
         self,
@@ -570,6 +791,23 @@ class AbstractPool[
     ) -> None:
         raise NotImplementedError
 
+    def prewarm(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+    ) -> None:
+        """Sync idle workers with a changed state of branch *dbname*.
+
+        Called after the schema or config of a branch is changed, so that
+        the next compilation doesn't pay for unpickling the new state.
+        Pools that don't support prewarming ignore this.
+        """
+        pass
+
     async def compile(
         self,
         dbname: str,
@@ -615,73 +853,12 @@ class AbstractPool[
         dbname: str,
         user_schema_pickle: bytes,
         txid: int,
-        pickled_state: bytes,
+        pickled_state: Any,
         state_id: int,
         *compile_args: Any,
         **compiler_args: Any,
-    ) -> tuple[dbstate.QueryUnitGroup, bytes, int]:
-        # When we compile a query, the compiler returns a tuple:
-        # a QueryUnit and the state the compiler is in if it's in a
-        # transaction.  The state contains the information about all savepoints
-        # and transient schema changes, so the next time we need to
-        # compile a new query in this transaction the state is needed
-        # to be passed to the next compiler compiling it.
-        #
-        # The compile state can be quite heavy and contain multiple versions
-        # of schema, configs, and other session-related data. So the compiler
-        # worker pickles it before sending it to the IO process, and the
-        # IO process doesn't need to ever unpickle it.
-        #
-        # There's one crucial optimization we do here though. We try to
-        # find the compiler process that we used before, that already has
-        # this state unpickled. If we can find it, it means that the
-        # compiler process won't have to waste time unpickling the state.
-        #
-        # We use "is" in `w._last_pickled_state is pickled_state` deliberately,
-        # because `pickled_state` is saved on the Worker instance and
-        # stored in edgecon; we never modify it, so `is` is sufficient and
-        # is faster than `==`.
-        worker = await self._acquire_worker(
-            condition=lambda w: (w._last_pickled_state is pickled_state),
-            compiler_args=compiler_args,
-        )
-
-        dbname_arg = None
-        user_schema_pickle_arg = None
-        if worker._last_pickled_state is pickled_state:
-            # Since we know that this particular worker already has the
-            # state, we don't want to waste resources transferring the
-            # state over the network. So we replace the state with a marker,
-            # that the compiler process will recognize.
-            pickled_state = state.REUSE_LAST_STATE_MARKER
-        else:
-            worker_db = worker.get_db(dbname)
-            if (
-                worker_db is not None
-                and worker_db.user_schema_pickle is user_schema_pickle
-            ):
-                dbname_arg = dbname
-            else:
-                user_schema_pickle_arg = user_schema_pickle
-
-        try:
-            units, new_pickled_state = await worker.call(
-                'compile_in_tx',
-                dbname_arg,
-                user_schema_pickle_arg,
-                pickled_state,
-                txid,
-                *compile_args
-            )
-            worker._last_pickled_state = new_pickled_state
-            return units, new_pickled_state, 0
-
-        finally:
-            # Put the worker at the end of the queue so that the chance
-            # of reusing it later (and maximising the chance of
-            # the w._last_pickled_state is pickled_state` check returning
-            # `True` is higher.
-            self._release_worker(worker, put_in_front=False)
+    ) -> tuple[dbstate.QueryUnitGroup, Any, int]:
+        raise NotImplementedError
 
     async def compile_notebook(
         self,
@@ -911,7 +1088,7 @@ class AbstractPool[
         schema_a: bytes,
         schema_b: bytes,
         global_schema: bytes,
-        conn_state_pickle: Optional[bytes],
+        conn_state_pickle: Optional[bytes | state.PinnedTxState],
     ) -> None:
         return await self._simple_call(
             'validate_schema_equivalence',
@@ -921,6 +1098,14 @@ class AbstractPool[
             conn_state_pickle,
         )
 
+    def discard_tx_state(
+        self,
+        conn_state: Optional[bytes | state.PinnedTxState],
+    ) -> None:
+        # Called when a transaction ends without the compiler seeing its
+        # COMMIT or ROLLBACK, e.g. when the client disconnects.
+        pass
+
     async def compile_structured_config(
         self,
         objects: Mapping[str, config_compiler.ConfigObject],
@@ -937,6 +1122,13 @@ class AbstractPool[
     def get_size_hint(self) -> int:
         raise NotImplementedError
 
+    def has_idle_workers(self) -> bool:
+        """Tell if a compilation would start now without waiting.
+
+        Background compilations use this to only take spare capacity.
+        """
+        return True
+
     def refresh_metrics(self) -> None:
         pass
 
@@ -961,6 +1153,11 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
 
     _worker_class: type[Worker_T]
     _worker_mod: str = "worker"
+    _user_schema_delta_sync = True
+    # Whether large pickles are passed to workers via a SharedSchemaStore.
+    _use_schema_store: bool = True
+    # Whether idle workers are synced after schema changes, see prewarm().
+    _prewarm_workers: bool = True
     _workers_queue: queue.WorkerQueue[Worker_T]
     _workers: dict[int, Worker_T]
 
@@ -972,6 +1169,14 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
     _running: Optional[bool]
     _stats_spawned: int
     _stats_killed: int
+    _runstate_dir: str
+    _schema_store: Optional[schema_store.SharedSchemaStore]
+    _prewarm_tasks: dict[str, asyncio.Task[None]]
+    _pinned_waiters: dict[
+        int, collections.deque[asyncio.Future[Optional[Worker_T]]]
+    ]
+    _tx_state_ids: itertools.count[int]
+    _tx_checkpoints: set[asyncio.Task[Any]]
 
     def __init__(
         self,
@@ -983,6 +1188,12 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
     ) -> None:
         super().__init__(**kwargs)
 
+        self._runstate_dir = runstate_dir
+        self._schema_store = None
+        self._prewarm_tasks = {}
+        self._pinned_waiters = {}
+        self._tx_state_ids = itertools.count(1)
+        self._tx_checkpoints = set()
         self._poolsock_name = os.path.join(runstate_dir, 'ipc')
         assert len(self._poolsock_name) <= (
             defines.MAX_RUNSTATE_DIR_PATH
@@ -1053,6 +1264,23 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
     def _worker_attached(self) -> None:
         pass
 
+    def _maybe_drop_user_schema_deltas(self, dbnames: Iterable[str]) -> None:
+        for dbname in dbnames:
+            delta = self._user_schema_deltas.get(dbname)
+            if delta is None:
+                continue
+            base_user_schema_pickle = delta[0]
+            for worker in self._workers.values():
+                worker_db = worker.get_db(dbname, touch=False)
+                if (
+                    worker_db is not None
+                    and worker_db.user_schema_pickle
+                    is base_user_schema_pickle
+                ):
+                    break
+            else:
+                del self._user_schema_deltas[dbname]
+
     def worker_connected(self, pid: int, version: int) -> None:
         logger.debug("Worker with PID %s connected.", pid)
         self._loop.create_task(self._attach_worker(pid))
@@ -1063,6 +1291,14 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
         logger.debug("Worker with PID %s disconnected.", pid)
         self._workers.pop(pid, None)
         metrics.current_compiler_processes.dec()
+        if self._user_schema_deltas:
+            self._maybe_drop_user_schema_deltas(
+                list(self._user_schema_deltas)
+            )
+
+        for waiter in self._pinned_waiters.pop(pid, ()):
+            if not waiter.done():
+                waiter.set_result(None)
 
         expect = str(pid)
 
@@ -1083,6 +1319,12 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
 
         self._workers_queue = queue.WorkerQueue(self._loop)
 
+        if self._use_schema_store:
+            self._schema_store = schema_store.SharedSchemaStore(
+                runstate_dir=self._runstate_dir,
+                capacity=self._worker_branch_limit * 2,
+            )
+
         await self._server.start()
         self._running = True
 
@@ -1135,11 +1377,149 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
     async def _start(self) -> None:
         raise NotImplementedError
 
+    def _share_pickle(
+        self,
+        data: bytes,
+        pins: list[bytes],
+    ) -> bytes | state.SharedPickle:
+        if self._schema_store is None or len(data) < SHARED_PICKLE_MIN_SIZE:
+            return data
+        try:
+            ref = self._schema_store.acquire(data)
+        except OSError:
+            # E.g. the shared memory is full, just send the pickle inline
+            logger.warning(
+                "could not share a pickle with the compiler workers",
+                exc_info=True,
+            )
+            return data
+        pins.append(data)
+        return ref
+
+    def _release_pickles(self, pins: list[bytes]) -> None:
+        if self._schema_store is not None:
+            for data in pins:
+                self._schema_store.release(data)
+
+    def prewarm(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+    ) -> None:
+        if (
+            not self._running
+            or not self._prewarm_workers
+            or PREWARM_MAX_WORKERS <= 0
+        ):
+            return
+        # A newer prewarm of the same branch supersedes the running one,
+        # which notices that after syncing its current worker.
+        task = self._loop.create_task(
+            self._prewarm(
+                dbname,
+                user_schema_pickle,
+                global_schema_pickle,
+                reflection_cache,
+                database_config,
+                system_config,
+            )
+        )
+        self._prewarm_tasks[dbname] = task
+        task.add_done_callback(
+            functools.partial(self._on_prewarm_done, dbname)
+        )
+
+    def _on_prewarm_done(self, dbname: str, task: asyncio.Task[None]) -> None:
+        if self._prewarm_tasks.get(dbname) is task:
+            del self._prewarm_tasks[dbname]
+        if not task.cancelled() and (exc := task.exception()) is not None:
+            logger.warning(
+                "could not prewarm compiler workers for branch %r",
+                dbname,
+                exc_info=exc,
+            )
+
+    async def _prewarm(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        global_schema_pickle: bytes,
+        reflection_cache: state.ReflectionCache,
+        database_config: Config,
+        system_config: Config,
+    ) -> None:
+        # Only workers that already hold the branch are synced: others
+        # would have to evict a branch for it, which may well be a bad
+        # trade.  Each worker is visited at most once, and only while it
+        # is idle and no compilation is waiting for a worker.
+        visited: set[int] = set()
+
+        def needs_prewarm(worker: Worker_T) -> bool:
+            if worker.get_pid() in visited:
+                return False
+            worker_db = worker.get_db(dbname, touch=False)
+            return (
+                worker_db is not None
+                and worker_db.user_schema_pickle is not user_schema_pickle
+            )
+
+        this_task = asyncio.current_task()
+        while (
+            self._running
+            and len(visited) < PREWARM_MAX_WORKERS
+            and self._prewarm_tasks.get(dbname) is this_task
+        ):
+            # Let acquire() calls woken up by a release take their worker.
+            await asyncio.sleep(0)
+            worker = self._workers_queue.try_acquire(condition=needs_prewarm)
+            if worker is None:
+                break
+            visited.add(worker.get_pid())
+            if worker.get_pid() not in self._workers:
+                # Disconnected; try_acquire() has dropped it from the queue.
+                continue
+            fini = lambda: None
+            try:
+                preargs, sync_state, fini = (
+                    await self._compute_compile_preargs(
+                        "prewarm",
+                        worker,
+                        dbname,
+                        user_schema_pickle,
+                        global_schema_pickle,
+                        reflection_cache,
+                        database_config,
+                        system_config,
+                    )
+                )
+                await worker.call(*preargs, sync_state=sync_state)
+                metrics.compiler_process_branch_actions.inc(
+                    1, str(worker.get_pid()), DEFAULT_CLIENT, 'prewarm'
+                )
+            finally:
+                fini()
+                self._release_worker(worker)
+
     async def stop(self) -> None:
         if not self._running:
             return
         self._running = False
 
+        for task in list(self._prewarm_tasks.values()):
+            task.cancel()
+        self._prewarm_tasks.clear()
+        for task in list(self._tx_checkpoints):
+            task.cancel()
+        for waiters in self._pinned_waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        self._pinned_waiters.clear()
+
         assert self._server is not None
         await self._server.stop()
         self._server = None
@@ -1149,6 +1529,10 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
 
         await self._stop()
 
+        if self._schema_store is not None:
+            self._schema_store.close()
+            self._schema_store = None
+
     async def _stop(self) -> None:
         raise NotImplementedError
 
@@ -1169,6 +1553,12 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
             self._stats_killed,
         )
 
+    def has_idle_workers(self) -> bool:
+        return (
+            self._workers_queue.qsize() > 0
+            and self._workers_queue.count_waiters() == 0
+        )
+
     async def _acquire_worker(
         self,
         *,
@@ -1208,9 +1598,302 @@ class BaseLocalPool[Worker_T: Worker, InitArgs_T](
             if self._worker_max_rss is not None:
                 if worker.maybe_close_for_high_rss(self._worker_max_rss):
                     return
+            if waiters := self._pinned_waiters.get(worker.get_pid()):
+                # Hand the worker over to whoever is waiting for the
+                # transaction state it holds.
+                while waiters:
+                    waiter = waiters.popleft()
+                    if not waiter.done():
+                        waiter.set_result(worker)
+                        self._maybe_update_last_active_time()
+                        return
             self._workers_queue.release(worker, put_in_front=put_in_front)
         self._maybe_update_last_active_time()
 
+    async def _acquire_pinned_worker(self, pid: int) -> Optional[Worker_T]:
+        # Acquire the worker with the given pid, waiting for it if it's
+        # busy, or return None if it's gone.
+        if pid not in self._workers:
+            return None
+        worker = self._workers_queue.try_acquire(
+            condition=lambda w: w.get_pid() == pid,
+            yield_to_waiters=False,
+        )
+        if worker is not None:
+            return worker
+        waiter: asyncio.Future[Optional[Worker_T]] = self._loop.create_future()
+        self._pinned_waiters.setdefault(pid, collections.deque()).append(
+            waiter
+        )
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if (
+                waiter.done()
+                and not waiter.cancelled()
+                and (worker := waiter.result()) is not None
+            ):
+                self._release_worker(worker)
+            raise
+
+    async def compile_in_tx(
+        self,
+        dbname: str,
+        user_schema_pickle: bytes,
+        txid: int,
+        pickled_state: bytes | state.PinnedTxState,
+        state_id: int,
+        *compile_args: Any,
+        **compiler_args: Any,
+    ) -> tuple[dbstate.QueryUnitGroup, bytes | state.PinnedTxState, int]:
+        # When we compile a query, the compiler returns a tuple:
+        # a QueryUnit and the state the compiler is in if it's in a
+        # transaction.  The state contains the information about all savepoints
+        # and transient schema changes, so the next time we need to
+        # compile a new query in this transaction the state is needed
+        # to be passed to the next compiler compiling it.
+        #
+        # The compile state can be quite heavy and contain multiple versions
+        # of schema, configs, and other session-related data, and pickling
+        # it after every statement makes long transactions with a lot of
+        # DDL slower with every statement.  So instead, the worker keeps
+        # the live state, and we return a PinnedTxState that routes the
+        # next compilation of the transaction to the same worker.  The
+        # state is pickled only when the transaction goes idle for
+        # TX_STATE_CHECKPOINT_DELAY, so that we can fall back to it if the
+        # worker is lost; without a current pickle, only a ROLLBACK can be
+        # compiled after that.  The worker drops the live state when the
+        # transaction ends, and discard_tx_state() has it dropped if the
+        # transaction ends otherwise.
+        pin = None
+        if isinstance(pickled_state, state.PinnedTxState):
+            pin = pickled_state
+            if pin.checkpoint is not None:
+                pin.checkpoint.cancel()
+                pin.checkpoint = None
+            worker = await self._acquire_pinned_worker(pin.pid)
+            if worker is not None:
+                try:
+                    return await self._call_compile_in_tx(
+                        worker, pin, None, None, pin.state_id,
+                        txid, *compile_args,
+                    )
+                except state.StateNotFound:
+                    pass
+                finally:
+                    self._release_worker(worker, put_in_front=False)
+            pickled_state = pin.fallback
+
+        # Try to find the compiler process that we used before, that
+        # already has this state unpickled.  We use "is" deliberately,
+        # because `pickled_state` is saved on the Worker instance and
+        # stored in edgecon; we never modify it, so `is` is sufficient and
+        # is faster than `==`.
+        worker = await self._acquire_worker(
+            condition=lambda w: (w._last_pickled_state is pickled_state),
+            compiler_args=compiler_args,
+        )
+
+        dbname_arg = None
+        user_schema_pickle_arg = None
+        pins: list[bytes] = []
+        cstate: bytes = pickled_state
+        if worker._last_pickled_state is pickled_state:
+            # Since we know that this particular worker already has the
+            # state, we don't want to waste resources transferring the
+            # state over the network. So we replace the state with a marker,
+            # that the compiler process will recognize.
+            cstate = state.REUSE_LAST_STATE_MARKER
+            worker._last_pickled_state = None
+        else:
+            worker_db = worker.get_db(dbname)
+            if (
+                worker_db is not None
+                and worker_db.user_schema_pickle is user_schema_pickle
+            ):
+                dbname_arg = dbname
+            else:
+                user_schema_pickle_arg = self._share_pickle(
+                    user_schema_pickle, pins
+                )
+
+        try:
+            units, new_pin, new_state_id = await self._call_compile_in_tx(
+                worker,
+                pin or state.PinnedTxState(0, 0, pickled_state, True),
+                dbname_arg,
+                user_schema_pickle_arg,
+                cstate,
+                txid,
+                *compile_args,
+            )
+        finally:
+            if pins:
+                self._release_pickles(pins)
+            # Put the worker at the end of the queue so that it's less
+            # likely to be busy when the transaction needs it again.
+            self._release_worker(worker, put_in_front=False)
+
+        if (
+            pin is not None
+            and not pin.fallback_is_current
+            and not (
+                isinstance(units, dbstate.QueryUnitGroup)
+                and len(units)
+                and units[0].tx_rollback
+            )
+        ):
+            # We compiled a stale state of the transaction.
+            self.discard_tx_state(new_pin)
+            raise errors.TransactionError(
+                'the compiler state of the current transaction was lost, '
+                'it must be rolled back'
+            )
+        return units, new_pin, new_state_id
+
+    async def _call_compile_in_tx(
+        self,
+        worker: Worker_T,
+        pin: state.PinnedTxState,
+        dbname: Optional[str],
+        user_schema: Optional[bytes | state.SharedPickle],
+        cstate: bytes | int,
+        txid: int,
+        *compile_args: Any,
+    ) -> tuple[dbstate.QueryUnitGroup, bytes | state.PinnedTxState, int]:
+        new_state_id = next(self._tx_state_ids)
+        units, changed = await worker.call(
+            'compile_in_tx',
+            dbname,
+            user_schema,
+            cstate,
+            new_state_id,
+            txid,
+            *compile_args
+        )
+        if isinstance(units, dbstate.QueryUnitGroup) and any(
+            unit.tx_commit or unit.tx_rollback for unit in units
+        ):
+            # The worker didn't keep the state of the finished transaction
+            return units, pin.fallback, 0
+        new_pin = state.PinnedTxState(
+            state_id=new_state_id,
+            pid=worker.get_pid(),
+            fallback=pin.fallback,
+            fallback_is_current=pin.fallback_is_current and not changed,
+        )
+        if new_pin.fallback_is_current:
+            pass
+        elif (
+            self._worker_max_rss is not None
+            and worker.exceeds_rss(self._worker_max_rss)
+        ):
+            # The worker is about to be killed on release, save the state
+            new_pin.fallback = await worker.call(
+                'pickle_tx_state', new_state_id
+            )
+            new_pin.fallback_is_current = True
+        else:
+            new_pin.checkpoint = self._loop.call_later(
+                TX_STATE_CHECKPOINT_DELAY, self._checkpoint_tx_state, new_pin
+            )
+        return units, new_pin, 0
+
+    def _checkpoint_tx_state(self, pin: state.PinnedTxState) -> None:
+        pin.checkpoint = None
+        if not self._running or pin.pid not in self._workers:
+            return
+        # Don't yield to the waiters: the worker may only evict the state
+        # of the transaction once it's pickled, so it must not starve.
+        worker = self._workers_queue.try_acquire(
+            condition=lambda w: w.get_pid() == pin.pid,
+            yield_to_waiters=False,
+        )
+        if worker is None:
+            # The worker is busy, try again later
+            pin.checkpoint = self._loop.call_later(
+                TX_STATE_CHECKPOINT_DELAY, self._checkpoint_tx_state, pin
+            )
+            return
+        task = self._loop.create_task(
+            self._pickle_tx_state_on(worker, pin)
+        )
+        self._tx_checkpoints.add(task)
+        task.add_done_callback(self._tx_checkpoints.discard)
+
+    async def _pickle_tx_state_on(
+        self,
+        worker: Worker_T,
+        pin: state.PinnedTxState,
+    ) -> bytes:
+        try:
+            pin.fallback = await worker.call('pickle_tx_state', pin.state_id)
+            pin.fallback_is_current = True
+        except state.StateNotFound:
+            pass
+        except Exception:
+            logger.warning(
+                "could not pickle transaction state in compiler worker "
+                "with PID %d",
+                worker.get_pid(),
+                exc_info=True,
+            )
+        finally:
+            self._release_worker(worker, put_in_front=False)
+        return pin.fallback
+
+    def discard_tx_state(
+        self,
+        conn_state: Optional[bytes | state.PinnedTxState],
+    ) -> None:
+        if not isinstance(conn_state, state.PinnedTxState):
+            return
+        pin = conn_state
+        if pin.checkpoint is not None:
+            pin.checkpoint.cancel()
+            pin.checkpoint = None
+        if not self._running or pin.pid not in self._workers:
+            return
+        task = self._loop.create_task(self._discard_tx_state_on(pin))
+        self._tx_checkpoints.add(task)
+        task.add_done_callback(self._tx_checkpoints.discard)
+
+    async def _discard_tx_state_on(self, pin: state.PinnedTxState) -> None:
+        worker = await self._acquire_pinned_worker(pin.pid)
+        if worker is None:
+            return
+        try:
+            await worker.call('discard_tx_state', pin.state_id)
+        except Exception:
+            logger.warning(
+                "could not discard transaction state in compiler worker "
+                "with PID %d",
+                worker.get_pid(),
+                exc_info=True,
+            )
+        finally:
+            self._release_worker(worker)
+
+    async def validate_schema_equivalence(
+        self,
+        schema_a: bytes,
+        schema_b: bytes,
+        global_schema: bytes,
+        conn_state_pickle: Optional[bytes | state.PinnedTxState],
+    ) -> None:
+        if isinstance(conn_state_pickle, state.PinnedTxState):
+            pin = conn_state_pickle
+            worker = await self._acquire_pinned_worker(pin.pid)
+            if worker is not None:
+                conn_state_pickle = await self._pickle_tx_state_on(
+                    worker, pin
+                )
+            else:
+                conn_state_pickle = pin.fallback
+        return await super().validate_schema_equivalence(
+            schema_a, schema_b, global_schema, conn_state_pickle
+        )
+
     def get_debug_info(self) -> dict[str, Any]:
         return dict(
             worker_pids=list(self._workers.keys()),
@@ -1343,6 +2026,53 @@ class FixedPool(FixedPoolImpl[Worker, InitArgs]):
         return init_args, pickled_args
 
 
+class DemandForecast:
+    """Rolling forecast of the number of workers needed.
+
+    The samples are smoothed with Holt's linear method, so that a growing
+    demand is forecast to keep growing, and the forecast never drops
+    below the peak demand seen within the last *window* samples.
+    """
+
+    _level: Optional[float]
+    _trend: float
+    _recent: collections.deque[int]
+
+    def __init__(
+        self,
+        *,
+        window: int,
+        alpha: float = 0.5,
+        beta: float = 0.3,
+    ) -> None:
+        self._alpha = alpha
+        self._beta = beta
+        self._level = None
+        self._trend = 0.0
+        self._recent = collections.deque(maxlen=window)
+
+    def add_sample(self, demand: int) -> None:
+        self._recent.append(demand)
+        if self._level is None:
+            self._level = float(demand)
+            return
+        level = (
+            self._alpha * demand
+            + (1 - self._alpha) * (self._level + self._trend)
+        )
+        self._trend = (
+            self._beta * (level - self._level)
+            + (1 - self._beta) * self._trend
+        )
+        self._level = level
+
+    def forecast(self, horizon: int) -> int:
+        if self._level is None:
+            return 0
+        predicted = math.ceil(self._level + horizon * self._trend - 1e-9)
+        return max(predicted, max(self._recent))
+
+
 @srvargs.CompilerPoolMode.OnDemand.assign_implementation
 class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
 
@@ -1352,6 +2082,11 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
     _scale_down_handle: Optional[asyncio.Handle]
     _max_num_workers: int
     _cleanups: dict[int, asyncio.Future]
+    _forecast: DemandForecast
+    _forecast_handle: Optional[asyncio.TimerHandle]
+    _peak_demand: int
+    _max_wait_time: float
+    _spare_pids: set[int]
 
     def __init__(self, *, pool_size: int, **kwargs: Any) -> None:
         super().__init__(pool_size=1, **kwargs)
@@ -1360,6 +2095,19 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
         self._scale_down_handle = None
         self._max_num_workers = pool_size
         self._cleanups = {}
+        self._forecast = DemandForecast(
+            window=max(
+                1,
+                int(
+                    ADAPTIVE_SCALE_DOWN_WAIT_TIME
+                    / ADAPTIVE_FORECAST_INTERVAL
+                ),
+            ),
+        )
+        self._forecast_handle = None
+        self._peak_demand = 0
+        self._max_wait_time = 0.0
+        self._spare_pids = set()
 
     @lru.lru_method_cache(1)
     def _make_cached_init_args(
@@ -1377,8 +2125,18 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
         async with asyncio.TaskGroup() as g:
             for _i in range(self._pool_size):
                 g.create_task(self._create_worker())
+            for _i in range(
+                min(ADAPTIVE_WARM_SPARES, self._max_num_workers - 1)
+            ):
+                g.create_task(self._create_worker(spare=True))
+        self._forecast_handle = self._loop.call_later(
+            ADAPTIVE_FORECAST_INTERVAL, self._update_forecast
+        )
 
     async def _stop(self) -> None:
+        if self._forecast_handle is not None:
+            self._forecast_handle.cancel()
+            self._forecast_handle = None
         self._expected_num_workers = 0
         transports, self._worker_transports = self._worker_transports, {}
         for transport in transports.values():
@@ -1410,13 +2168,22 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
         if self._scale_down_handle is not None:
             self._scale_down_handle.cancel()
             self._scale_down_handle = None
+        self._record_demand(1)
+        start_time = time.monotonic()
         try:
-            return await super()._acquire_worker(
+            worker = await super()._acquire_worker(
                 condition=condition, weighter=weighter, **compiler_args
             )
         finally:
             if scale_up_handle is not None:
                 scale_up_handle.cancel()
+        self._max_wait_time = max(
+            self._max_wait_time, time.monotonic() - start_time
+        )
+        if self._spare_pids and worker.get_pid() in self._spare_pids:
+            self._spare_pids.discard(worker.get_pid())
+            metrics.compiler_pool_scaling_actions.inc(1.0, 'spare-hit')
+        return worker
 
     def _release_worker(
         self,
@@ -1431,7 +2198,7 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
         if (
             self._running and
             self._workers_queue.count_waiters() == 0 and
-            len(self._workers) > self._pool_size
+            len(self._workers) > self._get_target_num_workers()
         ):
             self._scale_down_handle = self._loop.call_later(
                 ADAPTIVE_SCALE_DOWN_WAIT_TIME,
@@ -1449,6 +2216,7 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
     def worker_disconnected(self, pid: int) -> None:
         num_workers_before = len(self._workers)
         super().worker_disconnected(pid)
+        self._spare_pids.discard(pid)
         trans = self._worker_transports.pop(pid, None)
         if trans:
             trans.close()
@@ -1480,11 +2248,76 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
                 if transport.is_closing():
                     self._worker_transports.pop(pid, None)
 
-    async def _create_worker(self) -> None:
-        # Creates a single compiler worker process.
-        transport = await self._create_compiler_process()
-        self._worker_transports[transport.get_pid()] = transport
+    async def _create_worker(self, *, spare: bool = False) -> None:
+        # Creates a single compiler worker process.  A spare worker is
+        # spawned ahead of the demand rather than for a waiting request.
         self._expected_num_workers += 1
+        try:
+            transport = await self._create_compiler_process()
+        except BaseException:
+            self._expected_num_workers -= 1
+            raise
+        self._worker_transports[transport.get_pid()] = transport
+        if spare:
+            self._spare_pids.add(transport.get_pid())
+
+    def _record_demand(self, extra: int = 0) -> None:
+        demand = (
+            len(self._workers)
+            - self._workers_queue.qsize()
+            + self._workers_queue.count_waiters()
+            + extra
+        )
+        self._peak_demand = max(self._peak_demand, demand)
+
+    def _get_target_num_workers(self) -> int:
+        return max(
+            self._pool_size,
+            min(
+                self._forecast.forecast(ADAPTIVE_FORECAST_HORIZON)
+                + ADAPTIVE_WARM_SPARES,
+                self._max_num_workers,
+            ),
+        )
+
+    def _update_forecast(self) -> None:
+        # Called every ADAPTIVE_FORECAST_INTERVAL, samples the peak demand
+        # since the last call and spawns workers ahead of the forecast
+        # demand, so that bursts don't have to wait for workers to spawn.
+        self._forecast_handle = None
+        if not self._running:
+            return
+        self._record_demand()
+        self._forecast.add_sample(self._peak_demand)
+        self._peak_demand = 0
+        target = self._get_target_num_workers()
+        waiters = self._workers_queue.count_waiters()
+        if self._max_wait_time > ADAPTIVE_TARGET_WAIT_TIME and waiters:
+            target = max(
+                target,
+                min(self._expected_num_workers + 1, self._max_num_workers),
+            )
+        self._max_wait_time = 0.0
+
+        if self._expected_num_workers < target:
+            logger.info(
+                "Scaling the compiler pool up to %d workers "
+                "for the forecast demand.",
+                target,
+            )
+        for _i in range(self._expected_num_workers, target):
+            # Workers spawned while requests are waiting for one are
+            # not spares, they are already late.
+            spare = waiters <= 0
+            waiters -= 1
+            metrics.compiler_pool_scaling_actions.inc(
+                1.0, 'spare-spawn' if spare else 'cold-spawn'
+            )
+            self._loop.create_task(self._create_worker(spare=spare))
+
+        self._forecast_handle = self._loop.call_later(
+            ADAPTIVE_FORECAST_INTERVAL, self._update_forecast
+        )
 
     def _maybe_scale_up(self) -> None:
         if not self._running:
@@ -1494,20 +2327,22 @@ class SimpleAdaptivePool(BaseLocalPool[Worker, InitArgs]):
             "spawn a new compiler worker process now.",
             ADAPTIVE_SCALE_UP_WAIT_TIME,
         )
+        metrics.compiler_pool_scaling_actions.inc(1.0, 'cold-spawn')
         self._loop.create_task(self._create_worker())
 
     def _scale_down(self) -> None:
         self._scale_down_handle = None
-        if not self._running or len(self._workers) <= self._pool_size:
+        target = self._get_target_num_workers()
+        if not self._running or len(self._workers) <= target:
             return
         logger.info(
             "The compiler pool is not used in %d seconds, scaling down to %d.",
-            ADAPTIVE_SCALE_DOWN_WAIT_TIME, self._pool_size,
+            ADAPTIVE_SCALE_DOWN_WAIT_TIME, target,
         )
-        self._expected_num_workers = self._pool_size
+        self._expected_num_workers = target
         for worker in sorted(
             self._workers.values(), key=lambda w: w._last_used
-        )[:-self._pool_size]:
+        )[:-target]:
             worker.close()
 
     def get_size_hint(self) -> int:
@@ -1790,6 +2625,9 @@ class RemotePool(AbstractPool[RemoteWorker, InitArgs, RemoteInitArgsPickle]):
     def get_size_hint(self) -> int:
         return self._pool_size
 
+    def has_idle_workers(self) -> bool:
+        return not self._semaphore.locked()
+
     async def health_check(self) -> bool:
         if self._worker is None or not self._worker.done():
             return False
@@ -1813,8 +2651,17 @@ class TenantSchema:
         self.dbs[name] = db
         self.dbs.move_to_end(name, last=False)
 
-    def prepare_evict_db(self, keep: int) -> list[str]:
-        return list(self.dbs.keys())[keep:]
+    def prepare_evict_db(
+        self,
+        keep: int,
+        *,
+        budget: Optional[int] = None,
+        reserve: int = 0,
+        pinned: Optional[str] = None,
+    ) -> dict[str, str]:
+        return _select_evicted_dbs(
+            self.dbs, keep, budget=budget, reserve=reserve, pinned=pinned
+        )
 
     def evict_db(self, name: str) -> None:
         self.dbs.pop(name, None)
@@ -1947,11 +2794,33 @@ class MultiTenantWorker(
         if client_id in self._cache:
             self._invalidated_clients.append(client_id)
 
-    def maybe_invalidate_last(self) -> None:
+    def maybe_invalidate_last(self, reserve: int = 0) -> None:
         if self.cache_size() == self._manager.cache_size:
             client_id = next(reversed(self._cache))
             self._invalidated_clients.append(client_id)
 
+        # Also make room for *reserve* bytes within the branch budget by
+        # invalidating the least recently used clients.
+        budget = self._manager._worker_branch_budget
+        if budget is None:
+            return
+        size = self.get_estimated_size() + reserve
+        for client_id in reversed(self._cache):
+            if size <= budget:
+                break
+            if client_id in self._invalidated_clients:
+                continue
+            self._invalidated_clients.append(client_id)
+            size -= self._cache[client_id].get_estimated_size()
+
+    def get_estimated_size(self, *, exclude: Optional[int] = None) -> int:
+        return sum(
+            tenant_schema.get_estimated_size()
+            for client_id, tenant_schema in self._cache.items()
+            if client_id != exclude
+            and client_id not in self._invalidated_clients
+        )
+
     def get_invalidation(self) -> list[int]:
         return self._invalidated_clients[:]
 
@@ -1960,6 +2829,9 @@ class MultiTenantWorker(
 class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
     _worker_class = MultiTenantWorker
     _worker_mod = "multitenant_worker"
+    _user_schema_delta_sync = False
+    _use_schema_store = False
+    _prewarm_workers = False
 
     def __init__(self, *, cache_size: int, **kwargs: Any) -> None:
         super().__init__(**kwargs)
@@ -2042,7 +2914,7 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
             client_id: int,
             client_name: str,
             dbname: str,
-            evicted_dbs: list[str],
+            evicted_dbs: dict[str, str],
             user_schema_pickle: Optional[bytes] = None,
             global_schema_pickle: Optional[bytes] = None,
             reflection_cache: Optional[state.ReflectionCache] = None,
@@ -2083,11 +2955,10 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
                 )
 
             else:
-                for name in evicted_dbs:
+                for name, reason in evicted_dbs.items():
                     tenant_schema.evict_db(name)
-                if evicted_dbs:
                     metrics.compiler_process_branch_actions.inc(
-                        len(evicted_dbs), pid, client_name, 'cache-evict'
+                        1, pid, client_name, reason
                     )
 
                 worker_db = tenant_schema.get_db(dbname)
@@ -2157,12 +3028,15 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
         client_name = worker.get_client_name(client_id)
         tenant_schema = worker.get_tenant_schema(client_id, touch=False)
         to_update: dict[str, Hashable]
-        evicted_dbs = []
+        evicted_dbs: dict[str, str] = {}
         branch_cache_hit = True
+        new_db_size = state.PickledDatabaseState(
+            user_schema_pickle, reflection_cache, database_config
+        ).get_estimated_size()
         if tenant_schema is None:
             branch_cache_hit = False
             # make room for the new client in this worker
-            worker.maybe_invalidate_last()
+            worker.maybe_invalidate_last(new_db_size)
             to_update = {
                 "user_schema_pickle": user_schema_pickle,
                 "reflection_cache": reflection_cache,
@@ -2175,7 +3049,12 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
             if worker_db is None:
                 branch_cache_hit = False
                 evicted_dbs = tenant_schema.prepare_evict_db(
-                    self._worker_branch_limit - 1
+                    self._worker_branch_limit - 1,
+                    budget=self._worker_branch_budget,
+                    reserve=(
+                        new_db_size
+                        + worker.get_estimated_size(exclude=client_id)
+                    ),
                 )
                 to_update = {
                     "user_schema_pickle": user_schema_pickle,
@@ -2187,6 +3066,16 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
                 if worker_db.user_schema_pickle is not user_schema_pickle:
                     branch_cache_hit = False
                     to_update["user_schema_pickle"] = user_schema_pickle
+                    if self._worker_branch_budget is not None:
+                        evicted_dbs = tenant_schema.prepare_evict_db(
+                            self._worker_branch_limit - 1,
+                            budget=self._worker_branch_budget,
+                            reserve=(
+                                new_db_size
+                                + worker.get_estimated_size(exclude=client_id)
+                            ),
+                            pinned=dbname,
+                        )
                 if worker_db.reflection_cache is not reflection_cache:
                     branch_cache_hit = False
                     to_update["reflection_cache"] = reflection_cache
@@ -2252,12 +3141,15 @@ class MultiTenantPool(FixedPoolImpl[MultiTenantWorker, MultiTenantInitArgs]):
         dbname: str,
         user_schema_pickle: bytes,
         txid: int,
-        pickled_state: bytes,
+        pickled_state: bytes | state.PinnedTxState,
         state_id: int,
         *compile_args: Any,
         **compiler_args: Any,
-    ) -> tuple[dbstate.QueryUnitGroup, bytes, int]:
+    ) -> tuple[dbstate.QueryUnitGroup, bytes | state.PinnedTxState, int]:
         client_id: int = compiler_args["client_id"]
+        # Multi-tenant workers don't keep the transaction states, so we
+        # never hand out pinned states.
+        assert not isinstance(pickled_state, state.PinnedTxState)
 
         # Prefer a worker we used last time in the transaction (condition), or
         # (weighter) one with the user schema at tx start so that we can pass
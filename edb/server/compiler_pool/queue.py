@@ -122,6 +122,26 @@ class WorkerQueue[W]:
 
         return self._queue.popleft()
 
+    def try_acquire(
+        self,
+        *,
+        condition: AcquireCondition[W],
+        yield_to_waiters: bool = True,
+    ) -> typing.Optional[W]:
+        # Take an idle worker satisfying the condition without waiting.
+        # Unless yield_to_waiters is False, pending acquire() calls take
+        # precedence, so this returns None if there are any, just like if
+        # no worker is satisfying.
+        # Note that a waiter woken up by release() is no longer pending,
+        # so callers should yield to the loop before calling this.
+        if yield_to_waiters and self._waiters:
+            return None
+        for w in self._queue:
+            if condition(w):
+                self._queue.remove(w)
+                return w
+        return None
+
     def release(self, worker: W, *, put_in_front: bool=True) -> None:
         if put_in_front:
             self._queue.appendleft(worker)
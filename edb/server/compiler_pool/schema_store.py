@@ -0,0 +1,169 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from __future__ import annotations
+from typing import Any, Optional
+
+import collections
+import dataclasses
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+
+from . import state
+
+
+SHM_DIR: str = '/dev/shm'
+# Followed by the PID of the server owning the directory
+DIR_PREFIX: str = 'gel-compiler-'
+
+logger = logging.getLogger("edb.server")
+
+
+@dataclasses.dataclass
+class _Entry:
+    data: bytes
+    ref: state.SharedPickle
+    pins: int = 0
+
+
+class SharedSchemaStore:
+    """Pickles shared with local compiler workers through mapped files.
+
+    Large pickles, user schemas in particular, are written once into a
+    file in a shared memory directory, and every worker maps the file
+    and unpickles from it instead of receiving the bytes over its socket.
+
+    Entries are keyed by the identity of the pickled bytes, which the
+    server keeps for as long as the schema version is current.  Entries
+    pinned by in-flight calls are never removed; unpinned ones are
+    removed in LRU order once there are more than *capacity* of them.
+    """
+
+    _dir: Optional[str]
+    _capacity: int
+    _entries: collections.OrderedDict[int, _Entry]
+
+    def __init__(self, *, runstate_dir: str, capacity: int) -> None:
+        parent = SHM_DIR if os.path.isdir(SHM_DIR) else runstate_dir
+        _remove_stale_dirs(parent)
+        self._dir = tempfile.mkdtemp(
+            prefix=f'{DIR_PREFIX}{os.getpid()}-', dir=parent
+        )
+        self._capacity = capacity
+        self._entries = collections.OrderedDict()
+
+    def acquire(self, data: bytes) -> state.SharedPickle:
+        assert self._dir is not None
+        key = id(data)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _Entry(data, self._write(data))
+            self._entries[key] = entry
+        else:
+            self._entries.move_to_end(key)
+        entry.pins += 1
+        self._maybe_evict()
+        return entry.ref
+
+    def release(self, data: bytes) -> None:
+        entry = self._entries.get(id(data))
+        if entry is not None and entry.data is data:
+            entry.pins -= 1
+        self._maybe_evict()
+
+    def close(self) -> None:
+        directory, self._dir = self._dir, None
+        self._entries.clear()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _write(self, data: bytes) -> state.SharedPickle:
+        assert self._dir is not None
+        fd, path = tempfile.mkstemp(dir=self._dir, suffix='.pickle')
+        try:
+            with open(fd, 'wb') as f:
+                f.write(data)
+        except BaseException:
+            # Don't leave a partial file behind, e.g. on ENOSPC
+            os.unlink(path)
+            raise
+        return state.SharedPickle(path, len(data))
+
+    def _maybe_evict(self) -> None:
+        if len(self._entries) <= self._capacity:
+            return
+        excess = len(self._entries) - self._capacity
+        for key, entry in list(self._entries.items()):
+            if entry.pins > 0:
+                continue
+            del self._entries[key]
+            try:
+                os.unlink(entry.ref.path)
+            except OSError:
+                logger.warning(
+                    'could not remove shared schema file %s',
+                    entry.ref.path,
+                    exc_info=True,
+                )
+            excess -= 1
+            if not excess:
+                break
+
+
+def _remove_stale_dirs(parent: str) -> None:
+    # Remove the directories left behind by servers that were killed
+    # before they could close their store.
+    try:
+        names = os.listdir(parent)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith(DIR_PREFIX):
+            continue
+        pid, _, _ = name[len(DIR_PREFIX):].partition('-')
+        if not pid.isdigit() or _pid_exists(int(pid)):
+            continue
+        shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def _pid_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but is owned by another user
+        return True
+    return True
+
+
+def load_pickle(data: bytes | memoryview | state.SharedPickle) -> Any:
+    """Unpickle *data*, mapping it from a SharedSchemaStore if needed."""
+    if isinstance(data, state.SharedPickle):
+        with (
+            open(data.path, 'rb') as f,
+            mmap.mmap(f.fileno(), data.size, access=mmap.ACCESS_READ) as mm,
+        ):
+            return pickle.loads(mm)
+    else:
+        return pickle.loads(data)
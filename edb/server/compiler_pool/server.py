@@ -20,6 +20,8 @@ from __future__ import annotations
 from typing import Any, Callable, cast, NamedTuple, Optional, Sequence
 
 import asyncio
+import collections
+import hashlib
 import hmac
 import functools
 import logging
@@ -53,6 +55,10 @@ _client_id_seq = 0
 _tx_state_id_seq = 0
 logger = logging.getLogger("edb.server")
 
+# The digest of the inputs of a client that a compilation request doesn't
+# cover, and the cache key of the request.
+ResultCacheKey = tuple[bytes, bytes]
+
 
 def next_tx_state_id():
     global _tx_state_id_seq
@@ -182,8 +188,14 @@ class MultiSchemaPool(
     _clients: dict[int, ClientSchema]
     _client_names: dict[int, str]
     _secret: bytes
-
-    def __init__(self, cache_size, *, secret, **kwargs):
+    _result_cache_size: int
+    _result_cache: Optional[collections.OrderedDict[ResultCacheKey, bytes]]
+    _result_cache_index: dict[bytes, set[bytes]]
+    _result_cache_refs: collections.Counter[bytes]
+    _result_cache_pending: dict[ResultCacheKey, asyncio.Future[None]]
+    _client_digests: dict[int, bytes]
+
+    def __init__(self, cache_size, *, secret, result_cache_size=0, **kwargs):
         super().__init__(**kwargs)
         self._catalog_version = None
         self._inited = asyncio.Event()
@@ -191,6 +203,23 @@ class MultiSchemaPool(
         self._clients = {}
         self._client_names = {}
         self._secret = secret
+        # Results of compile() in LRU order, shared by the clients with the
+        # same inputs.  They are keyed by the digest of the global schema
+        # and the instance config of the client, which the cache key of the
+        # compilation request doesn't cover, and by that cache key, which
+        # covers the query, the user schema version and the configs among
+        # others.  The index maps the digests to the request cache keys,
+        # so that the results of inputs that no client uses anymore can be
+        # dropped, see _release_inputs_digest().
+        self._result_cache_size = result_cache_size
+        if result_cache_size > 0:
+            self._result_cache = collections.OrderedDict()
+        else:
+            self._result_cache = None
+        self._result_cache_index = {}
+        self._result_cache_refs = collections.Counter()
+        self._result_cache_pending = {}
+        self._client_digests = {}
 
     def _init(self, kwargs: dict[str, Any]) -> None:
         # this is deferred to _init_server()
@@ -322,6 +351,9 @@ class MultiSchemaPool(
         if system_config is not None:
             client_updates["instance_config"] = system_config
 
+        if global_schema is not None or system_config is not None:
+            self._release_inputs_digest(client_id)
+
         if dbs_changed:
             client_updates["dbs"] = dbs.finish()
 
@@ -331,6 +363,48 @@ class MultiSchemaPool(
         else:
             return False
 
+    def _get_inputs_digest(self, client_id: int) -> bytes:
+        digest = self._client_digests.get(client_id)
+        if digest is None:
+            client = self._clients[client_id]
+            hasher = hashlib.blake2b(digest_size=16)
+            for data in (client.global_schema, client.instance_config):
+                assert data is not None
+                hasher.update(len(data).to_bytes(8, 'big'))
+                hasher.update(data)
+            digest = self._client_digests[client_id] = hasher.digest()
+            self._result_cache_refs[digest] += 1
+        return digest
+
+    def _release_inputs_digest(self, client_id: int) -> None:
+        digest = self._client_digests.pop(client_id, None)
+        if digest is None:
+            return
+        self._result_cache_refs[digest] -= 1
+        if self._result_cache_refs[digest] > 0:
+            return
+        # No client can use these results anymore
+        del self._result_cache_refs[digest]
+        assert self._result_cache is not None
+        for request_key in self._result_cache_index.pop(digest, ()):
+            del self._result_cache[digest, request_key]
+
+    def _cache_result(self, cache_key: ResultCacheKey, resp: bytes) -> None:
+        assert self._result_cache is not None
+        digest, request_key = cache_key
+        if digest not in self._result_cache_refs:
+            # The inputs changed while compiling
+            return
+        self._result_cache[cache_key] = resp
+        self._result_cache.move_to_end(cache_key)
+        self._result_cache_index.setdefault(digest, set()).add(request_key)
+        while len(self._result_cache) > self._result_cache_size:
+            (digest, request_key), _ = self._result_cache.popitem(last=False)
+            request_keys = self._result_cache_index[digest]
+            request_keys.discard(request_key)
+            if not request_keys:
+                del self._result_cache_index[digest]
+
     def _weighter(self, client_id: int, worker: Worker) -> queue.Comparable:
         client_schema = worker.get_tenant_schema(client_id, touch=False)
         return (
@@ -371,6 +445,59 @@ class MultiSchemaPool(
                 f"failed to sync compiler server state: "
                 f"{type(ex).__name__}({ex})"
             ) from ex
+
+        cache_key = None
+        if method_name == "compile" and self._result_cache is not None:
+            # The trailing 16 bytes of a serialized compilation request
+            # are its cache key.
+            cache_key = (
+                self._get_inputs_digest(client_id), bytes(args[0][-16:])
+            )
+            client_name = self._client_names[client_id]
+            pending = self._result_cache_pending.get(cache_key)
+            if pending is not None:
+                # Wait for an identical request in flight to finish first
+                await asyncio.shield(pending)
+            resp = self._result_cache.get(cache_key)
+            if resp is not None:
+                self._result_cache.move_to_end(cache_key)
+                metrics.compiler_result_cache_actions.inc(
+                    1, client_name, 'hit'
+                )
+                return resp
+            metrics.compiler_result_cache_actions.inc(1, client_name, 'miss')
+            if cache_key not in self._result_cache_pending:
+                self._result_cache_pending[cache_key] = (
+                    self._loop.create_future()
+                )
+            else:
+                cache_key = None
+
+        try:
+            return await self._call_worker_for_client(
+                client_id=client_id,
+                method_name=method_name,
+                dbname=dbname,
+                updated=updated,
+                args=args,
+                msg=msg,
+                cache_key=cache_key,
+            )
+        finally:
+            if cache_key is not None:
+                self._result_cache_pending.pop(cache_key).set_result(None)
+
+    async def _call_worker_for_client(
+        self,
+        *,
+        client_id: int,
+        method_name: str,
+        dbname: str,
+        updated: bool,
+        args: tuple[Any, ...],
+        msg: memoryview,
+        cache_key: Optional[ResultCacheKey],
+    ) -> Any:
         worker = await self._acquire_worker(
             weighter=functools.partial(self._weighter, client_id)
         )
@@ -459,11 +586,19 @@ class MultiSchemaPool(
             if status == 0:
                 worker.set_tenant_schema(client_id, client_schema)
                 if method_name == "compile":
-                    _units, new_pickled_state = data[0]
+                    units, new_pickled_state = data[0]
                     if new_pickled_state:
                         sid = next_tx_state_id()
                         worker._last_pickled_state_id = sid
                         resp = pickle.dumps((0, (*data[0], sid)), -1)
+                    elif (
+                        cache_key is not None
+                        and units.cacheable
+                        # the client state changed while compiling
+                        and self._clients.get(client_id) is client_schema
+                    ):
+                        resp = bytes(resp)
+                        self._cache_result(cache_key, resp)
             elif status == 1:
                 exc, _tb = data
                 if not isinstance(exc, state_mod.FailedStateSync):
@@ -598,6 +733,7 @@ class MultiSchemaPool(
         logger.debug("Client %d disconnected, invalidating cache.", client_id)
         self._clients.pop(client_id, None)
         self._client_names.pop(client_id, None)
+        self._release_inputs_digest(client_id)
         for worker in self._workers.values():
             worker.invalidate(client_id)
 
@@ -739,6 +875,7 @@ async def server_main(
     runstate_dir: Optional[str | pathlib.Path],
     metrics_port: Optional[int],
     worker_max_rss: Optional[int],
+    result_cache_size: int,
 ):
     logsetup.setup_logging('i', 'stderr')
     if listen_port is None:
@@ -768,6 +905,7 @@ async def server_main(
             cache_size=client_schema_cache_size,
             secret=secret.encode(),
             worker_max_rss=worker_max_rss,
+            result_cache_size=result_cache_size,
         )
         await pool.start()
         try:
@@ -17,7 +17,10 @@
 #
 
 
+import asyncio
+import dataclasses
 import typing
+import uuid
 
 import immutables
 
@@ -51,6 +54,33 @@ class PickledDatabaseState(typing.NamedTuple):
         )
 
 
+class UserSchemaDelta(typing.NamedTuple):
+    # Sent to compiler workers in place of the full user schema pickle
+    # when the worker is known to hold the user schema of base_version.
+    base_version: uuid.UUID
+    delta_pickle: bytes
+
+
+class SharedPickle(typing.NamedTuple):
+    # Sent to local compiler workers in place of a large pickle which was
+    # written into a schema_store.SharedSchemaStore file.
+    path: str
+    size: int
+
+
+@dataclasses.dataclass(eq=False)
+class PinnedTxState:
+    # Stands for the compiler state of a transaction kept alive in the
+    # local compiler worker with the given pid, in place of its pickle.
+    state_id: int
+    pid: int
+    # Pickled state to fall back to if the worker loses the live state;
+    # it lags behind the live state unless fallback_is_current is set.
+    fallback: bytes
+    fallback_is_current: bool
+    checkpoint: typing.Optional[asyncio.TimerHandle] = None
+
+
 class FailedStateSync(Exception):
     pass
 
@@ -20,6 +20,8 @@
 from __future__ import annotations
 from typing import Any, Mapping, Optional
 
+import collections
+import os
 import pickle
 
 import immutables
@@ -29,10 +31,12 @@ from edb import graphql
 from edb.common import uuidgen
 from edb.pgsql import params as pgparams
 from edb.schema import schema as s_schema
+from edb.schema import version as s_ver
 from edb.server import compiler
 from edb.server import config
 from edb.server import defines
 
+from . import schema_store
 from . import state
 from . import worker_proc
 
@@ -44,9 +48,24 @@ BACKEND_RUNTIME_PARAMS: pgparams.BackendRuntimeParams = \
 COMPILER: compiler.Compiler
 LAST_STATE: Optional[compiler.dbstate.CompilerConnectionState] = None
 LAST_STATE_PICKLE: Optional[bytes] = None
+# Live transaction states by state ID, see compile_in_tx()
+TX_STATES: collections.OrderedDict[
+    int, compiler.dbstate.CompilerConnectionState
+] = collections.OrderedDict()
+# IDs of the TX_STATES that the pool has a current pickle of; only these
+# are evicted when there are more than TX_STATE_CACHE_SIZE states.
+CHECKPOINTED_TX_STATES: set[int] = set()
+TX_STATE_CACHE_SIZE: int = int(
+    os.getenv("GEL_COMPILER_TX_STATE_CACHE_SIZE", 100)
+)
 STD_SCHEMA: s_schema.Schema
 GLOBAL_SCHEMA: s_schema.Schema
 INSTANCE_CONFIG: immutables.Map[str, config.SettingValue]
+# GraphQL schemas by database, along with the user and global schemas
+# they were built from; __sync__() drops them when either changes.
+GQLCORE_CACHE: dict[
+    str, tuple[s_schema.Schema, s_schema.Schema, graphql.GQLCoreSchema]
+] = {}
 
 
 def __init_worker__(
@@ -83,12 +102,29 @@ def __init_worker__(
     )
 
 
+def _apply_user_schema_delta(
+    user_schema: s_schema.Schema,
+    delta: state.UserSchemaDelta,
+) -> s_schema.Schema:
+    version = user_schema.get_global(
+        s_ver.SchemaVersion, '__schema_version__').get_version(user_schema)
+    if (
+        version != delta.base_version
+        or not isinstance(user_schema, s_schema.FlatSchema)
+    ):
+        raise AssertionError(
+            f'cannot apply user schema delta based on version '
+            f'{delta.base_version} to user schema version {version}'
+        )
+    return user_schema.apply_delta(pickle.loads(delta.delta_pickle))
+
+
 def __sync__(
     dbname: str,
     evicted_dbs: list[str],
-    user_schema: Optional[bytes],
+    user_schema: Optional[bytes | state.UserSchemaDelta | state.SharedPickle],
     reflection_cache: Optional[bytes],
-    global_schema: Optional[bytes],
+    global_schema: Optional[bytes | state.SharedPickle],
     database_config: Optional[bytes],
     system_config: Optional[bytes],
 ) -> state.DatabaseState:
@@ -101,14 +137,16 @@ def __sync__(
             dbs = DBS.mutate()
             for name in evicted_dbs:
                 dbs.pop(name, None)
+                GQLCORE_CACHE.pop(name, None)
             DBS = dbs.finish()
 
         db = DBS.get(dbname)
         if db is None:
             assert user_schema is not None
+            assert not isinstance(user_schema, state.UserSchemaDelta)
             assert reflection_cache is not None
             assert database_config is not None
-            user_schema_unpacked = pickle.loads(user_schema)
+            user_schema_unpacked = schema_store.load_pickle(user_schema)
             reflection_cache_unpacked = pickle.loads(reflection_cache)
             database_config_unpacked = pickle.loads(database_config)
             db = state.DatabaseState(
@@ -118,11 +156,15 @@ def __sync__(
                 database_config_unpacked,
             )
             DBS = DBS.set(dbname, db)
+            GQLCORE_CACHE.pop(dbname, None)
         else:
-            updates = {}
+            updates: dict[str, Any] = {}
 
-            if user_schema is not None:
-                updates['user_schema'] = pickle.loads(user_schema)
+            if isinstance(user_schema, state.UserSchemaDelta):
+                updates['user_schema'] = _apply_user_schema_delta(
+                    db.user_schema, user_schema)
+            elif user_schema is not None:
+                updates['user_schema'] = schema_store.load_pickle(user_schema)
             if reflection_cache is not None:
                 updates['reflection_cache'] = pickle.loads(reflection_cache)
             if database_config is not None:
@@ -131,14 +173,21 @@ def __sync__(
             if updates:
                 db = db._replace(**updates)
                 DBS = DBS.set(dbname, db)
+            if 'user_schema' in updates:
+                GQLCORE_CACHE.pop(dbname, None)
 
         if global_schema is not None:
-            GLOBAL_SCHEMA = pickle.loads(global_schema)
+            GLOBAL_SCHEMA = schema_store.load_pickle(global_schema)
+            GQLCORE_CACHE.clear()
 
         if system_config is not None:
             INSTANCE_CONFIG = pickle.loads(system_config)
 
     except Exception as ex:
+        # The pool forgets what this worker holds upon a failed sync and
+        # will send the full state next time, so drop ours to match.
+        DBS = immutables.Map()
+        GQLCORE_CACHE.clear()
         raise state.FailedStateSync(
             f'failed to sync worker state: {type(ex).__name__}({ex})') from ex
 
@@ -148,7 +197,7 @@ def __sync__(
 def compile(
     dbname: str,
     evicted_dbs: list[str],
-    user_schema: Optional[bytes],
+    user_schema: Optional[bytes | state.UserSchemaDelta | state.SharedPickle],
     reflection_cache: Optional[bytes],
     global_schema: Optional[bytes],
     database_config: Optional[bytes],
@@ -186,46 +235,129 @@ def compile(
     return units, LAST_STATE_PICKLE
 
 
+def prewarm(
+    dbname: str,
+    evicted_dbs: list[str],
+    user_schema: Optional[bytes | state.UserSchemaDelta | state.SharedPickle],
+    reflection_cache: Optional[bytes],
+    global_schema: Optional[bytes | state.SharedPickle],
+    database_config: Optional[bytes],
+    system_config: Optional[bytes],
+) -> None:
+    __sync__(
+        dbname,
+        evicted_dbs,
+        user_schema,
+        reflection_cache,
+        global_schema,
+        database_config,
+        system_config,
+    )
+
+
 def compile_in_tx(
-    dbname: Optional[str], user_schema: Optional[bytes], cstate, *args, **kwargs
+    dbname: Optional[str],
+    user_schema: Optional[bytes | state.SharedPickle],
+    cstate: bytes | int,
+    state_id: int,
+    *args,
+    **kwargs,
 ):
+    # The state of the transaction is taken from TX_STATES if cstate is
+    # a state ID, or it's the pickled state.  The resulting state is kept
+    # in TX_STATES under state_id and is only pickled on demand with
+    # pickle_tx_state(), so that every statement of a long transaction
+    # doesn't have to pay for pickling its schemas.  The state is dropped
+    # when the transaction ends, or with discard_tx_state() if it ends
+    # without the compiler seeing it, e.g. when the client disconnects.
     global LAST_STATE, LAST_STATE_PICKLE
 
-    prev_last_state_key = None
-    if cstate == state.REUSE_LAST_STATE_MARKER:
+    prev_state_id: Optional[int] = None
+    conn_state: compiler.dbstate.CompilerConnectionState
+    if isinstance(cstate, int):
+        prev_state_id = cstate
+        try:
+            conn_state = TX_STATES[prev_state_id]
+        except KeyError:
+            raise state.StateNotFound() from None
+        # The pool has a pickle of the state if it was checkpointed
+        pickled = prev_state_id in CHECKPOINTED_TX_STATES
+    elif cstate == state.REUSE_LAST_STATE_MARKER:
         assert LAST_STATE is not None
-        cstate = LAST_STATE
-        prev_last_state_key = cstate.get_state_key()
+        conn_state = LAST_STATE
+        # The state is going to change, it's no longer the pickled one
+        LAST_STATE = LAST_STATE_PICKLE = None
+        pickled = True
     else:
-        cstate = pickle.loads(cstate)
-        LAST_STATE_PICKLE = None
+        conn_state = pickle.loads(cstate)
         if dbname is None:
             assert user_schema is not None
-            cstate.set_root_user_schema(pickle.loads(user_schema))
+            conn_state.set_root_user_schema(
+                schema_store.load_pickle(user_schema))
         else:
-            cstate.set_root_user_schema(DBS[dbname].user_schema)
-    units, cstate = COMPILER.compile_serialized_request_in_tx(
-        cstate, *args, **kwargs)
-
-    LAST_STATE = cstate
+            conn_state.set_root_user_schema(DBS[dbname].user_schema)
+        pickled = True
+    prev_state_key = conn_state.get_state_key()
+    units, new_state = COMPILER.compile_serialized_request_in_tx(
+        conn_state, *args, **kwargs)
+    assert new_state is not None
+    changed = prev_state_key != new_state.get_state_key()
+
+    if prev_state_id is not None:
+        TX_STATES.pop(prev_state_id, None)
+        CHECKPOINTED_TX_STATES.discard(prev_state_id)
+    # SQL parameter descriptors are compiled without touching the state
+    tx_ended = isinstance(units, compiler.QueryUnitGroup) and any(
+        unit.tx_commit or unit.tx_rollback for unit in units
+    )
+    if not tx_ended:
+        TX_STATES[state_id] = new_state
+        if pickled and not changed:
+            CHECKPOINTED_TX_STATES.add(state_id)
+        _evict_tx_states()
+
+    # Tell if the state changed, i.e. the query ran DDL, configured new
+    # session aliases, configs, or globals; the previous pickle of the
+    # state is still good otherwise.
+    return units, changed
+
+
+def _evict_tx_states() -> None:
+    # The states without a current pickle in the pool are the only copy
+    # of a live transaction, so keep them even when over the limit; the
+    # pool checkpoints them as soon as their transaction gets idle.
+    excess = len(TX_STATES) - TX_STATE_CACHE_SIZE
+    if excess <= 0:
+        return
+    evicted = [
+        state_id for state_id in TX_STATES
+        if state_id in CHECKPOINTED_TX_STATES
+    ][:excess]
+    for state_id in evicted:
+        del TX_STATES[state_id]
+        CHECKPOINTED_TX_STATES.discard(state_id)
+
+
+def pickle_tx_state(state_id: int) -> bytes:
+    try:
+        conn_state = TX_STATES[state_id]
+    except KeyError:
+        raise state.StateNotFound() from None
+    rv = pickle.dumps(conn_state, -1)
+    CHECKPOINTED_TX_STATES.add(state_id)
+    _evict_tx_states()
+    return rv
 
-    # We don't want to continuously re-pickle transaction state
-    # for every new query in a transaction that doesn't actually change
-    # its state in every query. I.e. it doesn't run DDL, configures
-    # new session aliases, configs, or globals.
-    if (prev_last_state_key is None or
-        LAST_STATE_PICKLE is None or
-        prev_last_state_key != cstate.get_state_key()
-    ):
-        LAST_STATE_PICKLE = pickle.dumps(cstate, -1)
 
-    return units, LAST_STATE_PICKLE
+def discard_tx_state(state_id: int) -> None:
+    TX_STATES.pop(state_id, None)
+    CHECKPOINTED_TX_STATES.discard(state_id)
 
 
 def compile_notebook(
     dbname: str,
     evicted_dbs: list[str],
-    user_schema: Optional[bytes],
+    user_schema: Optional[bytes | state.UserSchemaDelta | state.SharedPickle],
     reflection_cache: Optional[bytes],
     global_schema: Optional[bytes],
     database_config: Optional[bytes],
@@ -257,7 +389,7 @@ def compile_notebook(
 def compile_graphql(
     dbname: str,
     evicted_dbs: list[str],
-    user_schema: Optional[bytes],
+    user_schema: Optional[bytes | state.UserSchemaDelta | state.SharedPickle],
     reflection_cache: Optional[bytes],
     global_schema: Optional[bytes],
     database_config: Optional[bytes],
@@ -276,6 +408,7 @@ def compile_graphql(
         system_config,
     )
 
+    compile_kwargs['gqlcore'] = _get_gqlcore(db)
     gql_op = graphql.compile_graphql(
         STD_SCHEMA,
         db.user_schema,
@@ -286,9 +419,7 @@ def compile_graphql(
         **compile_kwargs
     )
 
-    source = edgeql.Source.from_string(
-        edgeql.generate_source(gql_op.edgeql_ast, pretty=True),
-    )
+    source = edgeql.ASTSource([gql_op.edgeql_ast])
 
     cfg_ser = COMPILER.state.compilation_config_serializer
     request = compiler.CompilationRequest(
@@ -319,10 +450,24 @@ def compile_graphql(
     return unit_group, gql_op  # type: ignore[return-value]
 
 
+def _get_gqlcore(db: state.DatabaseState) -> graphql.GQLCoreSchema:
+    entry = GQLCORE_CACHE.get(db.name)
+    if (
+        entry is not None
+        and entry[0] is db.user_schema
+        and entry[1] is GLOBAL_SCHEMA
+    ):
+        return entry[2]
+
+    gqlcore = graphql.get_gqlcore(STD_SCHEMA, db.user_schema, GLOBAL_SCHEMA)
+    GQLCORE_CACHE[db.name] = (db.user_schema, GLOBAL_SCHEMA, gqlcore)
+    return gqlcore
+
+
 def compile_sql(
     dbname: str,
     evicted_dbs: list[str],
-    user_schema: Optional[bytes],
+    user_schema: Optional[bytes | state.UserSchemaDelta | state.SharedPickle],
     reflection_cache: Optional[bytes],
     global_schema: Optional[bytes],
     database_config: Optional[bytes],
@@ -363,6 +508,12 @@ def get_handler(methname):
             meth = compile
         elif methname == "compile_in_tx":
             meth = compile_in_tx
+        elif methname == "pickle_tx_state":
+            meth = pickle_tx_state
+        elif methname == "discard_tx_state":
+            meth = discard_tx_state
+        elif methname == "prewarm":
+            meth = prewarm
         elif methname == "compile_notebook":
             meth = compile_notebook
         elif methname == "compile_graphql":
@@ -0,0 +1,176 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Compression of HTTP response bodies and of dump data."""
+
+
+from __future__ import annotations
+from typing import Any, Iterable, Optional
+
+import gzip
+import os
+
+
+zstd: Any
+try:
+    from compression import zstd  # type: ignore
+except ImportError:
+    try:
+        import zstandard as zstd  # type: ignore
+    except ImportError:
+        zstd = None
+
+lz4: Any
+try:
+    import lz4.frame as lz4  # type: ignore
+except ImportError:
+    lz4 = None
+
+
+# Bodies smaller than this are sent as is.
+HTTP_MIN_SIZE = int(os.getenv("GEL_SERVER_HTTP_COMPRESSION_MIN_SIZE", 1024))
+# Bodies at least this large are compressed in a thread, off the event loop.
+HTTP_THREAD_MIN_SIZE = int(
+    os.getenv("GEL_SERVER_HTTP_COMPRESSION_THREAD_MIN_SIZE", 256 * 1024)
+)
+GZIP_LEVEL = int(os.getenv("GEL_SERVER_HTTP_GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.getenv("GEL_SERVER_HTTP_ZSTD_LEVEL", 3))
+DUMP_ZSTD_LEVEL = int(os.getenv("GEL_SERVER_DUMP_ZSTD_LEVEL", 3))
+
+# Supported content codings, in the order of preference.
+ENCODINGS: tuple[str, ...] = (
+    ('zstd', 'gzip') if zstd is not None else ('gzip',)
+)
+
+# Supported compressions of dump data fragments, in the order of preference.
+DUMP_ENCODINGS: tuple[str, ...] = tuple(
+    encoding for encoding, mod in [('zstd', zstd), ('lz4', lz4)]
+    if mod is not None
+)
+
+_COMPRESSIBLE_TYPES = (
+    b'application/json',
+    b'application/graphql-response+json',
+    b'application/javascript',
+    b'application/xml',
+    b'image/svg+xml',
+)
+
+
+def is_compressible(content_type: Optional[bytes]) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.split(b';', 1)[0].strip().lower()
+    return (
+        content_type.startswith(b'text/')
+        and content_type != b'text/event-stream'
+    ) or content_type in _COMPRESSIBLE_TYPES
+
+
+def negotiate_encoding(accept_encoding: Optional[bytes]) -> Optional[str]:
+    """Pick the content coding of a response from *accept_encoding*.
+
+    Returns None if the response should not be compressed.
+    """
+    if not accept_encoding:
+        return None
+
+    qvalues: dict[str, float] = {}
+    for item in accept_encoding.decode('latin-1').split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+
+    default = qvalues.get('*', 0.0)
+    best = None
+    best_q = 0.0
+    for encoding in ENCODINGS:
+        q = qvalues.get(encoding, default)
+        if q > best_q:
+            best = encoding
+            best_q = q
+    return best
+
+
+def negotiate_dump_encoding(requested: Iterable[str]) -> Optional[str]:
+    """Pick the compression of dump data from the *requested* ones.
+
+    Returns None if the data should not be compressed.
+    """
+    requested = set(requested)
+    for encoding in DUMP_ENCODINGS:
+        if encoding in requested:
+            return encoding
+    return None
+
+
+def compress_dump_data(data: bytes, encoding: str) -> bytes:
+    level = DUMP_ZSTD_LEVEL if encoding == 'zstd' else None
+    return compress(data, encoding, level=level)
+
+
+def compress(
+    data: bytes,
+    encoding: str,
+    *,
+    level: Optional[int] = None,
+) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(
+            data,
+            compresslevel=GZIP_LEVEL if level is None else level,
+            mtime=0,
+        )
+    elif encoding == 'zstd' and zstd is not None:
+        return zstd.compress(
+            data, level=ZSTD_LEVEL if level is None else level
+        )
+    elif encoding == 'lz4' and lz4 is not None:
+        return lz4.compress(data)
+    else:
+        raise ValueError(f'unsupported content coding: {encoding!r}')
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    elif encoding == 'zstd' and zstd is not None:
+        return zstd.decompress(data)
+    elif encoding == 'lz4' and lz4 is not None:
+        return lz4.decompress(data)
+    else:
+        raise ValueError(f'unsupported content coding: {encoding!r}')
+
+
+def is_supported(encoding: str) -> bool:
+    return (
+        encoding == 'gzip'
+        or (encoding == 'zstd' and zstd is not None)
+        or (encoding == 'lz4' and lz4 is not None)
+    )
@@ -78,15 +78,19 @@ cdef class Database:
         object _introspection_lock
         object _state_serializers
         readonly object user_config_spec
+        readonly object graphql_persisted_queries
 
         object _cache_worker_task
         object _cache_queue
         object _cache_notify_task
         object _cache_notify_queue
+        object _cache_warm_task
 
         uint64_t _tx_seq
         object _active_tx_list
         object _func_cache_gt_tx_seq
+        list _evicted_queries
+        dict _query_cache_stats
 
         readonly str name
         readonly object schema_version
@@ -100,8 +104,15 @@ cdef class Database:
         readonly object _feature_used_metrics
         readonly int dml_queries_executed
 
-    cdef _invalidate_caches(self)
+    cdef _invalidate_caches(
+        self,
+        base_schema_version=?,
+        affected_ids=?,
+    )
+    cdef _retain_compiled_sql(self, base_schema_version, affected_ids)
+    cdef _retain_compiled_queries(self, base_schema_version, affected_ids)
     cdef _cache_compiled_query(self, key, compiled)
+    cpdef record_query_cache_action(self, str cache, str action, int count=?)
     cdef _new_view(self, query_cache, protocol_version, role_name)
     cdef _remove_view(self, view)
     cdef _observe_auth_ext_config(self)
@@ -123,6 +134,9 @@ cdef class Database:
         backend_ids=?,
         db_config=?,
         start_stop_extensions=?,
+        user_schema_delta=?,
+        user_schema_delta_base=?,
+        user_schema_affected_ids=?,
     )
     cpdef start_stop_extensions(self)
     cdef get_state_serializer(self, protocol_version)
@@ -192,6 +206,7 @@ cdef class DatabaseConnectionView:
         object __weakref__
 
     cdef _reset_tx_state(self)
+    cdef _discard_comp_state(self)
     cdef inline _check_in_tx_error(self, query_unit_group)
 
     cdef clear_tx_error(self)
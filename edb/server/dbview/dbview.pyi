@@ -31,6 +31,7 @@ import uuid
 
 import immutables
 
+from edb.common import lru
 from edb.schema import schema as s_schema
 
 from edb.server import config
@@ -51,6 +52,7 @@ class Database:
     db_config: Config
     extensions: set[str]
     user_config_spec: config.Spec
+    graphql_persisted_queries: lru.LRUMapping
     dml_queries_executed: int
 
     @property
@@ -110,12 +112,18 @@ class Database:
     def clear_query_cache(self) -> None:
         ...
 
+    def warm_query_cache(self) -> None:
+        ...
+
     def iter_views(self) -> Iterator[DatabaseConnectionView]:
         ...
 
     def get_query_cache_size(self) -> int:
         ...
 
+    def get_query_cache_stats(self) -> dict[str, dict[str, Any]]:
+        ...
+
     async def introspection(self) -> None:
         ...
 
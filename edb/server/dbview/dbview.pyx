@@ -23,6 +23,8 @@ from typing import (
 import asyncio
 import base64
 import copy
+import dataclasses
+import itertools
 import json
 import logging
 import os.path
@@ -36,7 +38,7 @@ import weakref
 import immutables
 
 from edb import errors
-from edb.common import debug, lru, uuidgen, asyncutil, span
+from edb.common import debug, uuidgen, asyncutil, lru, span
 from edb import edgeql
 from edb.edgeql import qltypes
 from edb.schema import schema as s_schema
@@ -73,9 +75,29 @@ cdef DEFAULT_STATE = json.dumps([]).encode('utf-8')
 cdef INT32_PACKER = struct.Struct('!l').pack
 
 cdef int VER_COUNTER = 0
-cdef DICTDEFAULT = (None, None)
+cdef DICTDEFAULT = (None, None, 0.0)
 cdef object logger = logging.getLogger('edb.server')
 
+# How many cached queries of previous schema versions are recompiled in
+# the background after the schema is changed or the cache is loaded.
+cdef int QUERY_CACHE_WARM_SIZE = int(
+    os.getenv("GEL_SERVER_QUERY_CACHE_WARM_SIZE", 100)
+)
+cdef double QUERY_CACHE_WARM_POLL_INTERVAL = 0.1
+# Stop warming if no compiler worker got idle for this long, the rest
+# of the queries are compiled on first use as usual.
+cdef double QUERY_CACHE_WARM_IDLE_TIMEOUT = 30.0
+
+# How many GraphQL documents registered by hash with the automatic
+# persisted queries protocol are kept per branch.
+cdef int GRAPHQL_PERSISTED_QUERIES_SIZE = int(
+    os.getenv("GEL_SERVER_GRAPHQL_PERSISTED_QUERIES_SIZE", 1000)
+)
+
+# Assumed compile time of cached queries that weren't timed, e.g. ones
+# loaded from the persistent cache.
+cdef double DEFAULT_COMPILE_TIME = 0.01
+
 cdef uint64_t DML_CAPABILITIES = compiler.Capability.MODIFICATIONS
 cdef uint64_t DDL_CAPABILITIES = compiler.Capability.DDL
 
@@ -93,6 +115,39 @@ cdef TYPES_SQL_ONLY = immutables.Map({
     194: "00000000-0000-0000-0000-000000000101", # pg_node_tree -> str
  })
 
+def _weigh_compiled(double compile_time, Py_ssize_t size):
+    # How much a compiled query is worth keeping in the query cache per
+    # lookup: the time it took to compile it per KiB of memory it takes.
+    if compile_time <= 0:
+        compile_time = DEFAULT_COMPILE_TIME
+    return compile_time / max(1.0, size / 1024)
+
+
+cdef Py_ssize_t _query_unit_group_size(query_unit_group):
+    # Estimated memory taken by a compiled query, in bytes
+    cdef Py_ssize_t size = 0
+    for i in range(len(query_unit_group)):
+        data = query_unit_group.maybe_get_serialized(i)
+        size += len(data) if data is not None else 1024
+    return size
+
+
+cdef Py_ssize_t _sql_units_size(compiled):
+    return sum(len(unit.query) for unit in compiled)
+
+
+def _weigh_query_unit_group(query_unit_group):
+    return _weigh_compiled(
+        query_unit_group.compile_time,
+        _query_unit_group_size(query_unit_group),
+    )
+
+
+def _weigh_sql_units(entry):
+    compiled, _, compile_time = entry
+    return _weigh_compiled(compile_time, _sql_units_size(compiled))
+
+
 cdef next_dbver():
     global VER_COUNTER
     VER_COUNTER += 1
@@ -106,6 +161,48 @@ cdef enum CacheState:
     Evicted
 
 
+cdef bint _depends_on(units, affected_ids):
+    for unit in units:
+        if (
+            unit.schema_refs is None
+            or not affected_ids.isdisjoint(unit.schema_refs)
+        ):
+            return True
+    return False
+
+
+cdef _carry_over_unit_group(unit_group, schema_version):
+    # Copy a cached group compiled against the previous schema version
+    # for the current one.  The copy is only kept in memory, as the
+    # persisted cache entry of the original is bound to its version.
+    if unit_group.state_serializer is not None:
+        return None
+    units = []
+    for i, unit in enumerate(unit_group):
+        if (
+            unit.cache_func_call is not None
+            and unit.sql == unit.cache_func_call[0]
+        ):
+            # Already switched to calling the persisted function, which
+            # is dropped along with the original; get the actual SQL back.
+            serialized = unit_group.maybe_get_serialized(i)
+            if serialized is None:
+                return None
+            unit = dbstate.QueryUnit.deserialize(serialized)
+        units.append(dataclasses.replace(
+            unit,
+            cache_sql=None,
+            cache_func_call=None,
+            user_schema_version=schema_version,
+        ))
+    rv = copy.copy(unit_group)
+    rv._units = units
+    rv._unpacked_units = None
+    rv.cache_state = CacheState.Pending
+    rv.tx_seq_id = 0
+    return rv
+
+
 @cython.final
 cdef class CompiledQuery:
 
@@ -174,11 +271,13 @@ cdef class Database:
         self._introspection_lock = asyncio.Lock()
 
         self._eql_to_compiled = stmt_cache.StatementsCache(
-            maxsize=self.lookup_config('query_cache_size')
+            maxsize=self.lookup_config('query_cache_size'),
+            weigher=_weigh_query_unit_group,
         )
         self._cache_locks = {}
-        self._sql_to_compiled = lru.LRUMapping(
-            maxsize=self.lookup_config('query_cache_size')
+        self._sql_to_compiled = stmt_cache.StatementsCache(
+            maxsize=self.lookup_config('query_cache_size'),
+            weigher=_weigh_sql_units,
         )
 
         # Tracks the active transactions and their creation sequence. The
@@ -190,6 +289,17 @@ cdef class Database:
         # inline SQL due to active transactions.
         self._func_cache_gt_tx_seq = {}
 
+        # Cached queries removed on schema changes, for the cache worker
+        # to also evict from the persistent cache.
+        self._evicted_queries = []
+
+        # Number of each (cache, action) of the query caches, as in the
+        # query_cache_actions metric.
+        self._query_cache_stats = {}
+
+        self.graphql_persisted_queries = lru.LRUMapping(
+            maxsize=GRAPHQL_PERSISTED_QUERIES_SIZE)
+
         self.db_config = db_config
         self.user_schema_pickle = user_schema_pickle
         if ext_config_settings is not None:
@@ -213,6 +323,7 @@ cdef class Database:
         self._cache_notify_queue = asyncio.Queue()
         self._cache_notify_task = asyncio.create_task(
             self.monitor(self.cache_notifier, 'cache_notifier'))
+        self._cache_warm_task = None
 
         self.dml_queries_executed = 0
 
@@ -225,12 +336,18 @@ cdef class Database:
         return self._index._tenant
 
     def stop(self):
+        compiler_pool = self.server.get_compiler_pool()
+        if compiler_pool is not None:
+            compiler_pool.discard_user_schema_delta(self.name)
         if self._cache_worker_task:
             self._cache_worker_task.cancel()
             self._cache_worker_task = None
         if self._cache_notify_task:
             self._cache_notify_task.cancel()
             self._cache_notify_task = None
+        if self._cache_warm_task:
+            self._cache_warm_task.cancel()
+            self._cache_warm_task = None
         self._set_extensions(set())
         self._set_feature_used_metrics({})
         self.start_stop_extensions()
@@ -252,8 +369,11 @@ cdef class Database:
         while True:
             # First, handle any evictions
             keys = []
+            evicted, self._evicted_queries = self._evicted_queries, []
             while self._eql_to_compiled.needs_cleanup():
-                query_req, unit_group = self._eql_to_compiled.cleanup_one()
+                evicted.append(self._eql_to_compiled.cleanup_one())
+                self.record_query_cache_action('query', 'evict')
+            for query_req, unit_group in evicted:
                 if len(unit_group) == 1 and unit_group.cache_state == 1:
                     keys.append(query_req.get_cache_key())
                     self._func_cache_gt_tx_seq.pop(query_req, None)
@@ -274,7 +394,7 @@ cdef class Database:
                 ops.append(self._cache_queue.get_nowait())
             # Filter ops for only what we need
             ops = [
-                (query_req, units) for query_req, units in ops
+                (query_req, units) for query_req, units in filter(None, ops)
                 if len(units) == 1
                 and units[0].cache_sql
                 and units.cache_state == CacheState.Pending
@@ -407,10 +527,34 @@ cdef class Database:
         backend_ids=None,
         db_config=None,
         start_stop_extensions=True,
+        user_schema_delta=None,
+        user_schema_delta_base=None,
+        user_schema_affected_ids=None,
     ):
         if new_schema_pickle is None:
             raise AssertionError('new_schema is not supposed to be None')
 
+        schema_changed = self.user_schema_pickle is not None
+        base_schema_version = None
+
+        if (
+            user_schema_delta is not None
+            and self.user_schema_pickle is not None
+            and user_schema_delta_base == self.schema_version
+        ):
+            base_schema_version = user_schema_delta_base
+            # Let the compiler pool sync workers that hold the current
+            # user schema with the delta instead of the full pickle.
+            compiler_pool = self.server.get_compiler_pool()
+            if compiler_pool is not None:
+                compiler_pool.add_user_schema_delta(
+                    self.name,
+                    self.user_schema_pickle,
+                    new_schema_pickle,
+                    user_schema_delta_base,
+                    user_schema_delta,
+                )
+
         self.schema_version = schema_version
         self.dbver = next_dbver()
 
@@ -427,10 +571,127 @@ cdef class Database:
         if db_config is not None:
             self.db_config = db_config
             self._observe_auth_ext_config()
-        self._invalidate_caches()
+        self._invalidate_caches(base_schema_version, user_schema_affected_ids)
         if start_stop_extensions:
             self.start_stop_extensions()
 
+        if schema_changed and self.db_config is not None:
+            # Sync idle compiler workers with the new schema in the
+            # background, so that queries right after DDL don't pay for it.
+            compiler_pool = self.server.get_compiler_pool()
+            if compiler_pool is not None:
+                compiler_pool.prewarm(
+                    self.name,
+                    self.user_schema_pickle,
+                    self._index._global_schema_pickle,
+                    self.reflection_cache,
+                    self.db_config,
+                    self._index.get_compilation_system_config(),
+                )
+            self.warm_query_cache()
+
+    def warm_query_cache(self):
+        # Recompile the most recently used cached queries of previous
+        # schema versions against the current one in the background, so
+        # that clients don't have to wait for them on first use.
+        if self._cache_warm_task is not None:
+            self._cache_warm_task.cancel()
+            self._cache_warm_task = None
+        if (
+            QUERY_CACHE_WARM_SIZE <= 0
+            or self.user_schema_pickle is None
+            or self.db_config is None
+        ):
+            return
+        self._cache_warm_task = asyncio.create_task(
+            self._warm_query_cache(
+                self.schema_version, list(self._evicted_queries)
+            )
+        )
+
+    async def _warm_query_cache(self, schema_version, evicted):
+        compiler_pool = self.server.get_compiler_pool()
+        database_config = self.db_config
+        system_config = self._index.get_compilation_system_config()
+
+        requests = []
+        seen = set()
+        query_req: rpc.CompilationRequest
+        # Reversed so that we compile more recently used first, starting
+        # with the ones just evicted for depending on the schema change.
+        for query_req, unit_group in itertools.chain(
+            reversed(evicted), reversed(self._eql_to_compiled.items())
+        ):
+            if len(requests) >= QUERY_CACHE_WARM_SIZE:
+                break
+            if (
+                len(unit_group) != 1
+                or query_req.schema_version == schema_version
+                # SQL queries require _amend_typedesc_in_sql() with a
+                # backend connection, which is not available here.
+                or query_req.input_language == enums.InputLanguage.SQL
+            ):
+                continue
+            query_req = copy.copy(query_req)
+            query_req.set_schema_version(schema_version)
+            query_req.set_database_config(database_config)
+            query_req.set_system_config(system_config)
+            if query_req in seen or query_req in self._eql_to_compiled:
+                continue
+            seen.add(query_req)
+            requests.append(query_req)
+
+        warmed = 0
+        for query_req in requests:
+            # Only use idle compiler workers, clients come first.
+            if not await self._wait_for_idle_compiler(compiler_pool):
+                logger.debug(
+                    "compiler workers are busy, stopped recompiling cached "
+                    "queries of branch %r in the background", self.name,
+                )
+                break
+            if self.schema_version != schema_version:
+                return
+            if query_req in self._eql_to_compiled:
+                # A client got to compile it first
+                continue
+            try:
+                unit_group, _, _ = await compiler_pool.compile(
+                    self.name,
+                    self.user_schema_pickle,
+                    self._index._global_schema_pickle,
+                    self.reflection_cache,
+                    database_config,
+                    system_config,
+                    query_req.serialize(),
+                    "<unknown>",
+                    client_id=self.tenant.client_id,
+                    client_name=self.tenant.get_instance_name(),
+                )
+            except Exception:
+                # ignore cache entry that cannot be recompiled
+                continue
+            if self.schema_version != schema_version:
+                return
+            if unit_group.cacheable:
+                self._cache_compiled_query(query_req, unit_group)
+                self.record_query_cache_action('query', 'warm')
+                warmed += 1
+
+        if warmed:
+            logger.debug(
+                "recompiled %d cached queries of branch %r in the background",
+                warmed, self.name,
+            )
+
+    async def _wait_for_idle_compiler(self, compiler_pool):
+        deadline = time.monotonic() + QUERY_CACHE_WARM_IDLE_TIMEOUT
+        while not compiler_pool.has_idle_workers():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(QUERY_CACHE_WARM_POLL_INTERVAL)
+        return True
+
     cpdef start_stop_extensions(self):
         if "ai" in self.extensions:
             ai_ext.start_extension(self.tenant, self.name)
@@ -468,10 +729,71 @@ cdef class Database:
             if v[0] is not None
         })
 
-    cdef _invalidate_caches(self):
-        self._sql_to_compiled.clear()
+    cdef _invalidate_caches(
+        self,
+        base_schema_version=None,
+        affected_ids=None,
+    ):
+        if base_schema_version is None or affected_ids is None:
+            self.record_query_cache_action(
+                'sql', 'invalidate', len(self._sql_to_compiled)
+            )
+            self._sql_to_compiled.clear()
+        else:
+            # The new schema is base_schema_version changed in ways that
+            # only affect the uses of affected_ids: keep the queries
+            # compiled against the base version that use none of them.
+            self._retain_compiled_sql(base_schema_version, affected_ids)
+            self._retain_compiled_queries(base_schema_version, affected_ids)
         self._index.invalidate_caches()
 
+    cdef _retain_compiled_sql(self, base_schema_version, affected_ids):
+        for key, (compiled, ver, compile_time) in list(
+            self._sql_to_compiled.items()
+        ):
+            if (
+                ver == base_schema_version
+                and not _depends_on(compiled, affected_ids)
+            ):
+                self._sql_to_compiled[key] = (
+                    compiled, self.schema_version, compile_time
+                )
+            else:
+                del self._sql_to_compiled[key]
+                self.record_query_cache_action('sql', 'invalidate')
+
+    cdef _retain_compiled_queries(self, base_schema_version, affected_ids):
+        # Unlike the SQL cache, the keys of this one include the schema
+        # version, so the queries to keep are moved to new keys.  The rest
+        # of the base version can't be used by anyone but transactions
+        # that started before the change, so evict them right away
+        # instead of leaving them to crowd out queries of the new schema.
+        retained = []
+        query_req: rpc.CompilationRequest
+        for query_req, unit_group in list(self._eql_to_compiled.items()):
+            if query_req.schema_version != base_schema_version:
+                continue
+            del self._eql_to_compiled[query_req]
+            self._evicted_queries.append((query_req, unit_group))
+            if _depends_on(unit_group, affected_ids):
+                self.record_query_cache_action('query', 'invalidate')
+                continue
+            unit_group = _carry_over_unit_group(
+                unit_group, self.schema_version
+            )
+            if unit_group is not None:
+                query_req = copy.copy(query_req)
+                query_req.set_schema_version(self.schema_version)
+                retained.append((query_req, unit_group))
+
+        for query_req, unit_group in retained:
+            self._cache_compiled_query(query_req, unit_group)
+
+        if self._evicted_queries and self._cache_queue is not None:
+            # Wake up the cache worker to evict them from the persistent
+            # cache too; None doesn't add anything to it.
+            self._cache_queue.put_nowait(None)
+
     cdef _cache_compiled_query(self, key, compiled: dbstate.QueryUnitGroup):
         # `dbver` must be the schema version `compiled` was compiled upon
         assert compiled.cacheable
@@ -479,27 +801,88 @@ cdef class Database:
         if key in self._eql_to_compiled:
             # We already have a cached query for the current user schema
             return
+        if not self._eql_to_compiled.admits(key, compiled):
+            # Not worth evicting any of the cached queries for
+            return
 
         self._eql_to_compiled[key] = compiled
 
         if self._cache_queue is not None:
             self._cache_queue.put_nowait((key, compiled))
 
-    def cache_compiled_sql(self, key, compiled: list[str], schema_version):
-        existing, ver = self._sql_to_compiled.get(key, DICTDEFAULT)
-        if existing is not None and ver == self.schema_version:
-            # We already have a cached query for a more recent DB version.
-            return
+    def cache_compiled_sql(
+        self,
+        key,
+        compiled: list[str],
+        schema_version,
+        compile_time: float = 0.0,
+    ):
+        if key in self._sql_to_compiled:
+            existing, ver, _ = self._sql_to_compiled[key]
+            if ver == self.schema_version:
+                # We already have a cached query for a more recent DB
+                # version.
+                return
         if not all(unit.cacheable for unit in compiled):
             return
 
         # Store the matching schema version, see also the comments at origin
-        self._sql_to_compiled[key] = compiled, schema_version
+        entry = compiled, schema_version, compile_time
+        if not self._sql_to_compiled.admits(key, entry):
+            return
+        self._sql_to_compiled[key] = entry
+        while self._sql_to_compiled.needs_cleanup():
+            self._sql_to_compiled.cleanup_one()
+            self.record_query_cache_action('sql', 'evict')
 
     def lookup_compiled_sql(self, key):
-        rv, cached_ver = self._sql_to_compiled.get(key, DICTDEFAULT)
+        rv, cached_ver, _ = self._sql_to_compiled.get(key, DICTDEFAULT)
         if rv is not None and cached_ver != self.schema_version:
             rv = None
+        self.record_query_cache_action(
+            'sql', 'miss' if rv is None else 'hit'
+        )
+        return rv
+
+    cpdef record_query_cache_action(
+        self, str cache, str action, int count=1
+    ):
+        if not count:
+            return
+        key = (cache, action)
+        self._query_cache_stats[key] = (
+            self._query_cache_stats.get(key, 0) + count
+        )
+        metrics.query_cache_actions.inc(
+            count, self.tenant.get_instance_name(), self.name, cache, action
+        )
+
+    def get_query_cache_stats(self):
+        sizes = {
+            'query': (
+                len(self._eql_to_compiled),
+                sum(
+                    _query_unit_group_size(group)
+                    for _, group in self._eql_to_compiled.items()
+                ),
+            ),
+            'sql': (
+                len(self._sql_to_compiled),
+                sum(
+                    _sql_units_size(compiled)
+                    for _, (compiled, _, _) in self._sql_to_compiled.items()
+                ),
+            ),
+        }
+        rv = {}
+        for (cache, action), count in self._query_cache_stats.items():
+            rv.setdefault(cache, {})[action] = count
+        for cache, (size, memory) in sizes.items():
+            rv.setdefault(cache, {}).update(size=size, memory_estimate=memory)
+        for stats in rv.values():
+            hits = stats.get('hit', 0)
+            lookups = hits + stats.get('miss', 0)
+            stats['hit_ratio'] = hits / lookups if lookups else None
         return rv
 
     cdef _new_view(self, query_cache, protocol_version, role_name):
@@ -514,6 +897,8 @@ cdef class Database:
 
     cdef _remove_view(self, view):
         self._views.remove(view)
+        # The transaction of the view, if any, is gone with it
+        (<DatabaseConnectionView>view)._discard_comp_state()
 
     cdef get_state_serializer(self, protocol_version):
         return self._state_serializers.get(protocol_version)
@@ -553,6 +938,7 @@ cdef class Database:
                     else:
                         group[0].maybe_use_func_cache()
                     self._eql_to_compiled[query_req] = group
+                    self.record_query_cache_action('query', 'load')
             except Exception as e:
                 if warning_count < 0:
                     warning_count -= 1
@@ -679,6 +1065,16 @@ cdef class DatabaseConnectionView:
         self._in_tx_dbver = 0
         self._in_tx_isolation_level = None
 
+    cdef _discard_comp_state(self):
+        # Have the compiler drop the state of a transaction that ends
+        # without the compiler seeing its COMMIT or ROLLBACK.
+        if self._last_comp_state is not None:
+            compiler_pool = self._db._index._server.get_compiler_pool()
+            if compiler_pool is not None:
+                compiler_pool.discard_tx_state(self._last_comp_state)
+            self._last_comp_state = None
+            self._last_comp_state_id = 0
+
     cdef clear_tx_error(self):
         self._tx_error = False
 
@@ -721,6 +1117,7 @@ cdef class DatabaseConnectionView:
     cdef abort_tx(self):
         if not self.in_tx():
             raise errors.InternalServerError('abort_tx(): not in transaction')
+        self._discard_comp_state()
         self._reset_tx_state()
 
     cpdef get_session_config(self):
@@ -1141,7 +1538,12 @@ cdef class DatabaseConnectionView:
         ):
             return None
 
-        return self._db._eql_to_compiled.get(key, None)
+        rv = self._db._eql_to_compiled.get(key, None)
+        if rv is not None:
+            # Misses are recorded by parse() once it compiles the query,
+            # as there may be several lookups before that.
+            self._db.record_query_cache_action('query', 'hit')
+        return rv
 
     cdef tx_error(self):
         if self._in_tx:
@@ -1225,6 +1627,12 @@ cdef class DatabaseConnectionView:
                     pickle.loads(query_unit.cached_reflection)
                         if query_unit.cached_reflection is not None
                         else None,
+                    None,  # backend_ids
+                    None,  # db_config
+                    True,  # start_stop_extensions
+                    query_unit.user_schema_delta,
+                    query_unit.user_schema_delta_base,
+                    query_unit.user_schema_affected_ids,
                 )
                 side_effects |= SideEffects.SchemaChanges
             if query_unit.system_config:
@@ -1270,6 +1678,12 @@ cdef class DatabaseConnectionView:
                     pickle.loads(query_unit.cached_reflection)
                         if query_unit.cached_reflection is not None
                         else None,
+                    None,  # backend_ids
+                    None,  # db_config
+                    True,  # start_stop_extensions
+                    query_unit.user_schema_delta,
+                    query_unit.user_schema_delta_base,
+                    query_unit.user_schema_affected_ids,
                 )
                 side_effects |= SideEffects.SchemaChanges
             if self._in_tx_with_sysconfig:
@@ -1309,6 +1723,8 @@ cdef class DatabaseConnectionView:
         self._modaliases = self._in_tx_modaliases
         self._globals = self._in_tx_globals
 
+        if self._in_tx_capabilities & DML_CAPABILITIES:
+            self._db.dml_queries_executed += 1
         if self._in_tx_new_types:
             self._db._update_backend_ids(self._in_tx_new_types)
         if user_schema is not None:
@@ -1517,6 +1933,8 @@ cdef class DatabaseConnectionView:
                 if query_unit_group is not None:
                     return self.as_compiled(
                         query_req, query_unit_group, use_metrics)
+                if not cached_globally:
+                    self._db.record_query_cache_action('query', 'miss')
 
             try:
                 query_unit_group = await self._compile(query_req)
@@ -1838,6 +2256,7 @@ cdef class DatabaseConnectionView:
             )
 
         unit_group, self._last_comp_state, self._last_comp_state_id = result
+        unit_group.compile_time = time.monotonic() - started_at
 
         return unit_group
 
@@ -233,6 +233,7 @@ async def _run_server(
             compiler_pool_mode=args.compiler_pool_mode,
             compiler_pool_addr=args.compiler_pool_addr,
             compiler_worker_max_rss=args.compiler_worker_max_rss,
+            compiler_worker_branch_budget=args.compiler_worker_branch_budget,
             nethosts=args.bind_addresses,
             netport=args.port,
             listen_sockets=tuple(s for ss in sockets.values() for s in ss),
@@ -78,12 +78,26 @@ compiler_process_client_actions = registry.new_labeled_counter(
     labels=('pid', 'action'),
 )
 
+compiler_result_cache_actions = registry.new_labeled_counter(
+    'compiler_result_cache_actions_total',
+    'Number of lookups in the compile result cache of the compiler server.',
+    labels=('client', 'action'),
+)
+
 compiler_pool_wait_time = registry.new_histogram(
     'compiler_pool_wait_time',
     'Time it takes to acquire a compiler process.',
     unit=prom.Unit.SECONDS,
 )
 
+compiler_pool_scaling_actions = registry.new_labeled_counter(
+    'compiler_pool_scaling_actions_total',
+    'Number of compiler processes spawned ahead of demand (spare-spawn) or '
+    'for waiting requests (cold-spawn), and of spare processes used '
+    '(spare-hit) by the adaptive compiler pool.',
+    labels=('action',),
+)
+
 compiler_pool_queue_errors = registry.new_labeled_counter(
     'compiler_pool_queue_errors_total',
     'Number of compiler pool errors in queue.',
@@ -191,6 +205,15 @@ query_compilation_duration = registry.new_labeled_histogram(
     labels=('tenant', 'interface'),
 )
 
+query_cache_actions = registry.new_labeled_counter(
+    'query_cache_actions_total',
+    'Number of hits, misses, evictions (evict), schema change '
+    'invalidations (invalidate), loads from the persistent cache (load) '
+    'and background recompilations (warm) of the compiled query caches '
+    'of each branch.',
+    labels=('tenant', 'branch', 'cache', 'action'),
+)
+
 sql_queries = registry.new_labeled_counter(
     'sql_queries_total',
     'Number of SQL queries.',
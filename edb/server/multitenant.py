@@ -482,6 +482,7 @@ async def run_server(
                 args.compiler_pool_tenant_cache_size
             ),
             compiler_worker_max_rss=args.compiler_worker_max_rss,
+            compiler_worker_branch_budget=args.compiler_worker_branch_budget,
             compiler_state=compiler_state,
             use_monitor_fs=args.reload_config_files in [
                 srvargs.ReloadTrigger.Default,
@@ -65,6 +65,7 @@ from edb.server.pgproto.pgproto cimport (
 )
 
 from edb.server import compiler
+from edb.server import compression
 from edb.server.compiler import dbstate
 from edb.server import defines
 from edb.server.cache cimport stmt_cache
@@ -737,6 +738,9 @@ cdef class PGConnection:
                         if buf.len() >= DATA_BUFFER_SIZE:
                             fe_conn.write(buf)
                             buf = None
+                            waiter = fe_conn.get_write_waiter()
+                            if waiter is not None:
+                                await self._wait_for_fe_conn(waiter)
 
                 elif mtype == b'C':  ## result
                     # CommandComplete
@@ -943,6 +947,8 @@ cdef class PGConnection:
         list param_data_types,
         bytes query_prefix,
         bint needs_commit_state,
+        bytes portal,
+        int32_t max_rows,
     ):
         cdef:
             WriteBuffer out
@@ -957,6 +963,7 @@ cdef class PGConnection:
 
             bint parse = 1
             bint state_sync = 0
+            bint suspended = 0
 
             bint has_result = query.cardinality is not CARD_NO_RESULT
             bint discard_result = (
@@ -1030,6 +1037,9 @@ cdef class PGConnection:
             stmt_name = query.sql_hash
 
         msgs_num = <uint64_t>(len(sqls))
+        if portal and msgs_num > 1:
+            raise errors.InternalServerError(
+                'cannot run more than one SQL query in a portal')
 
         if use_prep_stmt:
             parse = self.before_prepare(stmt_name, dbver, out)
@@ -1092,14 +1102,14 @@ cdef class PGConnection:
                 out.write_buffer(buf.end_message())
         else:
             buf = WriteBuffer.new_message(b'B')
-            buf.write_bytestring(b'')  # portal name
+            buf.write_bytestring(portal)  # portal name
             buf.write_bytestring(stmt_name)  # statement name
             buf.write_buffer(bind_data)
             out.write_buffer(buf.end_message())
 
             buf = WriteBuffer.new_message(b'E')
-            buf.write_bytestring(b'')  # portal name
-            buf.write_int32(0)  # limit: 0 - return all rows
+            buf.write_bytestring(portal)  # portal name
+            buf.write_int32(max_rows)  # limit: 0 - return all rows
             out.write_buffer(buf.end_message())
 
         if query.run_and_rollback or tx_isolation is not None:
@@ -1211,6 +1221,9 @@ cdef class PGConnection:
                             if buf.len() >= DATA_BUFFER_SIZE:
                                 fe_conn.write(buf)
                                 buf = None
+                                waiter = fe_conn.get_write_waiter()
+                                if waiter is not None:
+                                    await self._wait_for_fe_conn(waiter)
 
                     elif mtype == b'C':  ## result
                         # CommandComplete
@@ -1239,6 +1252,10 @@ cdef class PGConnection:
                     elif mtype == b's':  ## result
                         # PortalSuspended
                         self.buffer.discard_message()
+                        if buf is not None:
+                            fe_conn.write(buf)
+                            buf = None
+                        suspended = 1
                         break
 
                     elif mtype == b'2':
@@ -1262,6 +1279,10 @@ cdef class PGConnection:
         finally:
             await self.wait_for_sync()
 
+        if portal:
+            # The rows of a portal are always sent to fe_conn, the caller
+            # only needs to know whether there are more of them to fetch.
+            return bool(suspended)
         return result
 
     async def parse_execute(
@@ -1278,7 +1299,12 @@ cdef class PGConnection:
         tx_isolation = None,
         query_prefix = None,
         bint needs_commit_state = False,
+        bytes portal = b'',
+        int32_t max_rows = 0,
     ):
+        # With a named *portal* the execution stops after *max_rows* rows;
+        # the portal lives on until the end of the transaction and the
+        # rest of the rows can be pulled out of it with fetch_portal().
         self.before_command()
         started_at = time.monotonic()
         try:
@@ -1294,6 +1320,8 @@ cdef class PGConnection:
                 param_data_types,
                 query_prefix or b'',
                 needs_commit_state,
+                portal,
+                max_rows,
             )
         finally:
             metrics.backend_query_duration.observe(
@@ -1301,6 +1329,106 @@ cdef class PGConnection:
             )
             await self.after_command()
 
+    async def _fetch_portal(
+        self,
+        bytes portal,
+        int32_t max_rows,
+        frontend.AbstractFrontendConnection fe_conn,
+    ):
+        cdef:
+            WriteBuffer out
+            WriteBuffer buf = None
+            bint suspended = 0
+
+        out = WriteBuffer.new()
+        buf = WriteBuffer.new_message(b'E')
+        buf.write_bytestring(portal)
+        buf.write_int32(max_rows)
+        out.write_buffer(buf.end_message())
+        self.write_sync(out)
+        self.write(out)
+
+        buf = None
+        try:
+            while True:
+                if not self.buffer.take_message():
+                    await self.wait_for_message()
+                mtype = self.buffer.get_message_type()
+
+                try:
+                    if mtype == b'D':
+                        # DataRow
+                        if buf is None:
+                            buf = WriteBuffer.new()
+
+                        self.buffer.redirect_messages(buf, b'D', 0)
+                        if buf.len() >= DATA_BUFFER_SIZE:
+                            fe_conn.write(buf)
+                            buf = None
+                            waiter = fe_conn.get_write_waiter()
+                            if waiter is not None:
+                                await self._wait_for_fe_conn(waiter)
+
+                    elif mtype == b'C' or mtype == b's':
+                        # CommandComplete or PortalSuspended
+                        self.buffer.discard_message()
+                        if buf is not None:
+                            fe_conn.write(buf)
+                            buf = None
+                        suspended = mtype == b's'
+                        break
+
+                    elif mtype == b'E':
+                        # ErrorResponse
+                        er_cls, er_fields = self.parse_error_message()
+                        raise er_cls(fields=er_fields)
+
+                    else:
+                        self.fallthrough()
+
+                finally:
+                    self.buffer.finish_message()
+        finally:
+            await self.wait_for_sync()
+
+        return bool(suspended)
+
+    async def fetch_portal(
+        self,
+        bytes portal,
+        int32_t max_rows,
+        frontend.AbstractFrontendConnection fe_conn,
+    ):
+        # Send up to *max_rows* more rows of a portal opened by
+        # parse_execute() to *fe_conn*, return whether any are left.
+        self.before_command()
+        started_at = time.monotonic()
+        try:
+            return await self._fetch_portal(portal, max_rows, fe_conn)
+        finally:
+            metrics.backend_query_duration.observe(
+                time.monotonic() - started_at, self.get_tenant_label()
+            )
+            await self.after_command()
+
+    async def close_portal(self, bytes portal):
+        cdef:
+            WriteBuffer out
+            WriteBuffer buf
+
+        self.before_command()
+        try:
+            out = WriteBuffer.new()
+            buf = WriteBuffer.new_message(b'C')
+            buf.write_byte(b'P')
+            buf.write_bytestring(portal)
+            out.write_buffer(buf.end_message())
+            self.write_sync(out)
+            self.write(out)
+            await self.wait_for_sync()
+        finally:
+            await self.after_command()
+
     async def sql_fetch(
         self,
         sql: bytes,
@@ -1553,7 +1681,9 @@ cdef class PGConnection:
                     'missing the required data notice after a DDL command'
                 )
 
-    async def _dump(self, block, output_queue, fragment_suggested_size):
+    async def _dump(
+        self, block, output_queue, fragment_suggested_size, encoding=None,
+    ):
         cdef:
             WriteBuffer buf
             WriteBuffer qbuf
@@ -1596,7 +1726,9 @@ cdef class PGConnection:
                         out.write_buffer(buf)
 
                         if out._length >= fragment_suggested_size:
-                            await output_queue.put((block, i, out))
+                            fragment = await self._dump_fragment(
+                                out, encoding)
+                            await output_queue.put((block, i, fragment))
                             i += 1
                             out = None
 
@@ -1609,7 +1741,8 @@ cdef class PGConnection:
 
                 if out._length >= fragment_suggested_size:
                     self.transport.pause_reading()
-                    await output_queue.put((block, i, out))
+                    fragment = await self._dump_fragment(out, encoding)
+                    await output_queue.put((block, i, fragment))
                     self.transport.resume_reading()
                     i += 1
                     out = None
@@ -1621,7 +1754,8 @@ cdef class PGConnection:
             elif mtype == b'C':
                 # CommandComplete
                 if out is not None:
-                    await output_queue.put((block, i, out))
+                    fragment = await self._dump_fragment(out, encoding)
+                    await output_queue.put((block, i, fragment))
                 self.buffer.discard_message()
 
             elif mtype == b'E':
@@ -1637,7 +1771,26 @@ cdef class PGConnection:
         if er is not None:
             raise er[0](fields=er[1])
 
-    async def dump(self, input_queue, output_queue, fragment_suggested_size):
+    async def _dump_fragment(self, WriteBuffer out, encoding):
+        if encoding is None:
+            return out
+        return await asyncio.to_thread(
+            compression.compress_dump_data, bytes(out), encoding)
+
+    async def _wait_for_fe_conn(self, waiter):
+        # The frontend can't keep up with the data, stop reading it from
+        # Postgres until it does, so that it doesn't pile up in memory.
+        self.transport.pause_reading()
+        try:
+            await waiter
+        finally:
+            if self.transport is not None:
+                self.transport.resume_reading()
+
+    async def dump(
+        self, input_queue, output_queue, fragment_suggested_size,
+        encoding=None,
+    ):
         self.before_command()
         try:
             while True:
@@ -1647,13 +1800,16 @@ cdef class PGConnection:
                     await output_queue.put(None)
                     return
 
-                await self._dump(block, output_queue, fragment_suggested_size)
+                await self._dump(
+                    block, output_queue, fragment_suggested_size, encoding)
         finally:
             # In case we errored while the transport was suspended.
             self.transport.resume_reading()
             await self.after_command()
 
-    async def _restore(self, restore_block, bytes data, dict type_map):
+    async def _restore(
+        self, restore_block, bytes data, dict type_map, encoding=None,
+    ):
         cdef:
             WriteBuffer buf
             WriteBuffer qbuf
@@ -1663,6 +1819,10 @@ cdef class PGConnection:
             ssize_t clen
             ssize_t ncols
 
+        if encoding is not None:
+            data = await asyncio.to_thread(
+                compression.decompress, data, encoding)
+
         qbuf = WriteBuffer.new_message(b'Q')
         qbuf.write_bytestring(restore_block.sql_copy_stmt)
         qbuf.end_message()
@@ -1941,10 +2101,12 @@ cdef class PGConnection:
 
         wbuf.write_frbuf(rbuf)
 
-    async def restore(self, restore_block, bytes data, dict type_map):
+    async def restore(
+        self, restore_block, bytes data, dict type_map, encoding=None,
+    ):
         self.before_command()
         try:
-            await self._restore(restore_block, data, type_map)
+            await self._restore(restore_block, data, type_map, encoding)
         finally:
             await self.after_command()
 
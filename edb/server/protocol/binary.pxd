@@ -72,6 +72,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
         bint _in_dump_restore
 
+        dict _cursors
+        uint64_t _cursor_seq
+
         bytes _auth_data
         dict  _conn_params
 
@@ -93,6 +96,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
     )
     cdef WriteBuffer make_state_data_description_msg(self)
     cdef WriteBuffer make_command_complete_msg(self, capabilities, status)
+    cdef WriteBuffer make_cursor_suspended_msg(self, str name)
+    cdef check_cursors_supported(self)
+    cdef tuple lookup_cursor(self, str name)
 
     cdef inline ignore_headers(self)
     cdef dict parse_headers(self)
@@ -22,6 +22,7 @@ import collections
 import contextlib
 import json
 import logging
+import os
 import time
 import statistics
 import traceback
@@ -44,6 +45,7 @@ from edb import edgeql
 from edb.edgeql import qltypes
 from edb.graphql import tokenizer as gql_tokenizer
 
+from edb.pgsql import common as pg_common
 from edb.pgsql import parser as pgparser
 from edb.graphql import tokenizer as gql_tokenizer
 
@@ -66,6 +68,7 @@ from edb.server import config
 
 from edb.server import args as srvargs
 from edb.server import compiler
+from edb.server import compression
 from edb.server import defines as edbdef
 from edb.server.compiler import errormech
 from edb.server.compiler import enums
@@ -109,9 +112,90 @@ cdef object LANG_EDGEQL = compiler.InputLanguage.EDGEQL
 cdef object LANG_SQL = compiler.InputLanguage.SQL
 cdef object LANG_GRAPHQL = compiler.InputLanguage.GRAPHQL
 
+# Commands that cannot be run in a cursor.
+cdef uint64_t CURSOR_UNSAFE_CAPS = (
+    enums.Capability.SESSION_CONFIG
+    | enums.Capability.TRANSACTION
+    | enums.Capability.DDL
+    | enums.Capability.PERSISTENT_CONFIG
+)
+
 cdef tuple DUMP_VER_MIN = (0, 7)
 cdef tuple DUMP_VER_MAX = edbdef.CURRENT_PROTOCOL
 
+# The number of backend connections a single dump uses.  Connections
+# other than the first one read the same snapshot of the database.
+cdef int DUMP_JOBS = int(os.getenv('GEL_SERVER_DUMP_JOBS', 1))
+
+# The maximum number of backend connections a single restore may use,
+# whatever -j level the client asks for.
+cdef int RESTORE_MAX_JOBS = int(os.getenv('GEL_SERVER_RESTORE_MAX_JOBS', 4))
+# The number of data blocks buffered for every restore connection.
+cdef int RESTORE_QUEUE_SIZE = 2
+
+# Whether restore creates indexes and unique and exclusion constraints
+# only after loading the data, instead of maintaining them for every row.
+cdef bint RESTORE_DEFER_INDEXES = (
+    os.getenv('GEL_SERVER_RESTORE_DEFER_INDEXES', '1') == '1'
+)
+
+# Statements dropping and re-creating the indexes and constraints of
+# the restored tables, other than primary keys and those that foreign
+# keys depend on.  Formatted with an array of the tables.
+cdef str RESTORE_DEFERRED_INDEXES_QUERY = '''
+    SELECT
+        array_position({tables}::regclass[], c.conrelid),
+        format('ALTER TABLE %I.%I DROP CONSTRAINT %I',
+               tn.nspname, t.relname, c.conname),
+        format('ALTER TABLE %I.%I ADD CONSTRAINT %I %s',
+               tn.nspname, t.relname, c.conname,
+               pg_get_constraintdef(c.oid)),
+        format('COMMENT ON CONSTRAINT %I ON %I.%I IS %L',
+               c.conname, tn.nspname, t.relname,
+               obj_description(c.oid, 'pg_constraint'))
+    FROM
+        pg_constraint c
+        JOIN pg_class t ON t.oid = c.conrelid
+        JOIN pg_namespace tn ON tn.oid = t.relnamespace
+    WHERE
+        c.conrelid = ANY({tables}::regclass[])
+        AND c.contype IN ('u', 'x')
+        AND NOT EXISTS (
+            SELECT FROM pg_constraint f
+            WHERE f.contype = 'f' AND f.conindid = c.conindid
+        )
+
+    UNION ALL
+
+    SELECT
+        array_position({tables}::regclass[], i.indrelid),
+        format('DROP INDEX %I.%I', ixn.nspname, ix.relname),
+        pg_get_indexdef(i.indexrelid),
+        format('COMMENT ON INDEX %I.%I IS %L',
+               ixn.nspname, ix.relname,
+               obj_description(i.indexrelid, 'pg_class'))
+    FROM
+        pg_index i
+        JOIN pg_class ix ON ix.oid = i.indexrelid
+        JOIN pg_namespace ixn ON ixn.oid = ix.relnamespace
+    WHERE
+        i.indrelid = ANY({tables}::regclass[])
+        AND NOT i.indisprimary
+        AND NOT EXISTS (
+            SELECT FROM pg_constraint c WHERE c.conindid = i.indexrelid
+        )
+'''
+
+cdef bytes RESTORE_TX_SETUP = b'''
+    -- Drop isolation level.
+    SET TRANSACTION ISOLATION LEVEL READ COMMITTED;
+    -- Disable transaction or query execution timeout
+    -- limits. Both clients and the server can be slow
+    -- during the dump/restore process.
+    SET LOCAL idle_in_transaction_session_timeout = 0;
+    SET LOCAL statement_timeout = 0;
+'''
+
 cdef tuple MIN_PROTOCOL = edbdef.MIN_PROTOCOL
 cdef tuple CURRENT_PROTOCOL = edbdef.CURRENT_PROTOCOL
 
@@ -161,6 +245,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
         self._in_dump_restore = False
 
+        # Open cursors: name -> (portal, tx seq, capabilities, status).
+        self._cursors = {}
+        self._cursor_seq = 0
+
         # Authentication data supplied by the transport (e.g. the content
         # of an HTTP Authorization header).
         self._auth_data = auth_data
@@ -772,6 +860,38 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
         return msg.end_message()
 
+    cdef WriteBuffer make_cursor_suspended_msg(self, str name):
+        cdef:
+            WriteBuffer msg
+
+        msg = WriteBuffer.new_message(b'u')
+        msg.write_int16(0)  # no annotations
+        msg.write_len_prefixed_utf8(name)
+        return msg.end_message()
+
+    cdef check_cursors_supported(self):
+        if self.protocol_version < (3, 0):
+            raise errors.BinaryProtocolError(
+                'cursors are not supported in protocol versions '
+                'older than 3.0')
+
+    cdef tuple lookup_cursor(self, str name):
+        cdef:
+            dbview.DatabaseConnectionView _dbview
+
+        _dbview = self.get_dbview()
+        cursor = self._cursors.get(name)
+        if cursor is not None and (
+            not _dbview.in_tx() or cursor[1] != _dbview._in_tx_seq
+        ):
+            # Portals only live until the end of their transaction.
+            del self._cursors[name]
+            cursor = None
+        if cursor is None:
+            raise errors.BinaryProtocolError(
+                f'cursor {name!r} does not exist')
+        return cursor
+
     async def _execute_rollback(self, compiled: dbview.CompiledQuery):
         cdef:
             dbview.DatabaseConnectionView _dbview
@@ -830,6 +950,76 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 'server restart is required for the configuration '
                 'change to take effect')
 
+    async def _open_cursor(
+        self,
+        compiled: dbview.CompiledQuery,
+        bytes bind_args,
+        str name,
+        int32_t fetch_size,
+        *,
+        query_req: Optional[rpc.CompilationRequest] = None,
+    ):
+        cdef:
+            dbview.DatabaseConnectionView dbv
+            pgcon.PGConnection conn
+            bytes portal
+
+        dbv = self.get_dbview()
+        if not dbv.in_tx():
+            raise errors.TransactionError(
+                'cursors can only be opened inside a transaction')
+        if dbv.in_tx_error():
+            dbv.raise_in_tx_error()
+
+        query_unit_group = compiled.query_unit_group
+        query_unit = query_unit_group[0]
+        # The portal can only be bound to a single SQL statement, so
+        # units with trailing statements (db_op_trailer) are rejected.
+        if (
+            len(query_unit_group) != 1
+            or not query_unit.sql
+            or query_unit.needs_readback
+            or query_unit.is_explain
+            or query_unit.run_and_rollback
+            or query_unit.db_op_trailer
+            or query_unit_group.capabilities & CURSOR_UNSAFE_CAPS
+        ):
+            raise errors.UnsupportedFeatureError(
+                'only a single query without transaction control, DDL '
+                'or configuration commands can be run in a cursor')
+
+        # Forget the cursors of the previous transactions.
+        self._cursors = {
+            k: v for k, v in self._cursors.items()
+            if v[1] == dbv._in_tx_seq
+        }
+        if name in self._cursors:
+            raise errors.BinaryProtocolError(
+                f'cursor {name!r} is already open')
+
+        self._cursor_seq += 1
+        portal = b'_edb_cursor_%d' % self._cursor_seq
+        async with self.with_pgcon() as conn:
+            suspended = await execute.execute(
+                conn,
+                dbv,
+                compiled,
+                bind_args,
+                fe_conn=self,
+                query_req=query_req,
+                portal=portal,
+                max_rows=fetch_size,
+            )
+
+        if suspended:
+            self._cursors[name] = (
+                portal,
+                dbv._in_tx_seq,
+                query_unit_group.capabilities,
+                query_unit.status,
+            )
+        return suspended
+
     cdef parse_execute_request(self):
         cdef:
             uint64_t allow_capabilities = 0
@@ -973,7 +1163,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(buf)
         self.flush()
 
-    async def execute(self):
+    async def execute(self, bint open_cursor=False):
         cdef:
             rpc.CompilationRequest query_req
             dbview.DatabaseConnectionView _dbview
@@ -981,6 +1171,12 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             bytes out_tid
             bytes args
             uint64_t allow_capabilities
+            str cursor_name = None
+            int32_t fetch_size = 0
+            bint suspended = False
+
+        if open_cursor:
+            self.check_cursors_supported()
 
         if self.protocol_version >= (3, 0):
             tag = self.get_checked_tag(self.parse_annotations())
@@ -995,6 +1191,12 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         in_tid = self.buffer.read_bytes(16)
         out_tid = self.buffer.read_bytes(16)
         args = self.buffer.read_len_prefixed_bytes()
+        if open_cursor:
+            cursor_name = self.buffer.read_len_prefixed_utf8()
+            fetch_size = self.buffer.read_int32()
+            if fetch_size < 0:
+                raise errors.BinaryProtocolError(
+                    'fetch size cannot be negative')
         self.buffer.finish_message()
 
         compiled = None
@@ -1085,7 +1287,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             self.debug_print('EXECUTE', query_req.source.text())
 
         force_script = any(x.needs_readback for x in query_unit_group)
-        if (
+        if open_cursor:
+            suspended = await self._open_cursor(
+                compiled, args, cursor_name, fetch_size, query_req=query_req)
+        elif (
             _dbview.in_tx_error()
             or query_unit_group[0].tx_savepoint_rollback
             or query_unit_group[0].tx_abort_migration
@@ -1106,14 +1311,76 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
         if _dbview.is_state_desc_changed():
             self.write(self.make_state_data_description_msg())
-        self.write(
-            self.make_command_complete_msg(
-                compiled.query_unit_group.capabilities,
-                compiled.query_unit_group[-1].status,
+        if suspended:
+            self.write(self.make_cursor_suspended_msg(cursor_name))
+        else:
+            self.write(
+                self.make_command_complete_msg(
+                    compiled.query_unit_group.capabilities,
+                    compiled.query_unit_group[-1].status,
+                )
             )
-        )
         self.flush()
 
+    async def fetch_cursor(self):
+        cdef:
+            dbview.DatabaseConnectionView _dbview
+            pgcon.PGConnection conn
+            str name
+            int32_t fetch_size
+            bint suspended
+
+        self.check_cursors_supported()
+
+        self.ignore_annotations()
+        name = self.buffer.read_len_prefixed_utf8()
+        fetch_size = self.buffer.read_int32()
+        self.buffer.finish_message()
+        if fetch_size < 0:
+            raise errors.BinaryProtocolError('fetch size cannot be negative')
+
+        portal, _, capabilities, status = self.lookup_cursor(name)
+        _dbview = self.get_dbview()
+        if _dbview.in_tx_error():
+            _dbview.raise_in_tx_error()
+
+        if self.debug:
+            self.debug_print('FETCH', name, fetch_size)
+
+        async with self.with_pgcon() as conn:
+            suspended = await conn.fetch_portal(portal, fetch_size, self)
+
+        if self._cancelled:
+            raise ConnectionAbortedError
+
+        if suspended:
+            self.write(self.make_cursor_suspended_msg(name))
+        else:
+            # The portal is exhausted, it goes away with the transaction.
+            del self._cursors[name]
+            self.write(self.make_command_complete_msg(capabilities, status))
+        self.flush()
+
+    async def close_cursor(self):
+        cdef:
+            pgcon.PGConnection conn
+            str name
+
+        self.check_cursors_supported()
+
+        self.ignore_annotations()
+        name = self.buffer.read_len_prefixed_utf8()
+        self.buffer.finish_message()
+
+        portal = self.lookup_cursor(name)[0]
+        del self._cursors[name]
+        if self.debug:
+            self.debug_print('CLOSE CURSOR', name)
+
+        if not self.get_dbview().in_tx_error():
+            async with self.with_pgcon() as conn:
+                await conn.close_portal(portal)
+
     async def sync(self):
         self.buffer.consume_message()
         self.write(self.sync_status())
@@ -1153,6 +1420,15 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             elif mtype == b'P':
                 await self.parse()
 
+            elif mtype == b'o':
+                await self.execute(open_cursor=True)
+
+            elif mtype == b'F':
+                await self.fetch_cursor()
+
+            elif mtype == b'c':
+                await self.close_cursor()
+
             elif mtype == b'S':
                 await self.sync()
 
@@ -1436,9 +1712,17 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             self.ignore_annotations()
             flags = <uint64_t>self.buffer.read_int64()
             include_secrets = flags & messages.DumpFlag.DUMP_SECRETS
+            requested_encodings = []
+            if flags & messages.DumpFlag.COMPRESS_ZSTD:
+                requested_encodings.append('zstd')
+            if flags & messages.DumpFlag.COMPRESS_LZ4:
+                requested_encodings.append('lz4')
+            encoding = compression.negotiate_dump_encoding(
+                requested_encodings)
         else:
             headers = self.parse_headers()
             include_secrets = headers.get(QUERY_HEADER_DUMP_SECRETS) == b'\x01'
+            encoding = None
 
         self.buffer.finish_message()
 
@@ -1468,7 +1752,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             #      and re-introspect the schema in it.
             #
             #   3. all dump worker pg connection would work on the same
-            #      connection.
+            #      connection, or on the snapshot exported from it.
             #
             # This guarantees that every pg connection and the compiler work
             # with the same DB state.
@@ -1512,7 +1796,8 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
             msg_buf = WriteBuffer.new_message(b'@')  # DumpHeader
 
-            msg_buf.write_int16(4)  # number of key-value pairs
+            # number of key-value pairs
+            msg_buf.write_int16(4 if encoding is None else 5)
             msg_buf.write_int16(DUMP_HEADER_BLOCK_TYPE)
             msg_buf.write_len_prefixed_bytes(DUMP_HEADER_BLOCK_TYPE_INFO)
             msg_buf.write_int16(DUMP_HEADER_SERVER_VER)
@@ -1522,6 +1807,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             msg_buf.write_int64(buildmeta.EDGEDB_CATALOG_VERSION)
             msg_buf.write_int16(DUMP_HEADER_SERVER_TIME)
             msg_buf.write_len_prefixed_utf8(str(int(time.time())))
+            if encoding is not None:
+                # Data of every block fragment is compressed as a whole.
+                msg_buf.write_int16(DUMP_HEADER_COMPRESSION)
+                msg_buf.write_len_prefixed_utf8(encoding)
 
             msg_buf.write_int16(dump_protocol[0])
             msg_buf.write_int16(dump_protocol[1])
@@ -1548,16 +1837,32 @@ cdef class EdgeConnection(frontend.FrontendConnection):
             self._transport.write(memoryview(msg_buf.end_message()))
             self.flush()
 
+            jobs = max(1, min(DUMP_JOBS, len(blocks)))
+            snapshot = None
+            if jobs > 1:
+                snapshot = await pgcon.sql_fetch_val(
+                    b'SELECT pg_export_snapshot()')
+
             blocks_queue = collections.deque(blocks)
-            output_queue = asyncio.Queue(maxsize=2)
+            output_queue = asyncio.Queue(maxsize=2 * jobs)
 
             async with asyncio.TaskGroup() as g:
                 g.create_task(pgcon.dump(
                     blocks_queue,
                     output_queue,
                     DUMP_BLOCK_SIZE,
+                    encoding,
                 ))
-
+                for _ in range(jobs - 1):
+                    g.create_task(self._dump_worker(
+                        snapshot,
+                        blocks_queue,
+                        output_queue,
+                        encoding,
+                    ))
+
+                # Fragments of different blocks are interleaved in the
+                # order the connections produce them.
                 nstops = 0
                 while True:
                     if self._cancelled:
@@ -1566,8 +1871,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                     out = await output_queue.get()
                     if out is None:
                         nstops += 1
-                        if nstops == 1:
-                            # we only have one worker right now
+                        if nstops == jobs:
                             break
                     else:
                         block, block_num, data = out
@@ -1585,7 +1889,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                         msg_buf.write_len_prefixed_bytes(
                             str(block_num).encode())
                         msg_buf.write_int16(DUMP_HEADER_BLOCK_DATA)
-                        msg_buf.write_len_prefixed_buffer(data)
+                        if encoding is None:
+                            msg_buf.write_len_prefixed_buffer(data)
+                        else:
+                            msg_buf.write_len_prefixed_bytes(data)
 
                         self._transport.write(memoryview(msg_buf.end_message()))
                         if self._write_waiter:
@@ -1602,6 +1909,32 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(msg_buf.end_message())
         self.flush()
 
+    async def _dump_worker(
+        self, bytes snapshot, blocks_queue, output_queue, encoding,
+    ):
+        dbname = self.get_dbview().dbname
+        pgcon = await self.tenant.acquire_pgcon(dbname)
+        try:
+            # Read the snapshot exported by the main dump transaction,
+            # so that all connections see the same state of the database.
+            await pgcon.sql_execute(
+                b'START TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;'
+                b'SET TRANSACTION SNAPSHOT '
+                + pg_common.quote_literal(snapshot.decode()).encode()
+                + b''';
+                    SET LOCAL idle_in_transaction_session_timeout = 0;
+                    SET LOCAL statement_timeout = 0;
+                ''',
+            )
+            await pgcon.dump(
+                blocks_queue, output_queue, DUMP_BLOCK_SIZE, encoding)
+            await pgcon.sql_execute(b'ROLLBACK')
+        except BaseException:
+            self.tenant.release_pgcon(dbname, pgcon, discard=True)
+            raise
+        else:
+            self.tenant.release_pgcon(dbname, pgcon)
+
     async def _execute_utility_stmt(self, eql: str, pgcon):
         cdef dbview.DatabaseConnectionView _dbview = self.get_dbview()
 
@@ -1667,7 +2000,8 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         # Parse the "Restore" message
         if self.buffer.read_int16() != 0:  # number of attributes
             raise errors.BinaryProtocolError('unexpected attributes')
-        self.buffer.read_int16()  # discard -j level
+        jobs = self.buffer.read_int16()  # -j level
+        jobs = max(1, min(jobs, RESTORE_MAX_JOBS))
 
         # Now parse the embedded "DumpHeader" message:
 
@@ -1679,6 +2013,7 @@ cdef class EdgeConnection(frontend.FrontendConnection):
 
         dump_server_ver_str = None
         cat_ver = None
+        encoding = None
         headers_num = self.buffer.read_int16()
         for _ in range(headers_num):
             hdrname = self.buffer.read_int16()
@@ -1687,6 +2022,12 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 dump_server_ver_str = hdrval.decode('utf-8')
             if hdrname == DUMP_HEADER_SERVER_CATALOG_VERSION:
                 cat_ver = parse_catalog_version_header(hdrval)
+            if hdrname == DUMP_HEADER_COMPRESSION:
+                encoding = hdrval.decode('utf-8')
+                if encoding not in compression.DUMP_ENCODINGS:
+                    raise errors.UnsupportedFeatureError(
+                        f'dump is compressed with {encoding!r}, which is '
+                        f'not supported by this server')
 
         proto_major = self.buffer.read_int16()
         proto_minor = self.buffer.read_int16()
@@ -1728,18 +2069,9 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                 pgcon,
             )
 
+            schema_committed = False
             try:
-                await pgcon.sql_execute(
-                    b'''
-                        -- Drop isolation level.
-                        SET TRANSACTION ISOLATION LEVEL READ COMMITTED;
-                        -- Disable transaction or query execution timeout
-                        -- limits. Both clients and the server can be slow
-                        -- during the dump/restore process.
-                        SET LOCAL idle_in_transaction_session_timeout = 0;
-                        SET LOCAL statement_timeout = 0;
-                    ''',
-                )
+                await pgcon.sql_execute(RESTORE_TX_SETUP)
 
                 schema_sql_units, restore_blocks, tables, repopulate_units = \
                     await compiler_pool.describe_database_restore(
@@ -1780,6 +2112,10 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                     else:
                         _dbview.on_success(query_unit, new_types)
 
+                block_tables = {
+                    b.schema_object_id: table
+                    for b, table in zip(restore_blocks, tables)
+                }
                 restore_blocks = {
                     b.schema_object_id: b
                     for b in restore_blocks
@@ -1795,70 +2131,120 @@ cdef class EdgeConnection(frontend.FrontendConnection):
                         f'ALTER TABLE {table} ENABLE TRIGGER ALL;'
                     )
 
-                await pgcon.sql_execute(disable_trigger_q.encode())
+                if RESTORE_DEFER_INDEXES and tables:
+                    deferred_indexes = await self._get_deferred_indexes(
+                        pgcon, tables)
+                else:
+                    deferred_indexes = {}
+
+                jobs = max(1, min(jobs, len(restore_blocks)))
+                if jobs > 1:
+                    # Other connections can only load data into tables
+                    # once they are committed, so with more than one job
+                    # the restore is not atomic anymore: the schema is
+                    # committed first, and each connection commits the
+                    # data it has loaded.  The triggers and the deferred
+                    # indexes of a table are disabled and dropped by the
+                    # connection loading it, in its own transaction, so
+                    # that they are never left that way on failure.
+                    await self._execute_utility_stmt('COMMIT', pgcon)
+                    schema_committed = True
+                else:
+                    await pgcon.sql_execute(disable_trigger_q.encode())
+                    if deferred_indexes:
+                        await pgcon.sql_execute(b';\n'.join(
+                            drop for drop, _ in deferred_indexes.values()
+                        ))
 
                 # Send "RestoreReady" message
                 msg = WriteBuffer.new_message(b'+')
                 msg.write_int16(0)  # no annotations
-                msg.write_int16(1)  # -j1
+                msg.write_int16(jobs)  # -j level
                 self.write(msg.end_message())
                 self.flush()
 
-                while True:
-                    if not self.buffer.take_message():
-                        # Don't report idling when restoring a dump.
-                        # This is an edge case and the client might be
-                        # legitimately slow.
-                        await self.wait_for_message(report_idling=False)
-                    mtype = self.buffer.get_message_type()
-
-                    if mtype == b'=':  # RestoreBlock
-                        block_type = None
-                        block_id = None
-                        block_num = None
-                        block_data = None
-
-                        num_headers = self.buffer.read_int16()
-                        for _ in range(num_headers):
-                            header = self.buffer.read_int16()
-                            if header == DUMP_HEADER_BLOCK_TYPE:
-                                block_type = self.buffer.read_len_prefixed_bytes()
-                            elif header == DUMP_HEADER_BLOCK_ID:
-                                block_id = self.buffer.read_len_prefixed_bytes()
-                                block_id = pg_UUID(block_id)
-                            elif header == DUMP_HEADER_BLOCK_NUM:
-                                block_num = self.buffer.read_len_prefixed_bytes()
-                            elif header == DUMP_HEADER_BLOCK_DATA:
-                                block_data = self.buffer.read_len_prefixed_bytes()
-
-                        self.buffer.finish_message()
-
-                        if (block_type is None or block_id is None
-                                or block_num is None or block_data is None):
-                            raise errors.ProtocolError('incomplete data block')
-
-                        restore_block = restore_blocks[block_id]
-                        type_id_map = self._build_type_id_map_for_restore_mending(
-                            restore_block)
-                        self._transport.pause_reading()
-                        await pgcon.restore(restore_block, block_data, type_id_map)
-                        self._transport.resume_reading()
+                if jobs > 1:
+                    await self._restore_data_parallel(
+                        pgcon,
+                        restore_blocks,
+                        block_tables,
+                        deferred_indexes,
+                        jobs,
+                        encoding,
+                    )
+                    await self._execute_utility_stmt(
+                        'START TRANSACTION',
+                        pgcon,
+                    )
+                    await pgcon.sql_execute(RESTORE_TX_SETUP)
+                else:
+                    while True:
+                        if not self.buffer.take_message():
+                            # Don't report idling when restoring a dump.
+                            # This is an edge case and the client might be
+                            # legitimately slow.
+                            await self.wait_for_message(report_idling=False)
+                        mtype = self.buffer.get_message_type()
+
+                        if mtype == b'=':  # RestoreBlock
+                            block_type = None
+                            block_id = None
+                            block_num = None
+                            block_data = None
+
+                            num_headers = self.buffer.read_int16()
+                            for _ in range(num_headers):
+                                header = self.buffer.read_int16()
+                                if header == DUMP_HEADER_BLOCK_TYPE:
+                                    block_type = self.buffer.read_len_prefixed_bytes()
+                                elif header == DUMP_HEADER_BLOCK_ID:
+                                    block_id = self.buffer.read_len_prefixed_bytes()
+                                    block_id = pg_UUID(block_id)
+                                elif header == DUMP_HEADER_BLOCK_NUM:
+                                    block_num = self.buffer.read_len_prefixed_bytes()
+                                elif header == DUMP_HEADER_BLOCK_DATA:
+                                    block_data = self.buffer.read_len_prefixed_bytes()
+
+                            self.buffer.finish_message()
+
+                            if (block_type is None or block_id is None
+                                    or block_num is None or block_data is None):
+                                raise errors.ProtocolError('incomplete data block')
+
+                            restore_block = restore_blocks[block_id]
+                            type_id_map = self._build_type_id_map_for_restore_mending(
+                                restore_block)
+                            self._transport.pause_reading()
+                            await pgcon.restore(
+                                restore_block, block_data, type_id_map, encoding)
+                            self._transport.resume_reading()
+
+                        elif mtype == b'.':  # RestoreEof
+                            self.buffer.finish_message()
+                            break
 
-                    elif mtype == b'.':  # RestoreEof
-                        self.buffer.finish_message()
-                        break
+                        else:
+                            self.fallthrough()
 
-                    else:
-                        self.fallthrough()
+                    for _, create in deferred_indexes.values():
+                        await pgcon.sql_execute(create)
 
                 for repopulate_unit in repopulate_units:
                     await pgcon.sql_execute(repopulate_unit.encode())
 
-                await pgcon.sql_execute(enable_trigger_q.encode())
+                if jobs == 1:
+                    await pgcon.sql_execute(enable_trigger_q.encode())
 
             except Exception:
-                await pgcon.sql_execute(b'ROLLBACK')
-                _dbview.abort_tx()
+                if _dbview.in_tx():
+                    await pgcon.sql_execute(b'ROLLBACK')
+                    _dbview.abort_tx()
+                if schema_committed:
+                    # The database is left partially restored, make sure
+                    # the server at least knows about its schema.
+                    execute.signal_side_effects(
+                        _dbview, dbview.SideEffects.SchemaChanges)
+                    await self.tenant.introspect_db(dbname)
                 raise
 
             else:
@@ -1881,6 +2267,154 @@ cdef class EdgeConnection(frontend.FrontendConnection):
         self.write(msg.end_message())
         self.flush()
 
+    async def _get_deferred_indexes(self, pgcon, tables):
+        # Return the scripts dropping and re-creating the indexes and
+        # constraints of the restored tables, by table.
+        table_array = 'ARRAY[{}]'.format(
+            ', '.join(pg_common.quote_literal(table) for table in tables))
+        rows = await pgcon.sql_fetch(
+            RESTORE_DEFERRED_INDEXES_QUERY.format(tables=table_array).encode()
+        )
+
+        scripts = {}
+        for pos, drop, create, comment in rows:
+            drops, creates = scripts.setdefault(
+                tables[int(pos) - 1], ([], []))
+            drops.append(drop)
+            creates.extend((create, comment))
+        return {
+            table: (b';\n'.join(drops), b';\n'.join(creates))
+            for table, (drops, creates) in scripts.items()
+        }
+
+    async def _restore_data_parallel(
+        self,
+        pgcon,
+        restore_blocks,
+        block_tables,
+        deferred_indexes,
+        int jobs,
+        encoding,
+    ):
+        # Data blocks are read from the client in order and handed to
+        # one of the *jobs* connections.  All blocks of the same table
+        # go to the same connection, so that they are loaded in order
+        # and only that connection locks the table.
+        cdef:
+            char mtype
+
+        queues = [asyncio.Queue(maxsize=RESTORE_QUEUE_SIZE) for _ in range(jobs)]
+        routes = {}
+
+        # COPY FREEZE only works on tables created in the same
+        # transaction, and the tables were created by an already
+        # committed one.
+        restore_blocks = {
+            block_id: block._replace(
+                sql_copy_stmt=block.sql_copy_stmt.replace(b', FREEZE true', b'')
+            )
+            for block_id, block in restore_blocks.items()
+        }
+
+        async with asyncio.TaskGroup() as g:
+            g.create_task(self._restore_worker(
+                pgcon, queues[0], deferred_indexes, encoding))
+            for queue in queues[1:]:
+                g.create_task(self._restore_worker(
+                    None, queue, deferred_indexes, encoding))
+
+            while True:
+                if not self.buffer.take_message():
+                    await self.wait_for_message(report_idling=False)
+                mtype = self.buffer.get_message_type()
+
+                if mtype == b'=':  # RestoreBlock
+                    block_id = None
+                    block_data = None
+
+                    num_headers = self.buffer.read_int16()
+                    for _ in range(num_headers):
+                        header = self.buffer.read_int16()
+                        value = self.buffer.read_len_prefixed_bytes()
+                        if header == DUMP_HEADER_BLOCK_ID:
+                            block_id = pg_UUID(value)
+                        elif header == DUMP_HEADER_BLOCK_DATA:
+                            block_data = value
+
+                    self.buffer.finish_message()
+
+                    if block_id is None or block_data is None:
+                        raise errors.ProtocolError('incomplete data block')
+
+                    table = block_tables[block_id]
+                    queue = routes.get(table)
+                    if queue is None:
+                        # Give a new table to the least busy connection.
+                        queue = min(queues, key=lambda q: q.qsize())
+                        routes[table] = queue
+
+                    item = (table, restore_blocks[block_id], block_data)
+                    if queue.full():
+                        self._transport.pause_reading()
+                        await queue.put(item)
+                        self._transport.resume_reading()
+                    else:
+                        queue.put_nowait(item)
+
+                elif mtype == b'.':  # RestoreEof
+                    self.buffer.finish_message()
+                    break
+
+                else:
+                    self.fallthrough()
+
+            for queue in queues:
+                await queue.put(None)
+
+    async def _restore_worker(self, pgcon, queue, deferred_indexes, encoding):
+        dbname = self.get_dbview().dbname
+        own_pgcon = pgcon is None
+        if own_pgcon:
+            pgcon = await self.tenant.acquire_pgcon(dbname)
+
+        try:
+            await pgcon.sql_execute(b'START TRANSACTION;' + RESTORE_TX_SETUP)
+            tables = []
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                table, restore_block, block_data = item
+                if table not in tables:
+                    tables.append(table)
+                    script = f'ALTER TABLE {table} DISABLE TRIGGER ALL'
+                    if table in deferred_indexes:
+                        drop, _ = deferred_indexes[table]
+                        script = script.encode() + b';\n' + drop
+                    else:
+                        script = script.encode()
+                    await pgcon.sql_execute(script)
+                type_id_map = self._build_type_id_map_for_restore_mending(
+                    restore_block)
+                await pgcon.restore(
+                    restore_block, block_data, type_id_map, encoding)
+            for table in tables:
+                script = f'ALTER TABLE {table} ENABLE TRIGGER ALL'.encode()
+                if table in deferred_indexes:
+                    _, create = deferred_indexes[table]
+                    script = create + b';\n' + script
+                await pgcon.sql_execute(script)
+            await pgcon.sql_execute(b'COMMIT')
+        except BaseException:
+            # The connection may be stuck in the middle of a COPY; a
+            # borrowed one is discarded when its owner releases it.
+            if own_pgcon:
+                self.tenant.release_pgcon(dbname, pgcon, discard=True)
+            raise
+        else:
+            if own_pgcon:
+                self.tenant.release_pgcon(dbname, pgcon)
+
     def _build_type_id_map_for_restore_mending(self, restore_block):
         type_map = {}
         descriptor_stack = []
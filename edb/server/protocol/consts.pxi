@@ -27,6 +27,7 @@ DEF DUMP_HEADER_SERVER_TIME = 102
 DEF DUMP_HEADER_SERVER_VER = 103
 DEF DUMP_HEADER_BLOCKS_INFO = 104
 DEF DUMP_HEADER_SERVER_CATALOG_VERSION = 105
+DEF DUMP_HEADER_COMPRESSION = 106
 
 DEF DUMP_HEADER_BLOCK_ID = 110
 DEF DUMP_HEADER_BLOCK_NUM = 111
@@ -40,10 +40,104 @@ from edb.server import compiler
 from edb.server import config
 from edb.server.compiler import enums
 from edb.server.dbview cimport dbview
+from edb.server.protocol cimport frontend
 from edb.server.pgproto.pgproto cimport WriteBuffer
 
 
+cdef class JSONStreamConnection(frontend.AbstractFrontendConnection):
+    # Sends the elements of a JSON query result to the client as they are
+    # received from Postgres, with chunked transfer encoding.  The first
+    # batch of rows is held back, so that results that fit in it are sent
+    # as a regular response, and errors before any data is sent can still
+    # be reported with one.
+
+    cdef:
+        object protocol
+        object request
+        object response
+        list pending
+        bint started
+        bint has_rows
+
+    def __init__(self, protocol, request, response):
+        self.protocol = protocol
+        self.request = request
+        self.response = response
+        self.pending = None
+        self.started = False
+        self.has_rows = False
+
+    cdef write(self, WriteBuffer buf):
+        rows = _split_data_rows(bytes(buf))
+        if not self.started:
+            if self.pending is None:
+                self.pending = rows
+                return
+            rows = self.pending + rows
+            self.pending = None
+            self._start()
+        self._write_rows(rows)
+
+    cdef flush(self):
+        pass
+
+    cdef get_write_waiter(self):
+        if self.started:
+            return self.protocol.get_write_waiter()
+        return None
+
+    cdef _start(self):
+        self.response.custom_headers['Transfer-Encoding'] = 'chunked'
+        self.protocol.write(self.request, self.response)
+        self.started = True
+        self.protocol.write_chunk(b'{"data":[')
+
+    cdef _write_rows(self, list rows):
+        if not rows:
+            return
+        data = b','.join(rows)
+        if self.has_rows:
+            data = b',' + data
+        self.has_rows = True
+        self.protocol.write_chunk(data)
+
+    def finish(self, error=None):
+        if not self.started:
+            if error is not None:
+                self.response.body = json.dumps({'error': error}).encode()
+            else:
+                self.response.body = (
+                    b'{"data":[' + b','.join(self.pending or ()) + b']}')
+            return
+
+        if error is not None:
+            # The status line is out already, report the error next to
+            # the data that was sent.
+            self.protocol.write_chunk(
+                b'],"error":' + json.dumps(error).encode() + b'}')
+        else:
+            self.protocol.write_chunk(b']}')
+        self.protocol.write_chunk(b'')
+
+
+cdef list _split_data_rows(bytes data):
+    # *data* is a sequence of DataRow messages of one column each.
+    cdef:
+        Py_ssize_t pos = 0
+        Py_ssize_t end = len(data)
+        Py_ssize_t col_len
+    rows = []
+    while pos < end:
+        # message type, message length, number of columns, column length
+        col_len = int.from_bytes(data[pos + 7:pos + 11], 'big', signed=True)
+        if col_len >= 0:
+            rows.append(data[pos + 11:pos + 11 + col_len])
+        pos += 1 + int.from_bytes(data[pos + 1:pos + 5], 'big')
+    return rows
+
+
 async def handle_request(
+    object protocol,
     object request,
     object response,
     dbview.Database db,
@@ -60,6 +154,9 @@ async def handle_request(
     variables = None
     globals_ = None
     query = None
+    queries = None
+    in_transaction = False
+    stream = False
     config = None
 
     try:
@@ -70,6 +167,9 @@ async def handle_request(
                     raise TypeError(
                         'the body of the request must be a JSON object')
                 query = body.get('query')
+                queries = body.get('queries')
+                in_transaction = body.get('transaction', False)
+                stream = body.get('stream', False)
                 variables = body.get('variables')
                 globals_ = body.get('globals')
                 config = body.get('config')
@@ -109,12 +209,30 @@ async def handle_request(
                         raise TypeError(
                             '"config" must be a JSON object')
 
+                stream = qs.get('stream')
+                if stream is not None:
+                    stream = stream[0].lower()
+                    if stream not in ('true', 'false'):
+                        raise TypeError('"stream" must be a boolean')
+                    stream = stream == 'true'
+
         else:
             raise TypeError('expected a GET or a POST request')
 
-        if not query:
+        if queries is not None:
+            if query is not None or variables is not None:
+                raise TypeError(
+                    'invalid EdgeQL request: "queries" cannot be combined '
+                    'with "query" or "variables"')
+            queries = _validate_batch(queries)
+            if not isinstance(in_transaction, bool):
+                raise TypeError('"transaction" must be a boolean')
+        elif not query:
             raise TypeError('invalid EdgeQL request: query is missing')
 
+        if not isinstance(stream, bool):
+            raise TypeError('"stream" must be a boolean')
+
         if variables is not None and not isinstance(variables, dict):
             raise TypeError('"variables" must be a JSON object')
 
@@ -135,6 +253,20 @@ async def handle_request(
 
     response.status = http.HTTPStatus.OK
     response.content_type = b'application/json'
+    if queries is not None:
+        await _handle_batch(
+            response, db, role_name, queries, globals_, config,
+            in_transaction)
+        return
+
+    # HTTP/1.0 has no chunked transfer encoding, a streamed result is
+    # sent in one piece there.
+    if stream and request.version != b'1.0':
+        await _handle_stream(
+            protocol, request, response, db, role_name, query,
+            variables, globals_, config)
+        return
+
     try:
         result = await execute.parse_execute_json(
             db,
@@ -153,3 +285,102 @@ async def handle_request(
         response.body = json.dumps({'error': ex.to_json()}).encode()
     else:
         response.body = b'{"data":' + result + b'}'
+        # Only successful results get an ETag, errors are never
+        # revalidated.
+        response.use_body_etag = True
+
+
+def _validate_batch(queries):
+    if not isinstance(queries, list) or not queries:
+        raise TypeError('"queries" must be a non-empty JSON array')
+
+    batch = []
+    for item in queries:
+        if not isinstance(item, dict):
+            raise TypeError('every element of "queries" must be a JSON object')
+        query = item.get('query')
+        if not query or not isinstance(query, str):
+            raise TypeError('invalid EdgeQL request: query is missing')
+        variables = item.get('variables')
+        if variables is not None and not isinstance(variables, dict):
+            raise TypeError('"variables" must be a JSON object')
+        batch.append((query, variables))
+    return batch
+
+
+async def _handle_batch(
+    object response,
+    dbview.Database db,
+    str role_name,
+    list queries,
+    object globals_,
+    object config,
+    bint in_transaction,
+):
+    try:
+        results = await execute.parse_execute_json_batch(
+            db,
+            queries,
+            role_name=role_name,
+            globals_=globals_,
+            session_config=config,
+            in_transaction=in_transaction,
+        )
+    except Exception as ex:
+        if debug.flags.server:
+            markup.dump(ex)
+
+        ex = await execute.interpret_error(ex, db)
+
+        response.body = json.dumps({'error': ex.to_json()}).encode()
+        return
+
+    # Queries that were not run, or that were rolled back together with
+    # a failed transaction, have a null result.
+    parts = []
+    for result in results:
+        if result is None:
+            parts.append(b'null')
+        elif isinstance(result, bytes):
+            parts.append(b'{"data":' + result + b'}')
+        else:
+            if debug.flags.server:
+                markup.dump(result)
+
+            ex = await execute.interpret_error(result, db)
+            parts.append(json.dumps({'error': ex.to_json()}).encode())
+
+    response.body = b'[' + b','.join(parts) + b']'
+
+
+async def _handle_stream(
+    object protocol,
+    object request,
+    object response,
+    dbview.Database db,
+    str role_name,
+    object query,
+    object variables,
+    object globals_,
+    object config,
+):
+    fe_conn = JSONStreamConnection(protocol, request, response)
+    try:
+        await execute.parse_execute_json(
+            db,
+            query,
+            role_name=role_name,
+            variables=variables or {},
+            globals_=globals_,
+            session_config=config,
+            output_format=compiler.OutputFormat.JSON_ELEMENTS,
+            fe_conn=fe_conn,
+        )
+    except Exception as ex:
+        if debug.flags.server:
+            markup.dump(ex)
+
+        ex = await execute.interpret_error(ex, db)
+        fe_conn.finish(ex.to_json())
+    else:
+        fe_conn.finish()
@@ -54,9 +54,22 @@ async def parse_execute_json(
     tx_isolation: edbdef.TxIsolationLevel | None = None,
     query_tag: str | None = None,
     role_name: str | None = None,
+    fe_conn: Any = None,
 ) -> bytes:
     ...
 
+async def parse_execute_json_batch(
+    db: dbview.Database,
+    queries: list[tuple[str, Optional[Mapping[str, Any]]]],
+    *,
+    globals_: Optional[Mapping[str, Any]] = None,
+    session_config: Optional[Mapping[str, Any]] = None,
+    in_transaction: bool = False,
+    query_cache_enabled: Optional[bool] = None,
+    role_name: str | None = None,
+) -> list[bytes | Exception | None]:
+    ...
+
 async def interpret_error(
     exc: Exception,
     db: dbview.Database,
@@ -265,7 +265,11 @@ async def execute(
     use_prep_stmt: bint = False,
     tx_isolation: edbdef.TxIsolationLevel | None = None,
     query_req: Optional[rpc.CompilationRequest] = None,
+    portal: bytes = b'',
+    max_rows: int = 0,
 ):
+    # When a *portal* is given, the result is whether it was suspended
+    # with rows left to fetch (see PGConnection.parse_execute).
     cdef:
         bytes state = None, orig_state = None
         WriteBuffer bound_args_buf
@@ -365,6 +369,8 @@ async def execute(
                         use_pending_func_cache=compiled.use_pending_func_cache,
                         tx_isolation=tx_isolation,
                         query_prefix=compiled.make_query_prefix(),
+                        portal=portal,
+                        max_rows=max_rows,
                     )
 
                     if query_unit.needs_readback and data:
@@ -1027,6 +1033,7 @@ async def parse_execute_json(
     tx_isolation: edbdef.TxIsolationLevel | None = None,
     query_tag: str | None = None,
     role_name: str | None = None,
+    fe_conn: Optional[frontend.AbstractFrontendConnection] = None,
 ) -> bytes:
     if role_name is None:
         role_name = edbdef.EDGEDB_SUPERUSER
@@ -1058,6 +1065,7 @@ async def parse_execute_json(
                 compiled,
                 variables=variables,
                 globals_=globals_,
+                fe_conn=fe_conn,
                 tx_isolation=tx_isolation,
                 query_req=query_req,
             )
@@ -1080,37 +1088,8 @@ async def execute_json(
     if globals_ is None:
         globals_ = {}
 
-    if compiled.query_unit_group.json_permissions:
-        # Inject any required permissions into the globals json.
-
-        superuser, available_permissions = dbv.get_permissions()
-
-        for permission in compiled.query_unit_group.json_permissions:
-            if permission in globals_:
-                raise RuntimeError(
-                    f"Permission cannot be passed as globals: '{permission}'"
-                )
-
-            globals_[permission] = (
-                superuser or permission in available_permissions
-            )
-
-    # TODO: only when needed? in a less dodgy way??
-    for k, v in dbv._sys_globals.items():
-        if k in globals_:
-            raise RuntimeError(
-                f"System global '{k}' cannot be explicitly specified"
-            )
-        globals_[k] = v
-
-    dbv.set_globals(immutables.Map({
-        "__::__edb_json_globals__": config.SettingValue(
-            name="__::__edb_json_globals__",
-            value=_encode_json_value(globals_),
-            source='global',
-            scope=qltypes.ConfigScope.GLOBAL,
-        )
-    }))
+    _set_json_globals(
+        dbv, compiled.query_unit_group.json_permissions, globals_)
 
     qug = compiled.query_unit_group
 
@@ -1172,6 +1151,139 @@ async def execute_json(
         return None
 
 
+async def parse_execute_json_batch(
+    db: dbview.Database,
+    queries: list,
+    *,
+    globals_: Optional[Mapping[str, Any]] = None,
+    session_config: Optional[Mapping[str, Any]] = None,
+    in_transaction: bool = False,
+    query_cache_enabled: Optional[bool] = None,
+    role_name: str | None = None,
+) -> list:
+    """Run a batch of JSON queries on a single backend connection.
+
+    *queries* is a list of ``(query, variables)`` pairs.  All queries
+    are compiled before a connection is acquired.  Returns a list with
+    the JSON result or the exception of every query.
+
+    If *in_transaction* is true, the queries are run in one transaction
+    that is rolled back on the first error; the entries of all other
+    queries are None in that case.
+    """
+    cdef:
+        dbview.DatabaseConnectionView dbv
+
+    if role_name is None:
+        role_name = edbdef.EDGEDB_SUPERUSER
+
+    dbv = await _get_transient_dbv(
+        db,
+        query_cache_enabled=query_cache_enabled,
+        role_name=role_name,
+    )
+    results = [None] * len(queries)
+    tenant = db.tenant
+    try:
+        dbv.decode_json_session_config(session_config)
+
+        parsed = []
+        for i, (query, _) in enumerate(queries):
+            try:
+                parsed.append(await _parse(
+                    dbv,
+                    query,
+                    input_format=compiler.InputFormat.JSON,
+                    output_format=compiler.OutputFormat.JSON,
+                    allow_capabilities=compiler.Capability.MODIFICATIONS,
+                ))
+            except Exception as ex:
+                results[i] = ex
+                if in_transaction:
+                    return results
+                parsed.append(None)
+
+        async with tenant.with_pgcon(db.name) as pgcon:
+            if in_transaction:
+                await _execute_json_batch_in_tx(
+                    pgcon, dbv, queries, parsed, globals_, results)
+            else:
+                for i, (_, variables) in enumerate(queries):
+                    if parsed[i] is None:
+                        continue
+                    query_req, compiled = parsed[i]
+                    try:
+                        results[i] = await execute_json(
+                            pgcon,
+                            dbv,
+                            compiled,
+                            variables=variables or {},
+                            globals_=dict(globals_ or {}),
+                            query_req=query_req,
+                        )
+                    except Exception as ex:
+                        results[i] = ex
+    finally:
+        tenant.remove_dbview(dbv)
+
+    return results
+
+
+async def _execute_json_batch_in_tx(
+    be_conn: pgcon.PGConnection,
+    dbv: dbview.DatabaseConnectionView,
+    list queries,
+    list parsed,
+    globals_,
+    list results,
+):
+    cdef:
+        bytes state
+
+    # Statements in a transaction don't sync the state, so set up the
+    # globals for all the queries of the batch and sync them up front.
+    permissions = set()
+    for _, compiled in parsed:
+        permissions.update(compiled.query_unit_group.json_permissions or ())
+    _set_json_globals(dbv, permissions, dict(globals_ or {}))
+    state = dbv.serialize_state()
+    if be_conn.last_state != state:
+        await be_conn.sql_fetch(b'select 1', state=state)
+        be_conn.last_state = state
+        be_conn.state_reset_needs_commit = (
+            dbv.needs_commit_after_state_sync())
+
+    await be_conn.sql_execute(b'START TRANSACTION')
+    dbv.start_tx()
+    i = 0
+    try:
+        for i, (_, variables) in enumerate(queries):
+            query_req, compiled = parsed[i]
+            results[i] = await execute_json(
+                be_conn,
+                dbv,
+                compiled,
+                variables=variables or {},
+                globals_=dict(globals_ or {}),
+                query_req=query_req,
+            )
+        await be_conn.sql_execute(b'COMMIT')
+    except Exception as ex:
+        results[:] = [None] * len(results)
+        results[i] = ex
+        if be_conn.in_tx():
+            await be_conn.sql_execute(b'ROLLBACK')
+        if dbv.in_tx():
+            dbv.abort_tx()
+    else:
+        # Batches can't run DDL, so there is no schema to commit.
+        side_effects = dbv.commit_implicit_tx(
+            None, None, None, None, None, None, None
+        )
+        if side_effects:
+            await process_side_effects(dbv, side_effects, be_conn)
+
+
 class DecimalEncoder(json.JSONEncoder):
     def encode(self, obj):
         if isinstance(obj, dict):
@@ -1188,6 +1300,44 @@ class DecimalEncoder(json.JSONEncoder):
         return super().encode(obj)
 
 
+cdef _set_json_globals(
+    dbview.DatabaseConnectionView dbv,
+    object permissions,
+    object globals_,
+):
+    if permissions:
+        # Inject any required permissions into the globals json.
+
+        superuser, available_permissions = dbv.get_permissions()
+
+        for permission in permissions:
+            if permission in globals_:
+                raise RuntimeError(
+                    f"Permission cannot be passed as globals: '{permission}'"
+                )
+
+            globals_[permission] = (
+                superuser or permission in available_permissions
+            )
+
+    # TODO: only when needed? in a less dodgy way??
+    for k, v in dbv._sys_globals.items():
+        if k in globals_:
+            raise RuntimeError(
+                f"System global '{k}' cannot be explicitly specified"
+            )
+        globals_[k] = v
+
+    dbv.set_globals(immutables.Map({
+        "__::__edb_json_globals__": config.SettingValue(
+            name="__::__edb_json_globals__",
+            value=_encode_json_value(globals_),
+            source='global',
+            scope=qltypes.ConfigScope.GLOBAL,
+        )
+    }))
+
+
 cdef bytes _encode_json_value(object val):
     jarg = json.dumps(val, cls=DecimalEncoder)
 
@@ -26,6 +26,7 @@ cdef class AbstractFrontendConnection:
 
     cdef write(self, WriteBuffer buf)
     cdef flush(self)
+    cdef get_write_waiter(self)
 
 
 cdef class FrontendConnection(AbstractFrontendConnection):
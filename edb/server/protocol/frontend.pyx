@@ -45,6 +45,11 @@ cdef class AbstractFrontendConnection:
     cdef flush(self):
         raise NotImplementedError
 
+    cdef get_write_waiter(self):
+        # A future to wait on before sending more data, if the client
+        # can't keep up with it.
+        return None
+
 
 cdef class FrontendConnection(AbstractFrontendConnection):
     interface = "frontend"
@@ -1787,12 +1787,15 @@ cdef class PgConnection(frontend.FrontendConnection):
                 client_name=self.tenant.get_instance_name(),
             )
         finally:
+            compile_time = time.monotonic() - started_at
             metrics.query_compilation_duration.observe(
-                time.monotonic() - started_at,
+                compile_time,
                 self.tenant.get_instance_name(),
                 "sql",
                 )
-        self.database.cache_compiled_sql(key, result, schema_version)
+        self.database.cache_compiled_sql(
+            key, result, schema_version, compile_time
+        )
         metrics.sql_compilations.inc(
             len(result), self.tenant.get_instance_name()
         )
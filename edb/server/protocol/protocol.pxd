@@ -29,10 +29,12 @@ cdef class HttpRequest:
         public bytes content_type
         public bytes method
         public bytes accept
+        public bytes accept_encoding
         public bytes body
         public bytes host
         public bytes origin
         public bytes authorization
+        public bytes if_none_match
         public object params
         public object forwarded
         public object cookies
@@ -47,6 +49,7 @@ cdef class HttpResponse:
         public dict custom_headers
         public bytes body
         public bint sent
+        public bint use_body_etag
 
 
 cdef class HttpProtocol:
@@ -70,6 +73,7 @@ cdef class HttpProtocol:
         object tenant
         bint is_tenant_host
         object connection_made_at
+        object _write_waiter
 
         HttpRequest current_request
 
@@ -85,6 +89,9 @@ cdef class HttpProtocol:
                 bint close_connection)
 
     cpdef write(self, HttpRequest request, HttpResponse response)
+    cdef bint _should_compress(self, HttpRequest request,
+                               HttpResponse response)
+    cdef _apply_body_etag(self, HttpRequest request, HttpResponse response)
 
     cdef unhandled_exception(self, bytes status, ex)
     cdef resume(self)
@@ -32,10 +32,12 @@ class HttpRequest:
     content_type: bytes
     method: bytes
     accept: bytes
+    accept_encoding: bytes
     body: bytes
     host: bytes
     origin: bytes
     authorization: bytes
+    if_none_match: bytes
     params: dict[bytes, bytes]
     forwarded: dict[bytes, bytes]
     cookies: http.cookies.SimpleCookie
@@ -47,6 +49,7 @@ class HttpResponse:
     custom_headers: dict[str, str]
     body: bytes
     sent: bool
+    use_body_etag: bool
 
 class HttpProtocol(asyncio.Protocol):
     def __init__(
@@ -67,5 +70,11 @@ class HttpProtocol(asyncio.Protocol):
     def write(self, request: HttpRequest, response: HttpResponse) -> None:
         ...
 
+    def write_chunk(self, data: bytes) -> None:
+        ...
+
+    def get_write_waiter(self) -> asyncio.Future[bool] | None:
+        ...
+
     def close(self) -> None:
         ...
@@ -22,6 +22,7 @@ include "./consts.pxi"
 
 import asyncio
 import collections
+import hashlib
 import http
 import http.cookies
 import re
@@ -39,6 +40,7 @@ from edb.common.log import current_tenant
 from edb.graphql import extension as graphql_ext
 
 from edb.server import args as srvargs
+from edb.server import compression
 from edb.server import config, metrics as srv_metrics
 from edb.server import tenant as edbtenant
 from edb.server.protocol cimport binary
@@ -92,6 +94,7 @@ cdef class HttpResponse:
         self.body = b''
         self.close_connection = False
         self.sent = False
+        self.use_body_etag = False
 
 
 cdef class HttpProtocol:
@@ -127,6 +130,8 @@ cdef class HttpProtocol:
         self.is_tls = False
         self.is_tenant_host = False
 
+        self._write_waiter = None
+
     def connection_made(self, transport):
         self.connection_made_at = time.monotonic()
         self.transport = transport
@@ -139,6 +144,9 @@ cdef class HttpProtocol:
         )
         self.transport = None
         self.unprocessed = None
+        # Don't leave a streaming response waiting for a client
+        # that is gone.
+        self.resume_writing()
         self.server.maybe_auto_shutdown()
 
     def get_tenant_label(self):
@@ -148,10 +156,14 @@ cdef class HttpProtocol:
             return self.tenant.get_instance_name()
 
     def pause_writing(self):
-        pass
+        if self._write_waiter and not self._write_waiter.done():
+            return
+        self._write_waiter = self.loop.create_future()
 
     def resume_writing(self):
-        pass
+        if not self._write_waiter or self._write_waiter.done():
+            return
+        self._write_waiter.set_result(True)
 
     def eof_received(self):
         pass
@@ -246,8 +258,18 @@ cdef class HttpProtocol:
                 self.current_request.accept += b',' + value
             else:
                 self.current_request.accept = value
+        elif name == b'accept-encoding':
+            if self.current_request.accept_encoding:
+                self.current_request.accept_encoding += b',' + value
+            else:
+                self.current_request.accept_encoding = value
         elif name == b'authorization':
             self.current_request.authorization = value
+        elif name == b'if-none-match':
+            if self.current_request.if_none_match:
+                self.current_request.if_none_match += b',' + value
+            else:
+                self.current_request.if_none_match = value
         elif name.startswith(b'x-edgedb-'):
             if self.current_request.params is None:
                 self.current_request.params = {}
@@ -350,7 +372,13 @@ cdef class HttpProtocol:
             b'HTTP/', req_version, b' ', resp_status, b'\r\n',
             b'Content-Type: ', content_type, b'\r\n',
         ]
-        if content_type != b"text/event-stream":
+        if (
+            content_type != b"text/event-stream"
+            and 'Transfer-Encoding' not in custom_headers
+            # A 304 must not have a Content-Length other than that
+            # of the body it stands for.
+            and not resp_status.startswith(b'304 ')
+        ):
             data.extend(
                 (b'Content-Length: ', f'{len(body)}'.encode(), b'\r\n'),
             )
@@ -379,6 +407,25 @@ cdef class HttpProtocol:
     def write_raw(self, bytes data):
         self.transport.write(data)
 
+    def write_chunk(self, bytes data):
+        # Write a part of a response sent with chunked transfer encoding,
+        # an empty *data* ends the response.  Nothing is written if the
+        # client is gone.
+        if self.transport is None:
+            return
+        if data:
+            self.transport.write(b''.join(
+                (f'{len(data):x}\r\n'.encode(), data, b'\r\n')))
+        else:
+            self.transport.write(b'0\r\n\r\n')
+
+    def get_write_waiter(self):
+        # A future that is done once the transport can take more data,
+        # or None if it can take it right away.
+        if self._write_waiter is not None and not self._write_waiter.done():
+            return self._write_waiter
+        return None
+
     def _switch_to_binary_protocol(self, data=None):
         binproto = binary.new_edge_connection(
             self.server,
@@ -506,6 +553,10 @@ cdef class HttpProtocol:
             return
 
         if not response.sent:
+            if response.use_body_etag:
+                self._apply_body_etag(request, response)
+            if self._should_compress(request, response):
+                await self._compress(request, response)
             self.write(request, response)
         self.in_response = False
 
@@ -514,6 +565,52 @@ cdef class HttpProtocol:
         else:
             self.resume()
 
+    cdef _apply_body_etag(self, HttpRequest request, HttpResponse response):
+        # Let clients polling the same query revalidate their copy of the
+        # result instead of downloading it again.  The tag is weak, as
+        # the body may be sent compressed in different ways.
+        if (
+            request.method != b'GET'
+            or response.status is not HTTPStatus.OK
+        ):
+            return
+        digest = hashlib.blake2b(response.body, digest_size=16).hexdigest()
+        etag = f'W/"{digest}"'
+        response.custom_headers['ETag'] = etag
+        if request.if_none_match and _etag_matches(
+            request.if_none_match, etag
+        ):
+            response.status = HTTPStatus.NOT_MODIFIED
+            response.body = b''
+
+    cdef bint _should_compress(self, HttpRequest request,
+                               HttpResponse response):
+        return (
+            len(response.body) >= compression.HTTP_MIN_SIZE
+            and compression.is_compressible(response.content_type)
+            and 'Content-Encoding' not in response.custom_headers
+        )
+
+    async def _compress(self, HttpRequest request, HttpResponse response):
+        vary = response.custom_headers.get('Vary')
+        response.custom_headers['Vary'] = (
+            f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+        )
+        encoding = compression.negotiate_encoding(request.accept_encoding)
+        if encoding is None:
+            return
+
+        body = response.body
+        if len(body) >= compression.HTTP_THREAD_MIN_SIZE:
+            compressed = await self.loop.run_in_executor(
+                None, compression.compress, body, encoding
+            )
+        else:
+            compressed = compression.compress(body, encoding)
+        if len(compressed) < len(body):
+            response.body = compressed
+            response.custom_headers['Content-Encoding'] = encoding
+
     def check_readiness(self):
         if self.tenant.is_blocked():
             readiness_reason = self.tenant.get_readiness_reason()
@@ -687,6 +784,7 @@ cdef class HttpProtocol:
                     )
                 elif extname == 'edgeql_http':
                     await edgeql_ext.handle_request(
+                        self,
                         request, response, db, role_name, args, self.tenant
                     )
                 elif extname == 'ai':
@@ -1039,6 +1137,17 @@ cdef class HttpProtocol:
 
         return True
 
+def _etag_matches(bytes if_none_match, str etag):
+    # Weak comparison of entity tags, as required for If-None-Match
+    if if_none_match.strip() == b'*':
+        return True
+    etag = etag.removeprefix('W/')
+    for tag in if_none_match.decode('latin-1').split(','):
+        if tag.strip().removeprefix('W/') == etag:
+            return True
+    return False
+
+
 def get_request_url(request, is_tls):
     request_url = request.url
     default_schema = b"https" if is_tls else b"http"
@@ -149,6 +149,7 @@ class BaseServer:
         nethosts: Sequence[str],
         netport: int,
         compiler_worker_max_rss: Optional[int] = None,
+        compiler_worker_branch_budget: Optional[int] = None,
         listen_sockets: tuple[socket.socket, ...] = (),
         testmode: bool = False,
         daemonized: bool = False,
@@ -196,6 +197,7 @@ class BaseServer:
         self._compiler_pool_mode = compiler_pool_mode
         self._compiler_pool_addr = compiler_pool_addr
         self._compiler_worker_max_rss = compiler_worker_max_rss
+        self._compiler_worker_branch_budget = compiler_worker_branch_budget
         self._system_compile_cache = lru.LRUMapping(
             maxsize=defines._MAX_QUERIES_CACHE_SYSTEM
         )
@@ -612,6 +614,8 @@ class BaseServer:
             refl_schema=self._refl_schema,
             schema_class_layout=self._schema_class_layout,
         )
+        if self._compiler_worker_branch_budget is not None:
+            args['worker_branch_budget'] = self._compiler_worker_branch_budget
         if self._compiler_pool_mode == srvargs.CompilerPoolMode.Remote:
             args['address'] = self._compiler_pool_addr
         else:
@@ -1443,6 +1443,7 @@ class Tenant(ha_base.ClusterProtocol):
 
         if query_cache and cache_mode is not config.QueryCacheMode.InMemory:
             db.hydrate_cache(query_cache)
+            db.warm_query_cache()
         elif old_cache_mode is not cache_mode:
             logger.info(
                 "clearing query cache for database '%s'", dbname)
@@ -2248,6 +2249,7 @@ class Tenant(ha_base.ClusterProtocol):
                     ),
                     extensions=sorted(db.extensions),
                     query_cache_size=db.get_query_cache_size(),
+                    query_cache=db.get_query_cache_stats(),
                     connections=[
                         dict(
                             in_tx=view.in_tx(),
@@ -0,0 +1,199 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from __future__ import annotations
+from typing import Callable
+
+import functools
+import pathlib
+import time
+import uuid
+
+import click
+import immutables
+
+from edb import edgeql
+from edb.edgeql import ast as qlast
+from edb import graphql
+from edb.schema import schema as s_schema
+from edb.server import defines
+from edb.server import compiler
+from edb.tools.edb import edbcommands
+
+
+# The schemas of the GraphQL functional tests, by module.
+SCHEMAS = {
+    'default': 'graphql.esdl',
+    'other': 'graphql_other.esdl',
+    'other::deep': 'graphql_schema_other_deep.esdl',
+}
+
+QUERIES = [
+    '''
+    query {
+        User {
+            name
+            age
+            groups { name }
+        }
+    }
+    ''',
+    '''
+    query {
+        User(filter: {name: {eq: "Alice"}}) {
+            name
+            score
+            profile { name value }
+        }
+    }
+    ''',
+    '''
+    query {
+        UserGroup(order: {name: {dir: ASC}}, first: 10) {
+            name
+            settings(order: {value: {dir: ASC}}) { name value }
+        }
+    }
+    ''',
+    '''
+    query {
+        Profile {
+            name
+            owner_user { name active }
+        }
+    }
+    ''',
+    '''
+    query {
+        other__Foo(filter: {color: {eq: RED}}) {
+            select
+            after
+            foos { color }
+        }
+    }
+    ''',
+    '''
+    mutation insert_Setting {
+        insert_Setting(data: [{name: "bench", value: "1"}]) {
+            name
+            value
+        }
+    }
+    ''',
+]
+
+
+def _load_schema() -> s_schema.Schema:
+    from edb.testbase import lang
+
+    schemas_dir = pathlib.Path(__file__).resolve().parents[2] / 'tests'
+    schemas_dir /= 'schemas'
+
+    modules = ''.join(
+        f'\nmodule {name} {{ {(schemas_dir / fn).read_text()} }}'
+        for name, fn in SCHEMAS.items()
+    )
+    return lang.BaseSchemaTest.run_ddl(
+        lang._load_std_schema(),
+        f'START MIGRATION TO {{ {modules} }};'
+        f'\nPOPULATE MIGRATION;'
+        f'\nCOMMIT MIGRATION;',
+    )
+
+
+def _timeit(fn: Callable[[], object], runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs
+
+
+@edbcommands.command("bench-graphql-compile")
+@click.option(
+    '--runs', type=int, default=100,
+    help='number of compilations of every query')
+def main(*, runs: int) -> None:
+    """Compare compiling GraphQL through EdgeQL text and through the AST."""
+    from edb.testbase import lang
+
+    schema = _load_schema()
+    comp = lang.new_compiler()
+    cfg_ser = comp.state.compilation_config_serializer
+    std_schema = comp.state.std_schema
+    global_schema = s_schema.EMPTY_SCHEMA
+    empty: immutables.Map = immutables.Map()
+
+    def compile_source(source: edgeql.Source) -> None:
+        request = compiler.CompilationRequest(
+            source=source,
+            protocol_version=defines.CURRENT_PROTOCOL,
+            schema_version=uuid.uuid4(),
+            compilation_config_serializer=cfg_ser,
+            output_format=compiler.OutputFormat.JSON,
+            input_format=compiler.InputFormat.JSON,
+            expect_one=True,
+            inline_objectids=False,
+        )
+        comp.compile(
+            user_schema=schema,
+            global_schema=global_schema,
+            reflection_cache=empty,
+            database_config=empty,
+            system_config=empty,
+            request=request,
+        )
+
+    def compile_text(ql: qlast.Base) -> None:
+        compile_source(edgeql.Source.from_string(
+            edgeql.generate_source(ql, pretty=True),
+        ))
+
+    def compile_ast(ql: qlast.Base) -> None:
+        compile_source(edgeql.ASTSource([ql]))
+
+    gqlcore = graphql.get_gqlcore(std_schema, schema, global_schema)
+    total_text = total_ast = 0.0
+    print(f'{"query":>5} {"text (ms)":>10} {"ast (ms)":>10} {"saved":>7}')
+    for i, query in enumerate(QUERIES):
+        gql_op = graphql.compile_graphql(
+            std_schema,
+            schema,
+            global_schema,
+            empty,
+            empty,
+            query,
+            tokens=None,
+            substitutions=None,
+            gqlcore=gqlcore,
+        )
+        ql = gql_op.edgeql_ast
+
+        text = _timeit(functools.partial(compile_text, ql), runs)
+        ast = _timeit(functools.partial(compile_ast, ql), runs)
+        total_text += text
+        total_ast += ast
+        print(
+            f'{i:>5} {text * 1000:10.3f} {ast * 1000:10.3f} '
+            f'{1 - ast / text:7.2%}'
+        )
+
+    print(
+        f'{"all":>5} {total_text * 1000:10.3f} {total_ast * 1000:10.3f} '
+        f'{1 - total_ast / total_text:7.2%}'
+    )
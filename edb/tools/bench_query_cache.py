@@ -0,0 +1,183 @@
+#
+# This source file is part of the EdgeDB open source project.
+#
+# Copyright 2016-present MagicStack Inc. and the EdgeDB authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+from __future__ import annotations
+from typing import Iterable, Iterator, Optional, TextIO
+
+import dataclasses
+import itertools
+import math
+import random
+
+import click
+
+from edb.server.cache import stmt_cache
+from edb.tools.edb import edbcommands
+
+
+@dataclasses.dataclass(frozen=True)
+class Lookup:
+    key: str
+    # compile time in seconds
+    cost: float
+    # size of the compiled entry in bytes
+    size: int
+
+
+@dataclasses.dataclass
+class Result:
+    hits: int = 0
+    misses: int = 0
+    compile_time: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / max(1, self.hits + self.misses)
+
+
+def _weigh(lookup: Lookup) -> float:
+    # Same as the weight of the query cache of the server
+    return lookup.cost / max(1.0, lookup.size / 1024)
+
+
+def replay(
+    lookups: Iterable[Lookup],
+    *,
+    size: int,
+    cost_aware: bool,
+) -> Result:
+    cache = stmt_cache.StatementsCache(
+        maxsize=size,
+        weigher=_weigh if cost_aware else None,
+    )
+    result = Result()
+    for lookup in lookups:
+        if cache.get(lookup.key, None) is not None:
+            result.hits += 1
+            continue
+        result.misses += 1
+        result.compile_time += lookup.cost
+        if cache.admits(lookup.key, lookup):
+            cache[lookup.key] = lookup
+            while cache.needs_cleanup():
+                cache.cleanup_one()
+    return result
+
+
+def read_trace(trace: TextIO) -> Iterator[Lookup]:
+    # One lookup per line: the cache key, and optionally the compile
+    # time in milliseconds and the size of the entry in bytes.
+    for line in trace:
+        key, *rest = line.split()
+        cost = float(rest[0]) / 1000 if rest else 0.01
+        size = int(rest[1]) if len(rest) > 1 else 1024
+        yield Lookup(key, cost, size)
+
+
+def synthetic_trace(
+    *,
+    lookups: int,
+    queries: int,
+    burst_every: int,
+    burst_size: int,
+    seed: Optional[int],
+) -> list[Lookup]:
+    # Zipf-distributed lookups of a fixed set of queries with log-normal
+    # compile times, with bursts of one-off ad-hoc queries.
+    rng = random.Random(seed)
+    hot = [
+        Lookup(
+            f'q{i}',
+            rng.lognormvariate(math.log(0.01), 1.0),
+            int(rng.lognormvariate(math.log(4096), 0.7)),
+        )
+        for i in range(queries)
+    ]
+    cum_weights = list(
+        itertools.accumulate(1 / (rank + 1) for rank in range(queries))
+    )
+    rv: list[Lookup] = []
+    adhoc = 0
+    while len(rv) < lookups:
+        rv.extend(rng.choices(
+            hot,
+            cum_weights=cum_weights,
+            k=min(burst_every or lookups, lookups - len(rv)),
+        ))
+        if burst_every and len(rv) < lookups:
+            for _ in range(burst_size):
+                adhoc += 1
+                rv.append(Lookup(
+                    f'adhoc{adhoc}',
+                    rng.lognormvariate(math.log(0.005), 1.0),
+                    int(rng.lognormvariate(math.log(4096), 0.7)),
+                ))
+    return rv
+
+
+@edbcommands.command("bench-query-cache")
+@click.option(
+    '--trace', type=click.File(),
+    help='replay a recorded trace of cache lookups, one key per line, '
+         'optionally followed by compile time (ms) and entry size (bytes), '
+         'instead of a synthetic one')
+@click.option('--size', type=int, default=1000, help='cache size')
+@click.option(
+    '--lookups', type=int, default=200_000,
+    help='number of lookups of the synthetic trace')
+@click.option(
+    '--queries', type=int, default=5000,
+    help='number of distinct queries of the synthetic trace')
+@click.option(
+    '--burst-every', type=int, default=20_000,
+    help='number of lookups between bursts of ad-hoc queries '
+         'of the synthetic trace, 0 for no bursts')
+@click.option(
+    '--burst-size', type=int, default=3000,
+    help='number of ad-hoc queries in a burst of the synthetic trace')
+@click.option('--seed', type=int, default=None)
+def main(
+    *,
+    trace: Optional[TextIO],
+    size: int,
+    lookups: int,
+    queries: int,
+    burst_every: int,
+    burst_size: int,
+    seed: Optional[int],
+) -> None:
+    """Compare the LRU and cost-aware TinyLFU query cache policies."""
+    if trace is not None:
+        recorded = list(read_trace(trace))
+    else:
+        recorded = synthetic_trace(
+            lookups=lookups,
+            queries=queries,
+            burst_every=burst_every,
+            burst_size=burst_size,
+            seed=seed,
+        )
+
+    print(f'{len(recorded)} lookups, cache size {size}')
+    for name, cost_aware in [('LRU', False), ('TinyLFU', True)]:
+        result = replay(recorded, size=size, cost_aware=cost_aware)
+        print(
+            f'{name:>8}: hit rate {result.hit_rate:7.2%}, '
+            f'compile time {result.compile_time:9.2f}s'
+        )
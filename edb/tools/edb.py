@@ -93,5 +93,7 @@ from . import ls_forbidden_functions  # noqa
 from . import redo_metaschema  # noqa
 from . import ls  # noqa
 from . import railroad_diagram  # noqa
+from . import bench_query_cache  # noqa
+from . import bench_graphql_compile  # noqa
 from .profiling import cli as prof_cli  # noqa
 from .experimental_interpreter import edb_entry # noqa
@@ -17,6 +17,7 @@
 #
 
 
+import gzip
 import os
 import urllib
 import json
@@ -297,6 +298,225 @@ class TestHttpEdgeQL(tb.EdgeQLTestCase):
                 r'''SELECT <positive_int_t>-1''',
             )
 
+    def test_http_edgeql_query_compression_01(self):
+        query = "SELECT array_agg(range_unpack(range(0, 2000)))"
+        expected = [list(range(2000))]
+        with self.http_con() as con:
+            for accept_encoding in [None, 'gzip', 'gzip;q=0']:
+                headers = {'Authorization': self.make_auth_header()}
+                if accept_encoding is not None:
+                    headers['Accept-Encoding'] = accept_encoding
+                data, resp_headers, status = self.http_con_request(
+                    con, {'query': query}, headers=headers,
+                )
+                self.assertEqual(status, 200)
+                self.assertEqual(resp_headers['vary'], 'Accept-Encoding')
+                if accept_encoding == 'gzip':
+                    self.assertEqual(resp_headers['content-encoding'], 'gzip')
+                    data = gzip.decompress(data)
+                else:
+                    self.assertNotIn('content-encoding', resp_headers)
+                self.assertEqual(json.loads(data)['data'], expected)
+
+            # Small responses aren't worth compressing
+            data, resp_headers, status = self.http_con_request(
+                con,
+                {'query': 'SELECT 1'},
+                headers={
+                    'Authorization': self.make_auth_header(),
+                    'Accept-Encoding': 'gzip',
+                },
+            )
+            self.assertEqual(status, 200)
+            self.assertNotIn('content-encoding', resp_headers)
+            self.assertEqual(json.loads(data)['data'], [1])
+
+    def test_http_edgeql_query_etag_01(self):
+        query = "SELECT Setting.name ORDER BY Setting.name"
+        auth = {'Authorization': self.make_auth_header()}
+        with self.http_con() as con:
+            data, headers, status = self.http_con_request(
+                con, {'query': query}, headers=auth,
+            )
+            self.assertEqual(status, 200)
+            etag = headers['etag']
+            self.assertTrue(etag.startswith('W/"'))
+
+            # Same result: nothing to download
+            data, headers, status = self.http_con_request(
+                con,
+                {'query': query},
+                headers={**auth, 'If-None-Match': f'"other", {etag}'},
+            )
+            self.assertEqual(status, 304)
+            self.assertEqual(data, b'')
+            self.assertEqual(headers['etag'], etag)
+
+            # Different result: a full response
+            data, headers, status = self.http_con_request(
+                con,
+                {'query': f'{query} LIMIT 1'},
+                headers={**auth, 'If-None-Match': etag},
+            )
+            self.assertEqual(status, 200)
+            self.assertNotEqual(headers['etag'], etag)
+            self.assertEqual(json.loads(data)['data'], ['perks'])
+
+            # Errors are never validated
+            data, headers, status = self.http_con_request(
+                con, {'query': 'SELECT 1/0'}, headers=auth,
+            )
+            self.assertIn('error', json.loads(data))
+            self.assertNotIn('etag', headers)
+
+    def test_http_edgeql_query_batch_01(self):
+        auth = {'Authorization': self.make_auth_header()}
+        with self.http_con() as con:
+            result, _, status = self.http_con_json_request(
+                con,
+                headers=auth,
+                body={
+                    'queries': [
+                        {'query': 'SELECT <int64>$x + 1',
+                         'variables': {'x': 41}},
+                        {'query': 'SELECT 1/0'},
+                        {'query': 'SELECT global test_global_str'},
+                    ],
+                    'globals': {'default::test_global_str': 'WOO'},
+                },
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(len(result), 3)
+            self.assertEqual(result[0], {'data': [42]})
+            self.assertEqual(
+                result[1]['error']['type'], 'DivisionByZeroError')
+            self.assertEqual(result[2], {'data': ['WOO']})
+
+    def test_http_edgeql_query_batch_02(self):
+        auth = {'Authorization': self.make_auth_header()}
+        insert = "INSERT Setting { name := 'batch', value := <str>$v }"
+        with self.http_con() as con:
+            # A failed query rolls back the whole transaction
+            result, _, status = self.http_con_json_request(
+                con,
+                headers=auth,
+                body={
+                    'queries': [
+                        {'query': insert, 'variables': {'v': 'a'}},
+                        {'query': 'SELECT 1/0'},
+                        {'query': 'SELECT 1'},
+                    ],
+                    'transaction': True,
+                },
+            )
+            self.assertEqual(status, 200)
+            self.assertIsNone(result[0])
+            self.assertEqual(
+                result[1]['error']['type'], 'DivisionByZeroError')
+            self.assertIsNone(result[2])
+            self.assert_edgeql_query_result(
+                "SELECT count(Setting FILTER .name = 'batch')", [0])
+
+            try:
+                result, _, status = self.http_con_json_request(
+                    con,
+                    headers=auth,
+                    body={
+                        'queries': [
+                            {'query': insert, 'variables': {'v': 'b'}},
+                            {'query': "SELECT Setting { value } "
+                                      "FILTER .name = 'batch'"},
+                        ],
+                        'transaction': True,
+                    },
+                )
+                self.assertEqual(status, 200)
+                self.assertEqual(len(result[0]['data']), 1)
+                self.assertEqual(result[1], {'data': [{'value': 'b'}]})
+
+                # The committed changes are visible to everyone
+                self.assert_edgeql_query_result(
+                    "SELECT Setting { value } FILTER .name = 'batch'",
+                    [{'value': 'b'}])
+                result, _, status = self.http_con_json_request(
+                    con,
+                    headers=auth,
+                    body={
+                        'queries': [
+                            {'query': "SELECT count(Setting "
+                                      "FILTER .name = 'batch')"},
+                        ],
+                    },
+                )
+                self.assertEqual(status, 200)
+                self.assertEqual(result, [{'data': [1]}])
+            finally:
+                self.edgeql_query(
+                    "DELETE Setting FILTER .name = 'batch'")
+
+    def test_http_edgeql_query_batch_03(self):
+        auth = {'Authorization': self.make_auth_header()}
+        with self.http_con() as con:
+            for body in [
+                {'queries': []},
+                {'queries': [{'variables': {}}]},
+                {'queries': [{'query': 'SELECT 1'}], 'query': 'SELECT 1'},
+                {'queries': [{'query': 'SELECT 1'}], 'transaction': 1},
+            ]:
+                _, _, status = self.http_con_json_request(
+                    con, headers=auth, body=body,
+                )
+                self.assertEqual(status, 400, body)
+
+    def test_http_edgeql_query_stream_01(self):
+        query = (
+            "SELECT str_repeat('x', 100) ++ <str>range_unpack("
+            "range(<int64>$lo, 10000))"
+        )
+        auth = {'Authorization': self.make_auth_header()}
+        with self.http_con() as con:
+            # A large result is sent as it arrives from Postgres
+            data, headers, status = self.http_con_request(
+                con,
+                method='POST',
+                body=json.dumps({
+                    'query': query,
+                    'variables': {'lo': 0},
+                    'stream': True,
+                }).encode(),
+                headers={**auth, 'Content-Type': 'application/json'},
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(headers['transfer-encoding'], 'chunked')
+            self.assertNotIn('content-length', headers)
+            result = json.loads(data)['data']
+            self.assertEqual(len(result), 10000)
+            self.assertIn('x' * 100 + '42', result)
+
+            # A small one in one piece
+            data, headers, status = self.http_con_request(
+                con,
+                {
+                    'query': query,
+                    'variables': json.dumps({'lo': 9998}),
+                    'stream': 'true',
+                },
+                headers=auth,
+            )
+            self.assertEqual(status, 200)
+            self.assertNotIn('transfer-encoding', headers)
+            self.assertEqual(
+                sorted(json.loads(data)['data']),
+                ['x' * 100 + '9998', 'x' * 100 + '9999'],
+            )
+
+            data, headers, status = self.http_con_request(
+                con, {'query': 'SELECT 1/0', 'stream': 'true'}, headers=auth,
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(
+                json.loads(data)['error']['type'], 'DivisionByZeroError')
+
     def test_http_edgeql_query_globals_01(self):
         Q = r'''select GlobalTest { gstr, garray, gid, gdef, gdef2 }'''
 
@@ -17,6 +17,7 @@
 #
 
 
+import hashlib
 import json
 import os
 import uuid
@@ -161,6 +162,116 @@ class TestGraphQLFunctional(tb.GraphQLTestCase):
             with self.assertRaises(OSError):
                 self.http_con_request(con, {}, path='non-existant')
 
+    def test_graphql_http_persisted_query_01(self):
+        query = '''
+            query($value: String!) {
+                Setting(filter: {value: {eq: $value}}) {
+                    value
+                }
+            }
+        '''
+        sha256_hash = hashlib.sha256(query.encode()).hexdigest()
+        extensions = json.dumps({
+            'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash},
+        })
+        auth = {'Authorization': self.make_auth_header()}
+        with self.http_con() as con:
+            # Unknown hash: the client should retry with the document
+            data, headers, status = self.http_con_request(
+                con,
+                {
+                    'extensions': extensions,
+                    'variables': json.dumps({'value': 'blue'}),
+                },
+                headers=auth,
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(
+                json.loads(data)['errors'][0]['extensions']['code'],
+                'PERSISTED_QUERY_NOT_FOUND')
+
+            data, headers, status = self.http_con_request(
+                con,
+                {
+                    'query': query,
+                    'extensions': extensions,
+                    'variables': json.dumps({'value': 'blue'}),
+                },
+                headers=auth,
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(
+                json.loads(data)['data'], {'Setting': [{'value': 'blue'}]})
+
+            # Now the hash alone will do
+            data, headers, status = self.http_con_request(
+                con,
+                {
+                    'extensions': extensions,
+                    'variables': json.dumps({'value': 'full'}),
+                },
+                headers=auth,
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(
+                json.loads(data)['data'], {'Setting': [{'value': 'full'}]})
+
+            # The document must match the hash
+            data, headers, status = self.http_con_request(
+                con,
+                {
+                    'query': '{ Setting { name } }',
+                    'extensions': extensions,
+                },
+                headers=auth,
+            )
+            self.assertEqual(status, 400)
+            self.assertIn(b'does not match', data)
+
+    def test_graphql_http_batch_01(self):
+        auth = {'Authorization': self.make_auth_header()}
+        with self.http_con() as con:
+            result, _, status = self.http_con_json_request(
+                con,
+                headers=auth,
+                body=[
+                    {
+                        'query': '''
+                            query($value: String!) {
+                                Setting(filter: {value: {eq: $value}}) {
+                                    value
+                                }
+                            }
+                        ''',
+                        'variables': {'value': 'blue'},
+                    },
+                    {'query': '{ NON_EXISTING_TYPE { name } }'},
+                    {
+                        'query': '''
+                            query q($name: String!) {
+                                User(filter: {name: {eq: $name}}) {
+                                    name
+                                }
+                            }
+                        ''',
+                        'operationName': 'q',
+                        'variables': {'name': 'Alice'},
+                    },
+                ],
+            )
+            self.assertEqual(status, 200)
+            self.assertEqual(len(result), 3)
+            self.assertEqual(
+                result[0], {'data': {'Setting': [{'value': 'blue'}]}})
+            self.assertIn('QueryError:', result[1]['errors'][0]['message'])
+            self.assertEqual(
+                result[2], {'data': {'User': [{'name': 'Alice'}]}})
+
+            _, _, status = self.http_con_json_request(
+                con, headers=auth, body=[],
+            )
+            self.assertEqual(status, 400)
+
     def test_graphql_functional_query_01(self):
         for _ in range(10):  # repeat to test prepared pgcon statements
             self.assert_graphql_query_result(r"""
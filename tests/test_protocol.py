@@ -19,6 +19,7 @@
 
 import asyncio
 import contextlib
+import io
 import struct
 
 import edgedb
@@ -26,6 +27,7 @@ import edgedb
 from edb.server import args as srv_args
 from edb.server import compiler
 from edb import protocol
+from edb.common import binwrapper
 from edb.protocol.protocol import Connection
 from edb.testbase import server as tb
 from edb.testbase import connection as tconn
@@ -36,6 +38,13 @@ def pack_i32s(*args):
     return struct.pack("!" + "i" * len(args), *args)
 
 
+def message_data(msg: protocol.ServerMessage) -> bytes:
+    # The contents of a message, without its type and length.
+    iobuf = io.BytesIO()
+    type(msg).dump(msg, binwrapper.BinWrapper(iobuf))
+    return iobuf.getvalue()
+
+
 class TestProtocol(ProtocolTestCase):
 
     async def _execute(
@@ -896,6 +905,383 @@ class TestProtocol(ProtocolTestCase):
         finally:
             await self.con.recv_match(protocol.ReadyForCommand)
 
+    async def _open_cursor(self, query, name, fetch_size):
+        await self._parse(query)
+        res = await self.con.recv_match(protocol.CommandDataDescription)
+
+        await self.con.send(
+            protocol.OpenCursor(
+                annotations=[],
+                allowed_capabilities=protocol.Capability.ALL,
+                compilation_flags=protocol.CompilationFlag(0),
+                implicit_limit=0,
+                command_text=query,
+                input_language=protocol.InputLanguage.EDGEQL,
+                output_format=protocol.OutputFormat.BINARY,
+                expected_cardinality=protocol.Cardinality.MANY,
+                input_typedesc_id=res.input_typedesc_id,
+                output_typedesc_id=res.output_typedesc_id,
+                state_typedesc_id=b'\0' * 16,
+                arguments=b'',
+                state_data=b'',
+                cursor_name=name,
+                fetch_size=fetch_size,
+            ),
+            protocol.Sync(),
+        )
+
+    async def _recv_rows(self):
+        rows = 0
+        while True:
+            msg = await self.con.recv()
+            if not isinstance(msg, protocol.Data):
+                return rows, msg
+            rows += 1
+
+    async def test_proto_cursor_01(self):
+        await self.con.connect()
+        query = 'SELECT range_unpack(range(0, 5))'
+
+        # Cursors only live in transactions.
+        await self._open_cursor(query, 'c', 2)
+        await self.con.recv_match(
+            protocol.ErrorResponse,
+            message='cursors can only be opened inside a transaction',
+        )
+        await self.con.recv_match(protocol.ReadyForCommand)
+
+        await self._execute('START TRANSACTION')
+        await self.con.recv_match(protocol.CommandComplete)
+        await self.con.recv_match(protocol.ReadyForCommand)
+        try:
+            await self._open_cursor(query, 'c', 2)
+            rows, msg = await self._recv_rows()
+            self.assertEqual(rows, 2)
+            self.assertIsInstance(msg, protocol.CursorSuspended)
+            self.assertEqual(msg.cursor_name, 'c')
+            await self.con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=protocol.TransactionState.IN_TRANSACTION,
+            )
+
+            # A second cursor, interleaved with the first one.
+            await self._open_cursor(query, 'd', 0)
+            rows, msg = await self._recv_rows()
+            self.assertEqual(rows, 5)
+            self.assertIsInstance(msg, protocol.CommandComplete)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+            await self.con.send(
+                protocol.FetchCursor(
+                    annotations=[], cursor_name='c', fetch_size=2),
+                protocol.Sync(),
+            )
+            rows, msg = await self._recv_rows()
+            self.assertEqual(rows, 2)
+            self.assertIsInstance(msg, protocol.CursorSuspended)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+            await self.con.send(
+                protocol.FetchCursor(
+                    annotations=[], cursor_name='c', fetch_size=2),
+                protocol.Sync(),
+            )
+            rows, msg = await self._recv_rows()
+            self.assertEqual(rows, 1)
+            self.assertIsInstance(msg, protocol.CommandComplete)
+            self.assertEqual(msg.status, 'SELECT')
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+            # An exhausted cursor is closed.
+            await self.con.send(
+                protocol.FetchCursor(
+                    annotations=[], cursor_name='c', fetch_size=2),
+                protocol.Sync(),
+            )
+            await self.con.recv_match(
+                protocol.ErrorResponse,
+                message="cursor 'c' does not exist",
+            )
+            await self.con.recv_match(protocol.ReadyForCommand)
+        finally:
+            await self._execute('ROLLBACK')
+            await self.con.recv_match(protocol.CommandComplete)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+    async def test_proto_cursor_02(self):
+        await self.con.connect()
+        query = 'SELECT range_unpack(range(0, 5))'
+
+        await self._execute('START TRANSACTION')
+        await self.con.recv_match(protocol.CommandComplete)
+        await self.con.recv_match(protocol.ReadyForCommand)
+        try:
+            await self._open_cursor(query, 'c', 1)
+            rows, msg = await self._recv_rows()
+            self.assertEqual(rows, 1)
+            self.assertIsInstance(msg, protocol.CursorSuspended)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+            await self.con.send(
+                protocol.CloseCursor(annotations=[], cursor_name='c'),
+                protocol.FetchCursor(
+                    annotations=[], cursor_name='c', fetch_size=1),
+                protocol.Sync(),
+            )
+            await self.con.recv_match(
+                protocol.ErrorResponse,
+                message="cursor 'c' does not exist",
+            )
+            await self.con.recv_match(
+                protocol.ReadyForCommand,
+                transaction_state=(
+                    protocol.TransactionState.IN_FAILED_TRANSACTION),
+            )
+        finally:
+            await self._execute('ROLLBACK')
+            await self.con.recv_match(protocol.CommandComplete)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+        # The cursor does not outlive its transaction.
+        await self._execute('START TRANSACTION')
+        await self.con.recv_match(protocol.CommandComplete)
+        await self.con.recv_match(protocol.ReadyForCommand)
+        try:
+            await self._open_cursor(query, 'c', 1)
+            rows, msg = await self._recv_rows()
+            self.assertIsInstance(msg, protocol.CursorSuspended)
+            await self.con.recv_match(protocol.ReadyForCommand)
+        finally:
+            await self._execute('ROLLBACK')
+            await self.con.recv_match(protocol.CommandComplete)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+        await self.con.send(
+            protocol.FetchCursor(
+                annotations=[], cursor_name='c', fetch_size=1),
+            protocol.Sync(),
+        )
+        await self.con.recv_match(
+            protocol.ErrorResponse,
+            message="cursor 'c' does not exist",
+        )
+        await self.con.recv_match(protocol.ReadyForCommand)
+
+    async def test_proto_cursor_03(self):
+        await self.con.connect()
+
+        await self._execute('START TRANSACTION')
+        await self.con.recv_match(protocol.CommandComplete)
+        await self.con.recv_match(protocol.ReadyForCommand)
+        try:
+            # DDL may run several SQL statements, which a portal can't.
+            await self._open_cursor('CREATE TYPE CursorDDL', 'c', 1)
+            await self.con.recv_match(
+                protocol.ErrorResponse,
+                message='only a single query',
+            )
+            await self.con.recv_match(protocol.ReadyForCommand)
+        finally:
+            await self._execute('ROLLBACK')
+            await self.con.recv_match(protocol.CommandComplete)
+            await self.con.recv_match(protocol.ReadyForCommand)
+
+    async def _dump_branch(self, dbname):
+        con = await protocol.new_connection(
+            **self.get_connect_args(database=dbname)
+        )
+        try:
+            await con.connect()
+            await con.send(
+                protocol.Dump(annotations=[], flags=protocol.DumpFlag(0)),
+                protocol.Sync(),
+            )
+            header = await con.recv_match(protocol.DumpHeader)
+            blocks = []
+            while True:
+                msg = await con.recv()
+                if isinstance(msg, protocol.CommandComplete):
+                    break
+                self.assertIsInstance(msg, protocol.DumpBlock)
+                blocks.append(msg)
+            await con.recv_match(protocol.ReadyForCommand)
+        finally:
+            await con.aclose()
+        return header, blocks
+
+    async def test_proto_restore_parallel_01(self):
+        if not self.has_create_database:
+            self.skipTest('create branch is not supported by the backend')
+
+        client = type(self).con
+        dbname = self.get_database_name()
+        src_dbname = f'{dbname}_restore_src'
+        tgt_dbname = f'{dbname}_restore_tgt'
+        await client.execute(f'CREATE EMPTY BRANCH {src_dbname}')
+        await client.execute(f'CREATE EMPTY BRANCH {tgt_dbname}')
+        try:
+            src = await self.connect(database=src_dbname)
+            try:
+                await src.execute('''
+                    CREATE TYPE A {
+                        CREATE PROPERTY n -> int64 {
+                            CREATE CONSTRAINT exclusive;
+                        };
+                        CREATE INDEX ON (.n);
+                    };
+                    CREATE TYPE B { CREATE PROPERTY n -> int64 };
+                    CREATE TYPE C { CREATE PROPERTY n -> int64 };
+                    FOR n IN range_unpack(range(0, 1000)) UNION {
+                        (INSERT A { n := n }),
+                        (INSERT B { n := n }),
+                        (INSERT C { n := n }),
+                    };
+                ''')
+            finally:
+                await src.aclose()
+
+            header, blocks = await self._dump_branch(src_dbname)
+
+            con = await protocol.new_connection(
+                **self.get_connect_args(database=tgt_dbname)
+            )
+            try:
+                await con.connect()
+                await con.send(protocol.Restore(
+                    attributes=[],
+                    jobs=4,
+                    header_data=message_data(header),
+                ))
+                ready = await con.recv_match(protocol.RestoreReady)
+                self.assertGreater(ready.jobs, 1)
+                await con.send(
+                    *(
+                        protocol.RestoreBlock(block_data=message_data(block))
+                        for block in blocks
+                    ),
+                    protocol.RestoreEof(),
+                )
+                await con.recv_match(
+                    protocol.CommandComplete,
+                    _ignore_msg=protocol.StateDataDescription,
+                    status='RESTORE',
+                )
+            finally:
+                await con.aclose()
+
+            tgt = await self.connect(database=tgt_dbname)
+            try:
+                for name in ['A', 'B', 'C']:
+                    self.assertEqual(
+                        await tgt.query_single(f'SELECT sum({name}.n)'),
+                        sum(range(1000)),
+                    )
+
+                # Indexes and constraints are created after the data
+                # is loaded, but they are still there.
+                with self.assertRaises(edgedb.ConstraintViolationError):
+                    await tgt.execute('INSERT A { n := 1 }')
+            finally:
+                await tgt.aclose()
+        finally:
+            await tb.drop_db(client, src_dbname)
+            await tb.drop_db(client, tgt_dbname)
+
+    async def test_proto_restore_parallel_02(self):
+        if not self.has_create_database:
+            self.skipTest('create branch is not supported by the backend')
+
+        client = type(self).con
+        dbname = self.get_database_name()
+        src_dbname = f'{dbname}_restore_src'
+        tgt_dbname = f'{dbname}_restore_tgt'
+        await client.execute(f'CREATE EMPTY BRANCH {src_dbname}')
+        await client.execute(f'CREATE EMPTY BRANCH {tgt_dbname}')
+        try:
+            src = await self.connect(database=src_dbname)
+            try:
+                await src.execute('''
+                    CREATE TYPE A {
+                        CREATE PROPERTY n -> int64 {
+                            CREATE CONSTRAINT exclusive;
+                        };
+                        CREATE INDEX ON (.n);
+                    };
+                    CREATE TYPE B {
+                        CREATE PROPERTY n -> int64;
+                        CREATE LINK a -> A;
+                    };
+                    FOR n IN range_unpack(range(0, 1000)) UNION {
+                        (INSERT B { n := n, a := (INSERT A { n := n }) }),
+                    };
+                ''')
+                a_id = await src.query_single('''
+                    SELECT (
+                        SELECT schema::ObjectType FILTER .name = 'default::A'
+                    ).id
+                ''')
+            finally:
+                await src.aclose()
+
+            header, blocks = await self._dump_branch(src_dbname)
+
+            # Loading the data of A twice makes its loader fail on the
+            # object ids, after it has disabled the triggers of A and
+            # dropped its deferred indexes.
+            a_blocks = [
+                block for block in blocks
+                if any(
+                    # DUMP_HEADER_BLOCK_ID
+                    kv.code == 110 and kv.value == a_id.bytes
+                    for kv in block.attributes
+                )
+            ]
+            self.assertTrue(a_blocks)
+
+            con = await protocol.new_connection(
+                **self.get_connect_args(database=tgt_dbname)
+            )
+            try:
+                await con.connect()
+                await con.send(protocol.Restore(
+                    attributes=[],
+                    jobs=2,
+                    header_data=message_data(header),
+                ))
+                ready = await con.recv_match(protocol.RestoreReady)
+                self.assertEqual(ready.jobs, 2)
+                await con.send(
+                    *(
+                        protocol.RestoreBlock(block_data=message_data(block))
+                        for block in blocks + a_blocks
+                    ),
+                    protocol.RestoreEof(),
+                )
+                await con.recv_match(protocol.ErrorResponse)
+            finally:
+                await con.aclose()
+
+            tgt = await self.connect(database=tgt_dbname)
+            try:
+                self.assertEqual(await tgt.query_single('SELECT count(A)'), 0)
+
+                # The indexes and the triggers of A are still there.
+                await tgt.execute('INSERT A { n := 1 }')
+                with self.assertRaises(edgedb.ConstraintViolationError):
+                    await tgt.execute('INSERT A { n := 1 }')
+
+                await tgt.execute('INSERT B { a := (INSERT A { n := 2 }) }')
+                with self.assertRaisesRegex(
+                    edgedb.ConstraintViolationError,
+                    'prohibited by link target policy',
+                ):
+                    await tgt.execute('DELETE A FILTER .n = 2')
+            finally:
+                await tgt.aclose()
+        finally:
+            await tb.drop_db(client, src_dbname)
+            await tb.drop_db(client, tgt_dbname)
+
 
 class TestServerCancellation(tb.TestCase):
     @contextlib.asynccontextmanager
@@ -20,6 +20,7 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
 
+import pickle
 import random
 import re
 
@@ -1444,6 +1445,47 @@ class TestSchema(tb.BaseSchemaLoadTest):
                 """
             )
 
+    def test_schema_delta_01(self):
+        base = self.load_schema("""
+            type Object1;
+            type Object2 {
+                link foo -> Object1;
+                property bar -> str;
+            };
+        """)
+
+        schema = self.run_ddl(base, '''
+            CREATE TYPE test::Object3 EXTENDING test::Object1;
+            ALTER TYPE test::Object2 DROP LINK foo;
+            ALTER TYPE test::Object2 RENAME TO test::Object4;
+        ''')
+
+        delta = pickle.loads(pickle.dumps(schema.get_delta(base), -1))
+        patched = base.apply_delta(delta)
+
+        for field in (
+            '_id_to_data',
+            '_id_to_type',
+            '_name_to_id',
+            '_shortname_to_id',
+            '_globalname_to_id',
+            '_refs_to',
+        ):
+            self.assertEqual(
+                getattr(patched, field), getattr(schema, field), field)
+
+        self.assertIsNotNone(patched.get('test::Object3', default=None))
+        self.assertIsNone(patched.get('test::Object2', default=None))
+        obj4 = patched.get('test::Object4', type=s_objtypes.ObjectType)
+        self.assertIsNone(
+            obj4.maybe_get_ptr(patched, s_name.UnqualName('foo')))
+
+        # An empty delta leaves the schema intact.
+        self.assertEqual(
+            base.apply_delta(base.get_delta(base))._id_to_data,
+            base._id_to_data,
+        )
+
     def test_schema_annotation_inheritance_01(self):
         schema = self.load_schema("""
             abstract annotation noninh;
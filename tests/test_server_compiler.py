@@ -19,7 +19,10 @@
 from typing import Any
 
 import asyncio
+import collections
 import contextlib
+import errno
+import functools
 import os
 import pickle
 import signal
@@ -38,12 +41,19 @@ from edb.ir import statypes
 from edb.testbase import lang as tb
 from edb.testbase import server as tbs
 from edb.pgsql import params as pg_params
+from edb.schema import name as s_name
+from edb.schema import schema as s_schema
 from edb.server import args as edbargs
 from edb.server import compiler as edbcompiler
 from edb.server.compiler import rpc
 from edb.server import config
+from edb.server import metrics
 from edb.server.compiler_pool import amsg
 from edb.server.compiler_pool import pool
+from edb.server.compiler_pool import queue
+from edb.server.compiler_pool import schema_store
+from edb.server.compiler_pool import server as pool_server
+from edb.server.compiler_pool import state
 from edb.server.dbview import dbview
 
 
@@ -84,6 +94,148 @@ class TestServerCompiler(tb.BaseSchemaLoadTest):
             ''',
         )
 
+    def test_server_compiler_compile_ast_source(self):
+        cfg_ser = self.compiler.state.compilation_config_serializer
+        query = '''
+            SELECT Foo {
+                bar,
+                len := len(.bar),
+            }
+            FILTER .bar = <str>$bar
+            ORDER BY .bar
+        '''
+
+        def compile(source):
+            request = rpc.CompilationRequest(
+                source=source,
+                protocol_version=(1, 0),
+                schema_version=uuid.uuid4(),
+                compilation_config_serializer=cfg_ser,
+                modaliases=immutables.Map({None: 'default'}),
+            )
+            units, _ = self.compiler.compile(
+                user_schema=self.schema,
+                global_schema=s_schema.EMPTY_SCHEMA,
+                reflection_cache=immutables.Map(),
+                database_config=immutables.Map(),
+                system_config=immutables.Map(),
+                request=request,
+            )
+            return [
+                (
+                    unit.sql,
+                    unit.cardinality,
+                    unit.capabilities,
+                    unit.in_type_id,
+                    unit.in_type_data,
+                    unit.out_type_id,
+                    unit.out_type_data,
+                )
+                for unit in units
+            ]
+
+        ast_source = edgeql.ASTSource([edgeql.parse_query(query)])
+        self.assertEqual(
+            compile(ast_source),
+            compile(edgeql.Source.from_string(query)),
+        )
+
+        with self.assertRaisesRegex(ValueError, 'cannot be deserialized'):
+            edgeql.tokenizer.deserialize(
+                ast_source.serialize(), ast_source.text())
+
+    def test_server_compiler_user_schema_affected_ids(self):
+        base = self.run_ddl(self.schema, '''
+            CREATE TYPE default::Bar;
+            CREATE TYPE default::Qux {
+                CREATE PROPERTY name -> std::str;
+            };
+        ''')
+        schema = self.run_ddl(base, '''
+            ALTER TYPE default::Foo CREATE PROPERTY baz -> std::int64;
+            CREATE TYPE default::Baz EXTENDING default::Bar;
+            CREATE FUNCTION default::len(x: default::Foo) -> std::int64
+                USING (1);
+        ''')
+
+        affected = edbcompiler.compiler._get_user_schema_affected_ids(
+            schema.get_delta(base), base, schema, self._std_schema)
+        assert affected is not None
+
+        def ids(*names):
+            return {base.get(name).id for name in names}
+
+        # Changed directly, or by getting a new descendant
+        self.assertLessEqual(
+            ids('default::Foo', 'default::Bar', 'std::Object'), affected)
+        # May resolve to the new default::len() now
+        self.assertLessEqual(
+            {f.id for f in base.get_functions('std::len')}, affected)
+        # Only used by the changes, or unrelated
+        self.assertTrue(
+            affected.isdisjoint(
+                ids('std::str', 'std::int64', 'default::Qux')))
+        qux_name = base.get('default::Qux').getptr(
+            base, s_name.UnqualName('name'))
+        self.assertNotIn(qux_name.id, affected)
+
+        schema = self.run_ddl(base, '''
+            CREATE MODULE other;
+        ''')
+        self.assertIsNone(
+            edbcompiler.compiler._get_user_schema_affected_ids(
+                schema.get_delta(base), base, schema, self._std_schema))
+
+    def test_server_compiler_user_schema_affected_ids_owners(self):
+        base = self.run_ddl(self.schema, '''
+            CREATE TYPE default::Log;
+            CREATE TYPE default::Other;
+            CREATE TYPE default::Secret {
+                CREATE PROPERTY val -> std::str {
+                    SET default := 'x';
+                    CREATE REWRITE INSERT USING ('y');
+                };
+                CREATE ACCESS POLICY allow_all ALLOW ALL USING (true);
+                CREATE TRIGGER log AFTER INSERT FOR EACH
+                    DO (INSERT default::Log);
+            };
+        ''')
+        secret = base.get('default::Secret').id
+        other = base.get('default::Other').id
+
+        # Queries refer to the type, but not to its policies, triggers,
+        # rewrites or pointer defaults that change how they compile.
+        for ddl in [
+            '''
+                ALTER TYPE default::Secret
+                    ALTER ACCESS POLICY allow_all USING (false);
+            ''',
+            '''
+                ALTER TYPE default::Secret
+                    CREATE ACCESS POLICY deny_all DENY ALL;
+            ''',
+            '''
+                ALTER TYPE default::Secret DROP TRIGGER log;
+            ''',
+            '''
+                ALTER TYPE default::Secret
+                    ALTER PROPERTY val DROP REWRITE INSERT;
+            ''',
+            '''
+                ALTER TYPE default::Secret
+                    ALTER PROPERTY val SET default := 'z';
+            ''',
+        ]:
+            with self.subTest(ddl=ddl):
+                schema = self.run_ddl(base, ddl)
+                affected = (
+                    edbcompiler.compiler._get_user_schema_affected_ids(
+                        schema.get_delta(base), base, schema,
+                        self._std_schema))
+                assert affected is not None
+                self.assertIn(secret, affected)
+                self.assertNotIn(other, affected)
+
     def _test_compile_structured_config(
         self,
         values: dict[str, Any],
@@ -411,6 +563,141 @@ class TestAmsg(tbs.TestCase):
                     os.kill(pid, 0)
 
 
+class TestMessageStream(unittest.TestCase):
+    def _frame(self, *payloads):
+        return b''.join(
+            amsg._uint64_packer(len(payload)) + payload
+            for payload in payloads
+        )
+
+    def _feed(self, stream, data, chunk_size):
+        rv = []
+        for i in range(0, len(data), chunk_size):
+            rv.extend(
+                bytes(msg)
+                for msg in stream.feed_data(data[i:i + chunk_size])
+            )
+        return rv
+
+    def test_server_compiler_amsg_stream_01(self):
+        payloads = [b'a' * 10, b'', b'bc' * 1000, b'd']
+        data = self._frame(*payloads)
+        # Feed the framed data in all sorts of chunk sizes, including ones
+        # that split the length prefix of the messages.
+        for chunk_size in (1, 3, 7, 8, 9, 13, 100, len(data)):
+            with self.subTest(chunk_size=chunk_size):
+                stream = amsg.MessageStream()
+                self.assertEqual(
+                    self._feed(stream, data, chunk_size), payloads
+                )
+
+    def test_server_compiler_amsg_stream_02(self):
+        stream = amsg.MessageStream()
+        data = self._frame(b'first', b'second')
+        msgs = list(stream.feed_data(data))
+        self.assertEqual([bytes(m) for m in msgs], [b'first', b'second'])
+        # Messages received in one chunk are views into the chunk itself.
+        self.assertIs(msgs[0].obj, data)
+
+    def test_server_compiler_amsg_stream_large(self):
+        # A micro benchmark of reassembling large messages, e.g. schema
+        # pickles, from the small chunks read off the socket.
+        size = 50 * 1024 * 1024
+        payload = os.urandom(1024) * (size // 1024)
+        data = self._frame(payload, b'tail')
+        for chunk_size in (4096, 65536, 1024 * 1024):
+            with self.subTest(chunk_size=chunk_size):
+                stream = amsg.MessageStream()
+                started_at = time.monotonic()
+                msgs = []
+                view = memoryview(data)
+                for i in range(0, len(data), chunk_size):
+                    msgs.extend(stream.feed_data(view[i:i + chunk_size]))
+                elapsed = time.monotonic() - started_at
+                self.assertEqual(len(msgs), 2)
+                self.assertEqual(msgs[0], payload)
+                self.assertEqual(msgs[1], b'tail')
+                # Reassembly is linear in the message size, even the
+                # smallest chunk size used here should stay well below
+                # this with the old quadratic buffer concatenation.
+                self.assertLess(elapsed, 10.0)
+
+
+class TestSharedSchemaStore(unittest.TestCase):
+    def test_server_compiler_schema_store_01(self):
+        with tempfile.TemporaryDirectory() as td:
+            store = schema_store.SharedSchemaStore(
+                runstate_dir=td, capacity=1
+            )
+            try:
+                schema1 = pickle.dumps({'schema': 1})
+                schema2 = pickle.dumps({'schema': 2})
+
+                ref1 = store.acquire(schema1)
+                # The same pickle is only stored once.
+                self.assertEqual(store.acquire(schema1), ref1)
+                self.assertEqual(
+                    schema_store.load_pickle(ref1), {'schema': 1}
+                )
+
+                # Pinned entries are kept even above the capacity ...
+                ref2 = store.acquire(schema2)
+                self.assertTrue(os.path.exists(ref1.path))
+                store.release(schema1)
+                self.assertTrue(os.path.exists(ref1.path))
+
+                # ... until they are released.
+                store.release(schema1)
+                self.assertFalse(os.path.exists(ref1.path))
+                self.assertEqual(
+                    schema_store.load_pickle(ref2), {'schema': 2}
+                )
+            finally:
+                store.close()
+            self.assertFalse(os.path.exists(ref2.path))
+
+    def test_server_compiler_schema_store_02(self):
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        proc.wait()
+        with (
+            tempfile.TemporaryDirectory() as td,
+            unittest.mock.patch.object(schema_store, 'SHM_DIR', td),
+        ):
+            # Left behind by a server that is gone, or still in use
+            stale = os.path.join(td, f'gel-compiler-{proc.pid}-stale')
+            live = os.path.join(td, f'gel-compiler-{os.getpid()}-live')
+            os.mkdir(stale)
+            os.mkdir(live)
+
+            store = schema_store.SharedSchemaStore(
+                runstate_dir=td, capacity=1
+            )
+            try:
+                self.assertFalse(os.path.exists(stale))
+                self.assertTrue(os.path.exists(live))
+
+                def no_space(fd, mode):
+                    os.close(fd)
+                    raise OSError(errno.ENOSPC, 'No space left on device')
+
+                schema = pickle.dumps({'schema': 1})
+                with unittest.mock.patch.object(
+                    schema_store, 'open', no_space, create=True
+                ):
+                    with self.assertRaises(OSError):
+                        store.acquire(schema)
+                # Nothing is left behind or pinned.
+                self.assertEqual(os.listdir(store._dir), [])
+                self.assertEqual(len(store._entries), 0)
+
+                ref = store.acquire(schema)
+                self.assertEqual(
+                    schema_store.load_pickle(ref), {'schema': 1}
+                )
+            finally:
+                store.close()
+
+
 class TestServerCompilerPool(tbs.TestCase):
     def _wait_pids(self, *pids, timeout=1):
         remaining = list(pids)
@@ -541,27 +828,30 @@ class TestCompilerPool(tbs.TestCase):
         assert _schema_class_layout is not None
         cls._schema_class_layout = _schema_class_layout
 
+    async def _create_pool(self, td, pool_class, pool_size=2):
+        return await pool.create_compiler_pool(
+            runstate_dir=td,
+            pool_size=pool_size,
+            worker_branch_limit=5,
+            backend_runtime_params=pg_params.get_default_runtime_params(),
+            std_schema=self._std_schema,
+            refl_schema=self._refl_schema,
+            schema_class_layout=self._schema_class_layout,
+            pool_class=pool_class,
+            dbindex=dbview.DatabaseIndex(
+                unittest.mock.MagicMock(),
+                std_schema=self._std_schema,
+                global_schema_pickle=pickle.dumps(None, -1),
+                sys_config={},
+                default_sysconfig=immutables.Map(),
+                sys_config_spec=config.load_spec_from_schema(
+                    self._std_schema),
+            ),
+        )
+
     async def _test_pool_disconnect_queue(self, pool_class):
         with tempfile.TemporaryDirectory() as td:
-            pool_ = await pool.create_compiler_pool(
-                runstate_dir=td,
-                pool_size=2,
-                worker_branch_limit=5,
-                backend_runtime_params=pg_params.get_default_runtime_params(),
-                std_schema=self._std_schema,
-                refl_schema=self._refl_schema,
-                schema_class_layout=self._schema_class_layout,
-                pool_class=pool_class,
-                dbindex=dbview.DatabaseIndex(
-                    unittest.mock.MagicMock(),
-                    std_schema=self._std_schema,
-                    global_schema_pickle=pickle.dumps(None, -1),
-                    sys_config={},
-                    default_sysconfig=immutables.Map(),
-                    sys_config_spec=config.load_spec_from_schema(
-                        self._std_schema),
-                ),
-            )
+            pool_ = await self._create_pool(td, pool_class)
             try:
                 w1 = await pool_._acquire_worker()
                 w2 = await pool_._acquire_worker()
@@ -617,6 +907,467 @@ class TestCompilerPool(tbs.TestCase):
     async def test_server_compiler_pool_disconnect_queue_adaptive(self):
         await self._test_pool_disconnect_queue(pool.SimpleAdaptivePool)
 
+    async def test_server_compiler_pool_prewarm(self):
+        with tempfile.TemporaryDirectory() as td:
+            pool_ = await self._create_pool(td, pool.FixedPool, pool_size=3)
+            try:
+                w1, w2, w3 = pool_._workers.values()
+                calls = []
+
+                async def call(w, method_name, *args, sync_state=None):
+                    calls.append((w, method_name, args[0]))
+                    if sync_state is not None:
+                        sync_state()
+
+                old, new = b'old' * 100, b'new' * 100
+                refl, db_config = immutables.Map(), immutables.Map()
+                for w in (w1, w2, w3):
+                    w.call = functools.partial(call, w)
+                for w in (w1, w2):
+                    w.set_db('db', state.PickledDatabaseState(
+                        old, refl, db_config
+                    ))
+
+                def prewarm():
+                    pool_.prewarm(
+                        'db',
+                        new,
+                        w1._global_schema_pickle,
+                        refl,
+                        db_config,
+                        w1._system_config,
+                    )
+                    return asyncio.gather(*pool_._prewarm_tasks.values())
+
+                # Only idle workers holding the branch are synced.
+                busy = await pool_._acquire_worker(condition=lambda w: w is w2)
+                self.assertIs(busy, w2)
+                await prewarm()
+                self.assertEqual(calls, [(w1, 'prewarm', 'db')])
+                self.assertIs(w1.get_db('db').user_schema_pickle, new)
+                self.assertIs(w2.get_db('db').user_schema_pickle, old)
+                self.assertIsNone(w3.get_db('db'))
+
+                # ... and only if they don't have the new schema yet.
+                calls.clear()
+                pool_._release_worker(busy)
+                await prewarm()
+                self.assertEqual(calls, [(w2, 'prewarm', 'db')])
+                self.assertIs(w2.get_db('db').user_schema_pickle, new)
+            finally:
+                await pool_.stop()
+
+    async def test_server_compiler_pool_user_schema_delta_drop(self):
+        with tempfile.TemporaryDirectory() as td:
+            pool_ = await self._create_pool(td, pool.FixedPool)
+            try:
+                w1, w2 = pool_._workers.values()
+                base, new = b'base' * 100, b'new' * 100
+                for w in (w1, w2):
+                    w.set_db('db', state.PickledDatabaseState(
+                        base, immutables.Map(), immutables.Map()
+                    ))
+                pool_.add_user_schema_delta(
+                    'db', base, new, uuid.uuid4(), b'delta')
+                self.assertIn('db', pool_._user_schema_deltas)
+
+                async def sync(w):
+                    db = w.get_db('db')
+                    preargs, callback, fini = (
+                        await pool_._compute_compile_preargs(
+                            'compile',
+                            w,
+                            'db',
+                            new,
+                            w._global_schema_pickle,
+                            db.reflection_cache,
+                            db.database_config,
+                            w._system_config,
+                        )
+                    )
+                    fini()
+                    self.assertIsInstance(preargs[3], state.UserSchemaDelta)
+                    callback()
+
+                # The delta is kept until every worker is synced.
+                await sync(w1)
+                self.assertIn('db', pool_._user_schema_deltas)
+                await sync(w2)
+                self.assertNotIn('db', pool_._user_schema_deltas)
+
+                # ... and is not kept at all if no worker needs it.
+                pool_.add_user_schema_delta(
+                    'other', base, new, uuid.uuid4(), b'delta')
+                self.assertNotIn('other', pool_._user_schema_deltas)
+            finally:
+                await pool_.stop()
+
+    async def test_server_compiler_pool_pinned_tx_state(self):
+        compiler = edbcompiler.new_compiler(
+            std_schema=self._std_schema,
+            reflection_schema=self._refl_schema,
+            schema_class_layout=self._schema_class_layout,
+        )
+        context = edbcompiler.new_compiler_context(
+            compiler_state=compiler.state,
+            user_schema=self._std_schema,
+            modaliases={None: 'default'},
+        )
+        context.state.start_tx()
+        txid = context.state.current_tx().id
+        user_schema_pickle = pickle.dumps(context.state.root_user_schema)
+        pickled_state = pickle.dumps(context.state, -1)
+        cfg_ser = compiler.state.compilation_config_serializer
+
+        def compile_in_tx(pool_, conn_state, query):
+            request = rpc.CompilationRequest(
+                source=edgeql.Source.from_string(query),
+                protocol_version=(1, 0),
+                schema_version=uuid.uuid4(),
+                compilation_config_serializer=cfg_ser,
+            )
+            return pool_.compile_in_tx(
+                None,
+                user_schema_pickle,
+                txid,
+                conn_state,
+                0,
+                request.serialize(),
+                query,
+            )
+
+        async def wait_for(condition):
+            start = time.monotonic()
+            while not condition():
+                if time.monotonic() - start > LONG_WAIT:
+                    raise TimeoutError("condition is not met")
+                await asyncio.sleep(0.05)
+
+        async def kill_worker(pool_, pid):
+            os.kill(pid, signal.SIGTERM)
+            await wait_for(lambda: pid not in pool_._workers)
+
+        async def assert_state_dropped(pool_, pin):
+            worker = await pool_._acquire_pinned_worker(pin.pid)
+            try:
+                with self.assertRaises(state.StateNotFound):
+                    await worker.call('pickle_tx_state', pin.state_id)
+            finally:
+                pool_._release_worker(worker)
+
+        with (
+            tempfile.TemporaryDirectory() as td,
+            unittest.mock.patch.object(
+                pool, 'TX_STATE_CHECKPOINT_DELAY', 0.1),
+        ):
+            pool_ = await self._create_pool(td, pool.FixedPool)
+            try:
+                _, pin1, _ = await compile_in_tx(
+                    pool_, pickled_state, 'SELECT 1')
+                self.assertIsInstance(pin1, state.PinnedTxState)
+                self.assertTrue(pin1.fallback_is_current)
+                self.assertIsNone(pin1.checkpoint)
+
+                # The transaction sticks to the worker holding its state.
+                _, pin2, _ = await compile_in_tx(
+                    pool_, pin1, 'SET MODULE std')
+                self.assertEqual(pin2.pid, pin1.pid)
+                self.assertFalse(pin2.fallback_is_current)
+                self.assertIsNotNone(pin2.checkpoint)
+
+                # The changed state is pickled once the transaction is idle.
+                await wait_for(lambda: pin2.fallback_is_current)
+                cstate = pickle.loads(pin2.fallback)
+                self.assertEqual(
+                    cstate.current_tx().get_modaliases().get(None), 'std')
+
+                # If the worker is lost, the transaction carries on from
+                # the checkpoint in another worker.
+                await kill_worker(pool_, pin2.pid)
+                _, pin3, _ = await compile_in_tx(pool_, pin2, 'SELECT 1')
+                self.assertNotEqual(pin3.pid, pin2.pid)
+                self.assertIs(pin3.fallback, pin2.fallback)
+
+                # ... unless the checkpoint is stale, then it can only be
+                # rolled back.
+                _, pin4, _ = await compile_in_tx(
+                    pool_, pin3, 'SET MODULE default')
+                pin4.checkpoint.cancel()
+                await kill_worker(pool_, pin4.pid)
+                with self.assertRaisesRegex(
+                    errors.TransactionError, 'must be rolled back'
+                ):
+                    await compile_in_tx(pool_, pin4, 'SELECT 1')
+                units, conn_state, _ = await compile_in_tx(
+                    pool_, pin4, 'ROLLBACK')
+                self.assertTrue(units[0].tx_rollback)
+                self.assertIsInstance(conn_state, bytes)
+
+                # The state is dropped when the transaction ends ...
+                _, pin5, _ = await compile_in_tx(
+                    pool_, pickled_state, 'SELECT 1')
+                units, conn_state, _ = await compile_in_tx(
+                    pool_, pin5, 'COMMIT')
+                self.assertTrue(units[0].tx_commit)
+                self.assertIsInstance(conn_state, bytes)
+                await assert_state_dropped(pool_, pin5)
+
+                # ... or when it's discarded, e.g. on client disconnect.
+                _, pin6, _ = await compile_in_tx(
+                    pool_, pickled_state, 'SELECT 1')
+                pool_.discard_tx_state(pin6)
+                await asyncio.gather(*pool_._tx_checkpoints)
+                await assert_state_dropped(pool_, pin6)
+            finally:
+                await pool_.stop()
+
+    def test_server_compiler_worker_tx_state_eviction(self):
+        from edb.server.compiler_pool import worker
+
+        with (
+            unittest.mock.patch.object(
+                worker, 'TX_STATES', collections.OrderedDict()),
+            unittest.mock.patch.object(
+                worker, 'CHECKPOINTED_TX_STATES', set()),
+            unittest.mock.patch.object(worker, 'TX_STATE_CACHE_SIZE', 2),
+        ):
+            for state_id in (1, 2, 3):
+                worker.TX_STATES[state_id] = f'state {state_id}'
+                worker._evict_tx_states()
+            # Without a pickle in the pool, these are the only copies
+            self.assertEqual(list(worker.TX_STATES), [1, 2, 3])
+
+            self.assertEqual(
+                pickle.loads(worker.pickle_tx_state(2)), 'state 2')
+            self.assertEqual(list(worker.TX_STATES), [1, 3])
+
+            worker.pickle_tx_state(3)
+            worker.TX_STATES[4] = 'state 4'
+            worker._evict_tx_states()
+            self.assertEqual(list(worker.TX_STATES), [1, 4])
+            self.assertEqual(worker.CHECKPOINTED_TX_STATES, set())
+
+    async def test_server_compiler_pool_adaptive_forecast(self):
+        pool_class = edbargs.CompilerPoolMode.OnDemand.pool_class
+        self.assertIs(pool_class, pool.SimpleAdaptivePool)
+
+        def actions(action):
+            return metrics.compiler_pool_scaling_actions._metric_values.get(
+                (action,), 0)
+
+        async def wait_for_workers(pool_, num):
+            start = time.monotonic()
+            while len(pool_._workers) < num:
+                if time.monotonic() - start > LONG_WAIT:
+                    raise TimeoutError(f"{num} workers are not started")
+                await asyncio.sleep(0.1)
+
+        with tempfile.TemporaryDirectory() as td:
+            pool_ = await self._create_pool(td, pool_class, pool_size=4)
+            try:
+                # Drive the forecast by hand instead of by the timer.
+                pool_._forecast_handle.cancel()
+                await wait_for_workers(pool_, 1)
+                self.assertEqual(len(pool_._workers), 1)
+
+                w1 = await pool_._acquire_worker()
+                # As if three requests had been compiling at once since
+                # the last forecast.
+                pool_._peak_demand = 3
+                spawned = actions('spare-spawn')
+                pool_._update_forecast()
+                pool_._forecast_handle.cancel()
+
+                self.assertEqual(pool_._get_target_num_workers(), 3)
+                self.assertEqual(actions('spare-spawn'), spawned + 2)
+                await wait_for_workers(pool_, 3)
+                self.assertEqual(len(pool_._spare_pids), 2)
+                self.assertNotIn(w1.get_pid(), pool_._spare_pids)
+
+                # The next request is served by one of the spares.
+                hits = actions('spare-hit')
+                w2 = await pool_._acquire_worker()
+                self.assertEqual(actions('spare-hit'), hits + 1)
+                self.assertNotIn(w2.get_pid(), pool_._spare_pids)
+                self.assertEqual(len(pool_._spare_pids), 1)
+
+                pool_._release_worker(w1)
+                pool_._release_worker(w2)
+            finally:
+                await pool_.stop()
+
+    async def test_server_compiler_pool_try_acquire(self):
+        q = queue.WorkerQueue(asyncio.get_running_loop())
+        q.release(1)
+        q.release(2)
+        q.release(3)
+
+        # Idle workers are taken without waiting, if any is satisfying.
+        self.assertEqual(q.try_acquire(condition=lambda w: w % 2 == 1), 3)
+        self.assertIsNone(q.try_acquire(condition=lambda w: w > 3))
+        self.assertEqual(q.qsize(), 2)
+
+        # Waiting acquire() calls take precedence.
+        self.assertEqual(await q.acquire(), 2)
+        self.assertEqual(await q.acquire(), 1)
+        waiters = [asyncio.create_task(q.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+        q.release(4)
+        self.assertIsNone(q.try_acquire(condition=lambda w: True))
+
+        # ... unless asked otherwise, as for a worker holding a tx state.
+        self.assertEqual(
+            q.try_acquire(condition=lambda w: True, yield_to_waiters=False),
+            4,
+        )
+        q.release(5)
+        q.release(6)
+        self.assertEqual(sorted(await asyncio.gather(*waiters)), [5, 6])
+
+    async def test_server_compiler_pool_result_cache(self):
+        def actions(client_name, action):
+            return metrics.compiler_result_cache_actions._metric_values.get(
+                (client_name, action), 0)
+
+        compiled = []
+        release = asyncio.Event()
+
+        async def call_worker_for_client(*, client_id, args, cache_key,
+                                         **kwargs):
+            await release.wait()
+            resp = f'{client_id}:{len(compiled)}'.encode()
+            compiled.append(resp)
+            if cache_key is not None:
+                pool_._cache_result(cache_key, resp)
+            return resp
+
+        def call(client_id, key, **kwargs):
+            kwargs.setdefault('global_schema', None)
+            return pool_._call_for_client(
+                client_id=client_id,
+                method_name='compile',
+                dbname='main',
+                evicted_dbs=[],
+                user_schema=b'user',
+                reflection_cache=b'refl',
+                database_config=b'db',
+                system_config=None,
+                args=(b'request' + key,),
+                msg=memoryview(b''),
+                **kwargs,
+            )
+
+        with tempfile.TemporaryDirectory() as td:
+            pool_ = pool_server.MultiSchemaPool(
+                cache_size=10,
+                secret=b'secret',
+                result_cache_size=10,
+                loop=asyncio.get_running_loop(),
+                worker_branch_limit=5,
+                runstate_dir=td,
+                pool_size=1,
+            )
+            pool_._call_worker_for_client = call_worker_for_client
+            for client_id, client_name in [(1, 'client1'), (2, 'client2')]:
+                pool_._clients[client_id] = pool_server.ClientSchema(
+                    immutables.Map(), b'global', b'config', ()
+                )
+                pool_._client_names[client_id] = client_name
+
+            key1 = b'k' * 16
+            key2 = b'K' * 16
+            hits = actions('client1', 'hit')
+            misses = actions('client1', 'miss')
+
+            # Identical requests in flight are compiled only once.
+            tasks = [asyncio.create_task(call(1, key1)) for _ in range(3)]
+            await asyncio.sleep(0)
+            self.assertEqual(len(pool_._result_cache_pending), 1)
+            release.set()
+            self.assertEqual(
+                await asyncio.gather(*tasks), [b'1:0', b'1:0', b'1:0']
+            )
+            self.assertEqual(compiled, [b'1:0'])
+            self.assertEqual(pool_._result_cache_pending, {})
+            self.assertEqual(actions('client1', 'miss'), misses + 1)
+            self.assertEqual(actions('client1', 'hit'), hits + 2)
+
+            # A different request is a miss.
+            self.assertEqual(await call(1, key2), b'1:1')
+            self.assertEqual(actions('client1', 'miss'), misses + 2)
+            self.assertEqual(await call(1, key2), b'1:1')
+            self.assertEqual(actions('client1', 'hit'), hits + 3)
+
+            # Results are shared between clients with the same inputs ...
+            hits2 = actions('client2', 'hit')
+            self.assertEqual(await call(2, key1), b'1:0')
+            self.assertEqual(actions('client2', 'hit'), hits2 + 1)
+
+            # ... but not with a different global schema.
+            self.assertEqual(
+                await call(1, key1, global_schema=b'global2'), b'1:2'
+            )
+            self.assertEqual(await call(2, key2), b'1:1')
+            self.assertEqual(len(pool_._result_cache_index), 2)
+
+            # The results are dropped once no client uses their inputs.
+            self.assertEqual(
+                await call(2, key1, global_schema=b'global2'), b'1:2'
+            )
+            self.assertEqual(len(pool_._result_cache_index), 1)
+            self.assertEqual(len(pool_._result_cache), 1)
+
+            pool_.client_disconnected(1)
+            self.assertEqual(len(pool_._result_cache), 1)
+            pool_.client_disconnected(2)
+            self.assertEqual(len(pool_._result_cache), 0)
+            self.assertEqual(pool_._result_cache_index, {})
+            self.assertEqual(len(pool_._result_cache_refs), 0)
+
+    def test_server_compiler_pool_demand_forecast(self):
+        forecast = pool.DemandForecast(window=3)
+        self.assertEqual(forecast.forecast(5), 0)
+
+        for demand in (2, 2, 2):
+            forecast.add_sample(demand)
+        self.assertEqual(forecast.forecast(5), 2)
+
+        # A growing demand is expected to keep growing.
+        for demand in (4, 6):
+            forecast.add_sample(demand)
+        self.assertEqual(forecast.forecast(0), 6)
+        self.assertEqual(forecast.forecast(5), 9)
+
+        # The recent peak is kept for the window, and then forgotten.
+        forecast.add_sample(0)
+        self.assertEqual(forecast.forecast(5), 6)
+        forecast.add_sample(0)
+        forecast.add_sample(0)
+        self.assertEqual(forecast.forecast(5), 0)
+
+    def test_server_compiler_pool_evict_budget(self):
+        worker = pool.BaseWorker(None, None, None, None, None, None)
+        for name, size in [('a', 4000), ('b', 100), ('c', 200), ('d', 300)]:
+            worker.set_db(name, state.PickledDatabaseState(
+                b'x' * size, immutables.Map(), immutables.Map()
+            ))
+        worker.get_db('a')  # most recently used: a, d, c, b
+
+        self.assertEqual(worker.prepare_evict_db(3), {'b': 'cache-evict'})
+        self.assertEqual(worker.prepare_evict_db(4, budget=5000), {})
+        self.assertEqual(
+            worker.prepare_evict_db(3, budget=4500, reserve=200),
+            {'b': 'cache-evict', 'c': 'cache-evict-budget'},
+        )
+        self.assertEqual(
+            worker.prepare_evict_db(4, budget=1000, reserve=500, pinned='a'),
+            {'b': 'cache-evict-budget'},
+        )
+        self.assertEqual(
+            list(worker.prepare_evict_db(4, budget=1000, reserve=5000)),
+            ['b', 'c', 'd', 'a'],
+        )
+
     def test_server_compiler_rpc_hash_eq(self):
         compiler = edbcompiler.new_compiler(
             std_schema=self._std_schema,
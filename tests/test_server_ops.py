@@ -757,6 +757,15 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                 '{tenant="localtest"}'
             ) or 0
 
+        def measure_cache_action(
+            sd: tb._EdgeDBServerData, action: str
+        ) -> Callable[[], float | int]:
+            return lambda: tb.parse_metrics(sd.fetch_metrics()).get(
+                'edgedb_server_query_cache_actions_total'
+                '{tenant="localtest",branch="main",cache="query",'
+                f'action="{action}"}}'
+            ) or 0
+
         with tempfile.TemporaryDirectory() as temp_dir:
             async with tb.start_edgedb_server(
                 data_dir=temp_dir,
@@ -795,7 +804,11 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                     await con.query_sql(sql)
 
                     # Querying a second time should hit the cache
-                    with self.assertChange(measure_compilations(sd), 0):
+                    with (
+                        self.assertChange(measure_compilations(sd), 0),
+                        self.assertChange(measure_cache_action(sd, 'hit'), 1),
+                        self.assertChange(measure_cache_action(sd, 'miss'), 0),
+                    ):
                         await con.query(qry, 'Two')
                     with self.assertChange(measure_sql_compilations(sd), 0):
                         await con.query_sql(sql)
@@ -812,10 +825,9 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                     with self.assertChange(measure_compilations(sd), 0):
                         await con.query(qry, 'Two')
 
-                    # The SQL cache is reset after DDL, because recompiling SQL
-                    # requires backend connection for amending in/out tids, and
-                    # we don't have the infra for that yet.
-                    with self.assertChange(measure_sql_compilations(sd), 1):
+                    # The SQL query only reads the catalogs, which the new
+                    # type doesn't change, so it is kept in the cache.
+                    with self.assertChange(measure_sql_compilations(sd), 0):
                         await con.query_sql(sql)
                     with self.assertChange(measure_sql_compilations(sd), 0):
                         await con.query_sql(sql)
@@ -848,6 +860,12 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                     await con.query('''
                         drop type X
                     ''')
+                    # Neither the type nor the global are used by the
+                    # queries, but a new module may change what any name
+                    # refers to, so all the queries have to be recompiled.
+                    await con.query('''
+                        create module other
+                    ''')
                     await con.query('''
                         create global g: str;
                     ''')
@@ -904,7 +922,7 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                         "set auto_rebuild_query_cache := false"
                     )
                     await con.query('''
-                        create type X
+                        create module another
                     ''')
                     with self.assertChange(measure_compilations(sd), 1):
                         await con.query(qry, 'Two')
@@ -980,6 +998,56 @@ class TestServerOps(tb.TestCaseWithHttpClient, tb.CLITestCaseMixin):
                 finally:
                     await con.aclose()
 
+    async def test_server_ops_cache_warm_01(self):
+        def measure_compilations(
+            sd: tb._EdgeDBServerData
+        ) -> Callable[[], float | int]:
+            return lambda: tb.parse_metrics(sd.fetch_metrics()).get(
+                'edgedb_server_edgeql_query_compilations_total'
+                '{tenant="localtest",path="compiler"}'
+            ) or 0
+
+        def measure_warmed(
+            sd: tb._EdgeDBServerData
+        ) -> Callable[[], float | int]:
+            return lambda: tb.parse_metrics(sd.fetch_metrics()).get(
+                'edgedb_server_query_cache_actions_total'
+                '{tenant="localtest",branch="main",cache="query",'
+                'action="warm"}'
+            ) or 0
+
+        async with tb.start_edgedb_server(
+            default_auth_method=args.ServerAuthMethod.Trust,
+            net_worker_mode='disabled',
+        ) as sd:
+            con = await sd.connect()
+            try:
+                # Leave it to the background recompilation
+                await con.execute(
+                    "configure current database "
+                    "set auto_rebuild_query_cache := false"
+                )
+                await con.execute('create type Warm')
+                qry = 'select Warm { id }'
+                await con.query(qry)
+                with self.assertChange(measure_compilations(sd), 0):
+                    await con.query(qry)
+
+                # The query depends on the changed type, so it is evicted
+                # from the cache, and then recompiled in the background.
+                warmed = measure_warmed(sd)()
+                await con.execute(
+                    'alter type Warm create property name: str')
+                async for tr in self.try_until_succeeds(
+                    ignore=AssertionError, timeout=30,
+                ):
+                    async with tr:
+                        self.assertGreater(measure_warmed(sd)(), warmed)
+                with self.assertChange(measure_compilations(sd), 0):
+                    await con.query(qry)
+            finally:
+                await con.aclose()
+
     async def test_server_ops_schema_metrics_01(self):
         def _extkey(extension: str) -> str:
             return (
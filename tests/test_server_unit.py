@@ -17,9 +17,12 @@
 #
 
 
+import gzip
 import unittest
 
+from edb.server import compression
 from edb.server import server
+from edb.server.cache import stmt_cache
 
 
 class TestServerUnittests(unittest.TestCase):
@@ -108,3 +111,81 @@ class TestServerUnittests(unittest.TestCase):
                 (set(expected[0]), set(expected[1]))
             )
             self.assertEqual(tuple(has_wildcards), expected_wildcard)
+
+    def test_server_unittest_stmt_cache_admission(self):
+        cache = stmt_cache.StatementsCache(maxsize=3, weigher=lambda o: o)
+        for key in 'abc':
+            cache[key] = 1.0
+        for _ in range(5):
+            cache.get('a', None)
+            cache.get('b', None)
+
+        # A cheap one-off entry doesn't displace anything, an expensive
+        # one displaces the least valuable entry, not the LRU one.
+        self.assertFalse(cache.admits('x', 1.0))
+        self.assertTrue(cache.admits('y', 100.0))
+        cache['y'] = 100.0
+        self.assertTrue(cache.needs_cleanup())
+        self.assertEqual(cache.cleanup_one(), ('c', 1.0))
+        self.assertFalse(cache.needs_cleanup())
+        self.assertEqual(list(cache), ['a', 'b', 'y'])
+
+        # Without a weigher it's a plain LRU cache.
+        cache = stmt_cache.StatementsCache(maxsize=3)
+        for key in 'abcd':
+            cache[key] = 1.0
+        self.assertTrue(cache.admits('x', 1.0))
+        self.assertEqual(cache.cleanup_one(), ('a', 1.0))
+
+    def test_server_unittest_http_compression_negotiation(self):
+        zstd = 'zstd' if 'zstd' in compression.ENCODINGS else None
+        CASES = [
+            (None, None),
+            (b'', None),
+            (b'identity', None),
+            (b'gzip', 'gzip'),
+            (b'GZip;q=0.5, br', 'gzip'),
+            (b'gzip;q=0', None),
+            (b'*', compression.ENCODINGS[0]),
+            (b'*, gzip;q=0', zstd),
+            (b'deflate, gzip;q=0.2, zstd;q=0.1', 'gzip'),
+            (b'zstd', zstd),
+            (b'gzip;q=invalid', None),
+        ]
+
+        for accept_encoding, expected in CASES:
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assertEqual(
+                    compression.negotiate_encoding(accept_encoding),
+                    expected,
+                )
+
+        self.assertTrue(compression.is_compressible(b'application/json'))
+        self.assertTrue(
+            compression.is_compressible(b'text/html; charset=utf-8'))
+        self.assertFalse(compression.is_compressible(b'text/event-stream'))
+        self.assertFalse(compression.is_compressible(b'image/png'))
+
+        data = b'{"data": [1, 2, 3]}' * 100
+        for encoding in compression.ENCODINGS:
+            compressed = compression.compress(data, encoding)
+            self.assertLess(len(compressed), len(data))
+        self.assertEqual(
+            gzip.decompress(compression.compress(data, 'gzip')), data
+        )
+
+    def test_server_unittest_dump_compression(self):
+        self.assertIsNone(compression.negotiate_dump_encoding([]))
+        self.assertIsNone(compression.negotiate_dump_encoding(['gzip']))
+        for encoding in compression.DUMP_ENCODINGS:
+            self.assertEqual(
+                compression.negotiate_dump_encoding(['gzip', encoding]),
+                encoding,
+            )
+
+        data = b'd\x00\x00\x00\x10' + b'\x00' * 12 * 100
+        for encoding in compression.DUMP_ENCODINGS:
+            compressed = compression.compress_dump_data(data, encoding)
+            self.assertLess(len(compressed), len(data))
+            self.assertEqual(
+                compression.decompress(compressed, encoding), data)